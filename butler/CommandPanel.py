@@ -4,6 +4,7 @@ import sys
 import os
 import json
 import re
+import queue
 from package.log_manager import LogManager
 
 # Pygments for syntax highlighting
@@ -19,10 +20,19 @@ except ImportError:
 logger = LogManager.get_logger(__name__)
 
 class CommandPanel(tk.Frame):
+    # 流式输出时每帧（约60fps）最多刷新一次文本框，空闲时降低轮询频率
+    STREAM_FLUSH_INTERVAL_MS = 16
+    IDLE_POLL_INTERVAL_MS = 100
+
     def __init__(self, master, program_mapping=None, programs=None, **kwargs):
         super().__init__(master, **kwargs)
         self.master = master
         self.command_callback = None
+        self.stats_provider = None
+        self.cancel_callback = None
+        # 其他线程通过该队列向界面推送内容，只在UI线程中消费
+        self._ui_queue = queue.Queue()
+        self._stream_tag = None
         self.program_mapping = program_mapping or {}
         self.programs = programs or {}
         self.all_program_names = sorted(list(self.programs.keys()))
@@ -131,10 +141,13 @@ class CommandPanel(tk.Frame):
         self.listen_button.grid(row=0, column=2, padx=(5, 0))
         self.clear_button = tk.Button(self.input_frame, text="Clear", command=self.clear_history, **button_config)
         self.clear_button.grid(row=0, column=3, padx=(5, 0))
+        self.stop_button = tk.Button(self.input_frame, text="Stop", command=self.cancel_running, **button_config)
+        self.stop_button.grid(row=0, column=4, padx=(5, 0))
         self.restart_button = tk.Button(self.input_frame, text="Restart", command=self.restart_application, **button_config)
-        self.restart_button.grid(row=0, column=4, padx=(5, 0))
+        self.restart_button.grid(row=0, column=5, padx=(5, 0))
 
         self._configure_styles_and_tags()
+        self.after(self.IDLE_POLL_INTERVAL_MS, self._process_ui_queue)
 
     def on_program_select(self, event=None):
         """Handle program selection from the listbox."""
@@ -242,11 +255,116 @@ class CommandPanel(tk.Frame):
         self.output_text.config(state='disabled')
 
 
+    def post_to_history(self, text, tag='ai_response'):
+        """线程安全版本的 append_to_history，内容会在下一帧由UI线程写入"""
+        self._ui_queue.put(('message', text, tag))
+
+    def call_soon(self, callback):
+        """在UI线程中执行 callback（线程安全），用于把后台任务的结果交回Tk主循环"""
+        self._ui_queue.put(('call', callback))
+
+    def begin_stream(self, tag='ai_response'):
+        """开始一段流式输出，之后的 append_stream 片段都使用该标签（线程安全）"""
+        self._ui_queue.put(('begin', tag))
+
+    def append_stream(self, text):
+        """追加一段流式输出片段（线程安全），片段会按帧合并后再写入文本框"""
+        self._ui_queue.put(('chunk', text))
+
+    def end_stream(self):
+        """结束当前的流式输出（线程安全）"""
+        self._ui_queue.put(('end',))
+
+    def _write_stream_chunks(self, chunks):
+        if not chunks:
+            return
+        self.output_text.config(state='normal')
+        self.output_text.insert(tk.END, "".join(chunks), (self._stream_tag or 'ai_response',))
+        self.output_text.see(tk.END)
+        self.output_text.config(state='disabled')
+
+    def _process_ui_queue(self):
+        """在UI线程中批量消费队列，一帧内到达的流式片段只触发一次插入"""
+        chunks = []
+        try:
+            while True:
+                try:
+                    item = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                kind = item[0]
+                if kind == 'chunk':
+                    chunks.append(item[1])
+                    continue
+
+                try:
+                    self._write_stream_chunks(chunks)
+                    chunks = []
+                    if kind == 'begin':
+                        self._stream_tag = item[1]
+                    elif kind == 'end':
+                        if self._stream_tag is not None:
+                            self._write_stream_chunks(["\n\n"])
+                        self._stream_tag = None
+                    elif kind == 'message':
+                        self.append_to_history(item[1], item[2])
+                    elif kind == 'call':
+                        item[1]()
+                except Exception as e:
+                    # 单个条目出错不能让队列停止消费
+                    chunks = []
+                    logger.error(f"处理UI队列条目 {kind} 失败: {e}")
+            self._write_stream_chunks(chunks)
+        finally:
+            # 无论本帧是否出错都要继续轮询，否则之后的输出再也不会显示
+            interval = self.STREAM_FLUSH_INTERVAL_MS if self._stream_tag is not None else self.IDLE_POLL_INTERVAL_MS
+            self.after(interval, self._process_ui_queue)
+
     def set_command_callback(self, callback):
         self.command_callback = callback
 
+    def set_stats_provider(self, provider):
+        """设置 /stats 命令使用的统计来源，provider() 返回要显示的文本"""
+        self.stats_provider = provider
+
+    def show_stats(self):
+        if self.stats_provider is None:
+            self.append_to_history("没有可用的统计信息", 'system_message')
+            return
+        try:
+            self.append_to_history(self.stats_provider(), 'system_message')
+        except Exception as e:
+            logger.error(f"获取统计信息失败: {e}")
+            self.append_to_history(f"获取统计信息失败: {e}", 'error')
+
+    def set_cancel_callback(self, callback):
+        """设置 Stop 按钮和 /stop 命令调用的函数，callback() 返回要显示的文本"""
+        self.cancel_callback = callback
+
+    def cancel_running(self):
+        if self.cancel_callback is None:
+            return
+        try:
+            message = self.cancel_callback()
+        except Exception as e:
+            logger.error(f"取消正在运行的命令失败: {e}")
+            self.append_to_history(f"取消正在运行的命令失败: {e}", 'error')
+            return
+        if message:
+            self.append_to_history(message, 'system_message')
+
     def send_text_command(self, event=None):
         command = self.input_entry.get().strip()
+        if command == "/stats":
+            self.append_to_history(f"You: {command}", "user_prompt")
+            self.show_stats()
+            self.input_entry.delete(0, tk.END)
+            return
+        if command == "/stop":
+            self.append_to_history(f"You: {command}", "user_prompt")
+            self.cancel_running()
+            self.input_entry.delete(0, tk.END)
+            return
         if command and self.command_callback:
             self.append_to_history(f"You: {command}", "user_prompt")
             logger.info(f"Sending text command: {command}")
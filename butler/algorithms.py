@@ -1,12 +1,12 @@
 import heapq
 from collections import deque
 
-import cv2
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from tqdm import tqdm
+from plugin.utils.lazy_import import lazy_import
+
+# 延迟导入重量级依赖，只有在相应算法第一次被调用时才真正加载
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+tqdm = lazy_import("tqdm")
 
 # 1. Sorting Algorithms
 def _insertion_sort(arr, low, high, pbar=None):
@@ -118,7 +118,7 @@ def quick_sort(arr, use_progress_bar=False):
     depth_limit = 2 * int(math.log2(len(arr_copy)))
 
     if use_progress_bar:
-        with tqdm(total=len(arr_copy), desc="Sorting") as pbar:
+        with tqdm.tqdm(total=len(arr_copy), desc="Sorting") as pbar:
             _introsort_util(arr_copy, 0, len(arr_copy) - 1, depth_limit, pbar)
     else:
         _introsort_util(arr_copy, 0, len(arr_copy) - 1, depth_limit)
@@ -244,7 +244,7 @@ def heap_sort(arr, use_progress_bar=False):
 
     pbar = None
     if use_progress_bar:
-        pbar = tqdm(total=n, desc="Sorting")
+        pbar = tqdm.tqdm(total=n, desc="Sorting")
 
     _heap_sort_range(arr_copy, 0, n - 1, pbar)
 
@@ -312,7 +312,7 @@ def a_star(graph, start, goal, heuristic, use_progress_bar=False):
     pbar = None
     if use_progress_bar:
         # Heuristic for progress bar total: number of nodes in graph
-        pbar = tqdm(total=len(graph), desc="Finding path")
+        pbar = tqdm.tqdm(total=len(graph), desc="Finding path")
 
     try:
         while open_set:
@@ -465,6 +465,9 @@ def text_cosine_similarity(text1, text2):
     Returns:
         float: The cosine similarity score between 0.0 and 1.0. / 介于0.0和1.0之间的余弦相似度得分。
     """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     vectorizer = TfidfVectorizer()
     tfidf_matrix = vectorizer.fit_transform([text1, text2])
     similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])
@@ -482,6 +485,9 @@ def edge_detection(image_path):
     Returns:
         numpy.ndarray or None: A new image with edges highlighted, or None if the image cannot be read. / 突出显示边缘的新图像，如果无法读取图像则为None。
     """
+    if cv2 is None:
+        raise ImportError("边缘检测需要 opencv-python，请先安装。")
+
     image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     if image is None:
         return None
@@ -561,6 +567,8 @@ def k_means_clustering(data, n_clusters, random_state=None):
                - labels (numpy.ndarray): Index of the cluster each sample belongs to. / 每个样本所属的簇的索引。
                - cluster_centers (numpy.ndarray): Coordinates of cluster centers. / 簇中心的坐标。
     """
+    from sklearn.cluster import KMeans
+
     if not isinstance(data, np.ndarray):
         data = np.array(data)
 
@@ -1,5 +1,9 @@
 import asyncio
+import codecs
 import os
+import signal
+import time
+from collections.abc import Callable
 from typing import ClassVar, Literal
 
 from anthropic.types.beta import BetaToolBash20241022Param
@@ -14,13 +18,19 @@ class _BashSession:
     _process: asyncio.subprocess.Process
 
     command: str = "/bin/bash"
-    _output_delay: float = 0.2  # 秒
+    _read_size: int = 64 * 1024  # 每次从管道读取的最大字节数
     _timeout: float = 120.0  # 秒
     _sentinel: str = "<<exit>>"
 
     def __init__(self):
         self._started = False
         self._timed_out = False
+        # stdout 中哨兵之后已读到的字节（例如后台任务的输出），归入下一条命令
+        self._pending = bytearray()
+        # stderr 由后台任务持续读取到这里，命令结束时取走
+        self._stderr = bytearray()
+        self._stderr_task: asyncio.Task | None = None
+        self._on_output: Callable[[str], None] | None = None
 
     async def start(self):
         if self._started:
@@ -35,19 +45,32 @@ class _BashSession:
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
+        self._stderr_task = asyncio.create_task(self._pump_stderr())
 
         self._started = True
 
     def stop(self):
-        """终止bash shell."""
+        """终止bash shell以及它启动的命令（它们在同一个进程组中）."""
         if not self._started:
             raise ToolError("会话尚未启动.")
         if self._process.returncode is not None:
             return
-        self._process.terminate()
+        try:
+            os.killpg(self._process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    @property
+    def alive(self) -> bool:
+        """会话是否还能继续执行命令."""
+        return self._started and self._process.returncode is None and not self._timed_out
+
+    async def run(self, command: str, on_output: Callable[[str], None] | None = None):
+        """
+        在bash shell中执行命令.
 
-    async def run(self, command: str):
-        """在bash shell中执行命令."""
+        on_output 不为 None 时，stdout 和 stderr 的输出在命令运行期间按块传给 on_output(text).
+        """
         # 在执行命令前请求用户许可
         print(f"是否要执行以下命令？\n{command}")
         user_input = input("输入“yes ”以继续，要取消其他选项: ")
@@ -57,6 +80,9 @@ class _BashSession:
                 system="命令执行被用户取消",
                 error="用户未提供执行命令的权限.",
             )
+        return await self._execute(command, on_output)
+
+    async def _execute(self, command: str, on_output: Callable[[str], None] | None = None):
         if not self._started:
             raise ToolError("会话尚未启动.")
         if self._process.returncode is not None:
@@ -74,84 +100,292 @@ class _BashSession:
         assert self._process.stdout
         assert self._process.stderr
 
-        # 向进程发送命令
-        self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
-        )
+        # 向进程发送命令，命令结束后在 stdout 写一个哨兵。
+        # 只有 stdout 的哨兵作为结束信号：命令可能用 exec 2>/dev/null 等方式重定向 stderr，
+        # 写到 stderr 的哨兵就永远不会到达
+        self._process.stdin.write(command.encode() + f"; echo '{self._sentinel}'\n".encode())
         await self._process.stdin.drain()
 
         # 读取进程的输出，直到找到哨兵
+        self._on_output = on_output
         try:
             async with asyncio.timeout(self._timeout):
-                while True:
-                    await asyncio.sleep(self._output_delay)
-                    # 如果我们直接从stdout/stderr读取，它将永远等待
-                    # EOF.而是直接使用StreamReader缓冲区
-                    output = (
-                        self._process.stdout._buffer.decode()
-                    )  # pyright: ignore[reportAttributeAccessIssue]
-                    if self._sentinel in output:
-                        # 剥去哨兵的衣服打破
-                        output = output[: output.index(self._sentinel)]
-                        break
+                output = await self._read_until_sentinel(self._process.stdout, on_output)
+            error = await self._take_stderr()
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
                 f"超时：bash尚未返回 {self._timeout} 秒，必须重新启动",
             ) from None
+        except EOFError:
+            await self._process.wait()
+            return ToolResult(
+                system="必须重新启动工具",
+                error=f"bash已退出，返回代码为 {self._process.returncode}",
+            )
+        finally:
+            self._on_output = None
 
         if output.endswith("\n"):
             output = output[:-1]
-
-        error = (
-            self._process.stderr._buffer.decode()
-        )  # pyright: ignore[reportAttributeAccessIssue]
         if error.endswith("\n"):
             error = error[:-1]
 
-        # 清除缓冲区，以便可以正确读取下一个输出
-        self._process.stdout._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-        self._process.stderr._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-
         return CLIResult(output=output, error=error)
 
+    async def _read_until_sentinel(
+        self,
+        stream: asyncio.StreamReader,
+        on_output: Callable[[str], None] | None,
+    ) -> str:
+        """
+        读取 stdout 直到哨兵所在的行，返回哨兵之前的文本.
+
+        每次只在新读到的字节（加上可能跨块的哨兵前缀）中查找哨兵，
+        因此大输出的总代价与输出长度成正比，而不是每次轮询都重新解码整个缓冲区.
+        """
+        sentinel = f"{self._sentinel}\n".encode()
+        buffer = self._pending
+        self._pending = bytearray()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        searched = 0  # buffer[:searched] 中不可能包含哨兵的起点
+        emitted = 0  # 已经传给 on_output 的字节数
+
+        while True:
+            index = buffer.find(sentinel, searched)
+            if index != -1:
+                break
+            searched = max(0, len(buffer) - len(sentinel) + 1)
+            # 可能是哨兵前缀的结尾部分暂不输出
+            if on_output is not None and searched > emitted:
+                on_output(decoder.decode(bytes(buffer[emitted:searched])))
+                emitted = searched
+            chunk = await stream.read(self._read_size)
+            if not chunk:
+                raise EOFError("bash 的 stdout 已关闭")
+            buffer += chunk
+
+        if on_output is not None and index > emitted:
+            on_output(decoder.decode(bytes(buffer[emitted:index]), final=True))
+        self._pending = buffer[index + len(sentinel):]
+        return bytes(buffer[:index]).decode(errors="replace")
+
+    async def _pump_stderr(self):
+        """在会话的整个生命周期内读取 stderr，避免管道写满阻塞 bash."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = await self._process.stderr.read(self._read_size)
+            if not chunk:
+                return
+            self._stderr += chunk
+            if self._on_output is not None:
+                self._on_output(decoder.decode(chunk))
+
+    async def _take_stderr(self) -> str:
+        """
+        取走命令写到 stderr 的输出.
+
+        命令在 stdout 哨兵之前写的 stderr 已经在管道中，这里只让出事件循环，
+        直到后台读取任务不再读到新数据为止，不等待之后才产生的输出.
+        """
+        idle_rounds = 0
+        size = len(self._stderr)
+        while idle_rounds < 2 and self._stderr_task is not None and not self._stderr_task.done():
+            await asyncio.sleep(0)
+            if len(self._stderr) == size:
+                idle_rounds += 1
+            else:
+                size, idle_rounds = len(self._stderr), 0
+        error, self._stderr = self._stderr, bytearray()
+        return bytes(error).decode(errors="replace")
+
+
+class _BashSessionPool:
+    """
+    按名称管理多个相互隔离的bash会话.
+
+    同名命令在同一个会话中依次执行（保留工作目录、环境变量等状态），
+    不同名称的会话可以并行执行. 同时存在的会话最多 max_sessions 个，
+    超出时回收最久未使用的空闲会话；空闲超过 idle_timeout 秒的会话在下次使用池时被回收.
+    超时或已退出的会话只会被替换，不影响其他会话.
+    """
+
+    max_sessions: int = 4
+    idle_timeout: float = 600.0  # 秒
+
+    def __init__(self, max_sessions: int | None = None, idle_timeout: float | None = None):
+        if max_sessions is not None:
+            self.max_sessions = max_sessions
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        self._sessions: dict[str, _BashSession] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._last_used: dict[str, float] = {}
+        self._slots = asyncio.Semaphore(self.max_sessions)
+
+    async def run(
+        self,
+        name: str,
+        command: str,
+        on_output: Callable[[str], None] | None = None,
+    ):
+        """在名为 name 的会话中执行命令，会话不存在或已失效时自动创建."""
+        async with self._slots:
+            lock = self._locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                session = await self._acquire(name)
+                try:
+                    return await session.run(command, on_output)
+                except ToolError:
+                    if not session.alive:
+                        # 超时的会话不能再用，立即终止，下次使用时重新创建
+                        self._discard(name)
+                    raise
+                finally:
+                    self._last_used[name] = time.monotonic()
+
+    async def restart(self, name: str):
+        """终止名为 name 的会话并重新启动."""
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        if lock.locked():
+            # 会话正卡在某条命令上：直接终止进程，等待中的命令会因 bash 退出而返回
+            self._discard(name)
+        async with lock:
+            self._discard(name)
+            await self._acquire(name)
+
+    def reap_idle(self) -> int:
+        """回收空闲超过 idle_timeout 秒的会话，返回回收的数量."""
+        now = time.monotonic()
+        expired = [
+            name
+            for name, last_used in self._last_used.items()
+            if now - last_used > self.idle_timeout and not self._locks[name].locked()
+        ]
+        for name in expired:
+            self._discard(name)
+        return len(expired)
+
+    def close(self):
+        """终止所有会话."""
+        for name in list(self._sessions):
+            self._discard(name)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "busy": sum(1 for name in self._sessions if self._locks[name].locked()),
+            "max_sessions": self.max_sessions,
+        }
+
+    async def _acquire(self, name: str) -> _BashSession:
+        self.reap_idle()
+        session = self._sessions.get(name)
+        if session is not None and session.alive:
+            return session
+        self._discard(name)
+
+        if len(self._sessions) >= self.max_sessions:
+            # 调用方持有一个并发名额，因此其他会话中至少有一个是空闲的
+            idle = [other for other in self._sessions if not self._locks[other].locked()]
+            if idle:
+                self._discard(min(idle, key=lambda other: self._last_used.get(other, 0.0)))
+
+        session = _BashSession()
+        await session.start()
+        self._sessions[name] = session
+        self._last_used[name] = time.monotonic()
+        return session
+
+    def _discard(self, name: str):
+        session = self._sessions.pop(name, None)
+        self._last_used.pop(name, None)
+        if session is not None:
+            session.stop()
+
 
 class BashTool(BaseAnthropicTool):
     """
     允许代理运行bash命令的工具。
     刀具参数由Anthropic定义，不可编辑。.
+
+    命令按 session 名称路由到会话池中的独立bash会话，未指定时使用 "default" 会话。
     """
 
-    _session: _BashSession | None
+    _pool: _BashSessionPool
     name: ClassVar[Literal["bash"]] = "bash"
     api_type: ClassVar[Literal["bash_20241022"]] = "bash_20241022"
+    default_session: ClassVar[str] = "default"
 
-    def __init__(self):
-        self._session = None
+    def __init__(self, max_sessions: int | None = None, idle_timeout: float | None = None):
+        self._pool = _BashSessionPool(max_sessions, idle_timeout)
         super().__init__()
 
     async def __call__(
-        self, command: str | None = None, restart: bool = False, **kwargs
+        self,
+        command: str | None = None,
+        restart: bool = False,
+        session: str | None = None,
+        on_output: Callable[[str], None] | None = None,
+        **kwargs,
     ):
+        name = session or self.default_session
         if restart:
-            if self._session:
-                self._session.stop()
-            self._session = _BashSession()
-            await self._session.start()
+            await self._pool.restart(name)
 
             return ToolResult(system="tool has been restarted.")
 
-        if self._session is None:
-            self._session = _BashSession()
-            await self._session.start()
-
         if command is not None:
-            return await self._session.run(command)
+            return await self._pool.run(name, command, on_output)
 
         raise ToolError("未提供命令.")
 
+    def close(self):
+        """终止所有bash会话."""
+        self._pool.close()
+
     def to_params(self) -> BetaToolBash20241022Param:
         return {
             "type": self.api_type,
             "name": self.name,
         }
+
+
+async def _benchmark(rounds: int):
+    """测量短命令和大输出命令的延迟（跳过执行前的用户确认）"""
+    import time
+
+    session = _BashSession()
+    await session.start()
+    cases = [
+        ("短命令", "echo ok"),
+        ("大输出", "seq 1 1000000"),
+    ]
+    try:
+        for label, command in cases:
+            timings = []
+            size = 0
+            for _ in range(rounds):
+                start = time.perf_counter()
+                result = await session._execute(command)
+                timings.append(time.perf_counter() - start)
+                size = len(result.output or "")
+            timings.sort()
+            print(
+                f"{label} `{command}`: 输出 {size} 字节, "
+                f"平均 {sum(timings) / len(timings) * 1000:.1f}ms, "
+                f"p50 {timings[len(timings) // 2] * 1000:.1f}ms, 最大 {timings[-1] * 1000:.1f}ms"
+            )
+    finally:
+        # 关闭 stdin 让 bash 自行退出，等它退出后再关闭事件循环
+        session._process.stdin.close()
+        await session._process.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark _BashSession command latency")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(_benchmark(args.rounds))
@@ -1,29 +1,41 @@
 import asyncio
 import base64
+import io
 import math
 import os
 import platform
 import shlex
 import shutil
-import tempfile
 import time
 from enum import StrEnum
-from pathlib import Path
 from typing import Literal, TypedDict
-from uuid import uuid4
 
 # 导入 PyAutoGUI 用于计算机控制
 import pyautogui
+from PIL import Image, ImageChops
 from deepseek.types.beta import BetaToolComputerUse20241022Param  # DeepSeek API 类型
 
 from .base import BaseDeepSeekTool, ToolError, ToolResult
 from .run import run
 
+# mss 直接把屏幕读入内存，比 pyautogui.screenshot() 快；未安装时回退到 pyautogui
+try:
+    import mss
+    MSS_INSTALLED = True
+except ImportError:
+    MSS_INSTALLED = False
+
 # 常量定义
 OUTPUT_DIR = "/tmp/outputs"                  # 临时输出目录
 TYPING_DELAY_MS = 12                         # 打字延迟（毫秒）
 TYPING_GROUP_SIZE = 50                       # 分组打字大小
 
+# 截图编码格式及对应的 MIME 类型
+SCREENSHOT_FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+DIRTY_TILE_SIZE = 64                         # 变化区域按该大小的图块对齐（像素）
+DIRTY_PIXEL_THRESHOLD = 16                   # 灰度差超过该值的像素才算变化，忽略压缩噪声
+DIRTY_FULL_FRAME_RATIO = 0.5                 # 变化区域超过整屏的该比例时直接返回整屏
+
 # 支持的操作类型枚举
 Action = Literal[
     "key",                # 按键操作
@@ -114,6 +126,9 @@ class ComputerTool(BaseDeepSeekTool):
     # 配置参数
     _screenshot_delay = 2.0  # 截图延迟(秒)
     _scaling_enabled = True   # 启用坐标缩放
+    _image_format = "png"     # 截图编码格式: png | jpeg | webp
+    _image_quality = 80       # jpeg/webp 的压缩质量(1-100)
+    _dirty_regions = False    # 操作后的截图只返回相对上一帧变化的区域
 
     @property
     def options(self) -> ComputerToolOptions:
@@ -131,11 +146,38 @@ class ComputerTool(BaseDeepSeekTool):
         """转换为DeepSeek API参数格式"""
         return {"name": self.name, "type": self.api_type, **self.options}
 
-    def __init__(self):
-        """初始化工具，获取屏幕分辨率"""
+    def __init__(
+        self,
+        image_format: str | None = None,
+        image_quality: int | None = None,
+        dirty_regions: bool | None = None,
+    ):
+        """初始化工具，获取屏幕分辨率
+
+        参数:
+            image_format: 截图编码格式（png、jpeg 或 webp）
+            image_quality: jpeg/webp 的压缩质量
+            dirty_regions: 为 True 时，操作后的截图只返回相对上一帧变化的区域
+        """
         super().__init__()
         self.width, self.height = pyautogui.size()  # 获取屏幕尺寸
         self.display_num = None
+        if image_format is not None:
+            image_format = image_format.lower()
+            if image_format not in SCREENSHOT_FORMATS:
+                raise ToolError(f"不支持的截图格式: {image_format}，可选: {', '.join(SCREENSHOT_FORMATS)}")
+            self._image_format = image_format
+        if image_quality is not None:
+            self._image_quality = image_quality
+        if dirty_regions is not None:
+            self._dirty_regions = dirty_regions
+        self._last_frame = None  # 变化区域模式下的上一帧（已缩放）
+        self.last_screenshot_stats = {}
+
+    @property
+    def media_type(self) -> str:
+        """截图 base64_image 的 MIME 类型"""
+        return SCREENSHOT_FORMATS[self._image_format]
 
     async def __call__(
         self,
@@ -232,9 +274,9 @@ class ComputerTool(BaseDeepSeekTool):
             else:
                 pyautogui.click(button=button_map.get(action, "left"))  # 单次点击
         
-        # 截屏操作
+        # 截屏操作：模型主动请求时总是返回整屏
         elif action == "screenshot":
-            return await self.screenshot()
+            return await self.screenshot(full_frame=True)
         
         # 获取光标位置
         elif action == "cursor_position":
@@ -248,34 +290,98 @@ class ComputerTool(BaseDeepSeekTool):
         
         # 操作后截屏（光标位置操作除外）
         if action != "cursor_position":
-            return await self.screenshot()
+            return await self.screenshot(full_frame=False)
 
-    async def screenshot(self):
-        """截取屏幕并返回base64编码的图像"""
-        temp_dir = Path(tempfile.gettempdir())
-        path = temp_dir / f"screenshot_{uuid4().hex}.png"  # 生成唯一文件名
-        
-        # 截屏并保存
-        screenshot = pyautogui.screenshot()
-        screenshot.save(str(path))
-        
-        # 缩放处理
-        if self._scaling_enabled:
-            x, y = self.scale_coordinates(
-                ScalingSource.COMPUTER, self.width, self.height
+    async def screenshot(self, full_frame: bool = True):
+        """截取屏幕并返回base64编码的图像
+
+        截图、缩放和编码都在内存中完成，不经过临时文件.
+
+        参数:
+            full_frame: 为 False 且启用了变化区域模式时，只返回相对上一帧变化的区域
+        """
+        return await asyncio.to_thread(self._screenshot, full_frame)
+
+    def _screenshot(self, full_frame: bool) -> ToolResult:
+        start = time.perf_counter()
+        frame = self._capture()
+
+        # 缩放到模型使用的坐标空间
+        size = self.scale_coordinates(ScalingSource.COMPUTER, self.width, self.height)
+        if frame.size != size:
+            frame = frame.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        captured = time.perf_counter()
+
+        previous, self._last_frame = self._last_frame, (frame if self._dirty_regions else None)
+        region = None
+        if not full_frame and previous is not None and previous.size == frame.size:
+            region = self._changed_region(previous, frame)
+            if region is None:
+                self.last_screenshot_stats = {
+                    "capture_ms": (captured - start) * 1000,
+                    "encode_ms": 0.0,
+                    "bytes": 0,
+                    "region": None,
+                }
+                return ToolResult(output="自上一张截图以来屏幕没有变化")
+            left, top, right, bottom = region
+            if (right - left) * (bottom - top) > DIRTY_FULL_FRAME_RATIO * frame.width * frame.height:
+                region = None
+
+        data = self._encode(frame.crop(region) if region else frame)
+        encoded = time.perf_counter()
+        self.last_screenshot_stats = {
+            "capture_ms": (captured - start) * 1000,
+            "encode_ms": (encoded - captured) * 1000,
+            "bytes": len(data),
+            "region": region,
+        }
+
+        output = None
+        if region:
+            left, top, right, bottom = region
+            output = (
+                f"截图只包含自上一张截图以来变化的区域: "
+                f"x={left}, y={top}, 宽={right - left}, 高={bottom - top}，其余部分没有变化"
             )
-            # 使用PIL缩放图像
-            from PIL import Image
-            with Image.open(path) as img:
-                img = img.resize((x, y), Image.Resampling.LANCZOS)
-                img.save(path)
-        
-        # 返回base64编码
-        if path.exists():
-            base64_image = base64.b64encode(path.read_bytes()).decode()
-            path.unlink()  # 删除临时文件
-            return ToolResult(base64_image=base64_image)
-        raise ToolError("截屏失败")
+        return ToolResult(output=output, base64_image=base64.b64encode(data).decode())
+
+    def _capture(self) -> Image.Image:
+        """截取主显示器，返回 RGB 图像"""
+        if MSS_INSTALLED:
+            with mss.mss() as sct:
+                shot = sct.grab(sct.monitors[1])
+            return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+        screenshot = pyautogui.screenshot()
+        if screenshot is None:
+            raise ToolError("截屏失败")
+        return screenshot.convert("RGB")
+
+    @staticmethod
+    def _changed_region(previous: Image.Image, frame: Image.Image):
+        """返回两帧之间变化的区域（按 DIRTY_TILE_SIZE 对齐的 left, top, right, bottom），没有变化时返回 None"""
+        diff = ImageChops.difference(previous, frame).convert("L")
+        mask = diff.point(lambda value: 255 if value > DIRTY_PIXEL_THRESHOLD else 0)
+        bbox = mask.getbbox()
+        if bbox is None:
+            return None
+        left, top, right, bottom = bbox
+        tile = DIRTY_TILE_SIZE
+        return (
+            left // tile * tile,
+            top // tile * tile,
+            min(frame.width, -(-right // tile) * tile),
+            min(frame.height, -(-bottom // tile) * tile),
+        )
+
+    def _encode(self, image: Image.Image) -> bytes:
+        """按配置的格式把图像编码到内存中"""
+        buffer = io.BytesIO()
+        if self._image_format == "png":
+            image.save(buffer, format="PNG")
+        else:
+            image.save(buffer, format=self._image_format.upper(), quality=self._image_quality)
+        return buffer.getvalue()
 
     async def shell(self, command: str, take_screenshot=True) -> ToolResult:
         """执行Shell命令并返回结果
@@ -290,7 +396,11 @@ class ComputerTool(BaseDeepSeekTool):
         if take_screenshot:
             # 延迟后截屏
             await asyncio.sleep(self._screenshot_delay)
-            base64_image = (await self.screenshot()).base64_image
+            screenshot = await self.screenshot(full_frame=False)
+            base64_image = screenshot.base64_image
+            # 变化区域模式下说明截图对应的区域
+            if screenshot.output:
+                stdout = f"{stdout}\n{screenshot.output}" if stdout else screenshot.output
         
         return ToolResult(output=stdout, error=stderr, base64_image=base64_image)
 
@@ -1,18 +1,107 @@
-from collections import defaultdict
+import codecs
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Literal, get_args
+from typing import Literal, NamedTuple, get_args
 
 from .base import BaseTool, CLIResult, ToolError, ToolResult
-from .run import maybe_truncate, run
+from .run import MAX_RESPONSE_LEN, maybe_truncate, run
 
 Command = Literal[
     "view",
     "create",
     "str_replace",
     "insert",
+    "multi_edit",
     "undo_edit",
 ]
 SNIPPET_LINES: int = 4
+# 每个文件的撤销历史（反向补丁）最多占用的字节数，超出时丢弃最早的记录
+UNDO_HISTORY_BYTES: int = 16 * 1024 * 1024
+# 行偏移索引每隔多少字节记录一次换行数
+_INDEX_BLOCK: int = 64 * 1024
+_COPY_CHUNK: int = 1024 * 1024
+
+
+class _Patch(NamedTuple):
+    """反向补丁：把 [offset, offset + length) 换回 old 即可撤销一次编辑"""
+
+    offset: int
+    length: int
+    old: bytes
+
+
+class _UndoEntry(NamedTuple):
+    """一次编辑的撤销记录：反向补丁，以及编辑刚完成时文件的大小和修改时间"""
+
+    patches: tuple[_Patch, ...]
+    size: int
+    mtime_ns: int
+
+
+class _LineIndex:
+    """
+    稀疏的行偏移索引.
+
+    counts[i] 是文件前 i * _INDEX_BLOCK 字节中的换行数，行号与字节偏移之间的换算
+    只需扫描一个块，因此索引的大小与文件大小成比例地很小.
+    """
+
+    def __init__(self, data):
+        self.size = len(data)
+        counts = array("q", [0])
+        for start in range(0, self.size, _INDEX_BLOCK):
+            counts.append(counts[-1] + data[start : start + _INDEX_BLOCK].count(b"\n"))
+        self.counts = counts
+
+    def line_count(self) -> int:
+        """与 text.split("\n") 得到的行数一致"""
+        return self.counts[-1] + 1
+
+    def line_of(self, data, offset: int) -> int:
+        """偏移 offset 所在的行号（从 0 开始）"""
+        block = offset // _INDEX_BLOCK
+        return self.counts[block] + data[block * _INDEX_BLOCK : offset].count(b"\n")
+
+    def line_offset(self, data, line: int) -> int:
+        """第 line 行（从 0 开始）的起始偏移，line 必须小于 line_count()"""
+        if line == 0:
+            return 0
+        block = bisect_left(self.counts, line) - 1
+        position = block * _INDEX_BLOCK - 1
+        for _ in range(line - self.counts[block]):
+            position = data.find(b"\n", position + 1)
+        return position + 1
+
+    def lines(self, data, first: int, last: int) -> list[str]:
+        """等价于 text.split("\n")[first:last]"""
+        last = min(last, self.line_count())
+        if first >= last:
+            return []
+        start = self.line_offset(data, first)
+        end = len(data) if last == self.line_count() else self.line_offset(data, last) - 1
+        return _decode(data[start:end]).split("\n")
+
+
+def _decode(data) -> str:
+    return bytes(data).decode("utf-8", errors="replace")
+
+
+def _skip_lines(data, position: int, count: int) -> int:
+    """从 position 开始第 count 个换行符的位置，不足 count 个时返回文件末尾"""
+    for _ in range(count):
+        found = data.find(b"\n", position)
+        if found == -1:
+            return len(data)
+        position = found + 1
+    return position - 1
 
 
 class EditTool(BaseTool):
@@ -22,10 +111,11 @@ class EditTool(BaseTool):
 
     name: Literal["str_replace_editor"] = "str_replace_editor"
 
-    _file_history: dict[Path, list[str]]
+    _file_history: dict[Path, deque[_UndoEntry]]
 
     def __init__(self):
-        self._file_history = defaultdict(list)
+        self._file_history = defaultdict(deque)
+        self._line_indexes: dict[Path, tuple[tuple[int, int], _LineIndex]] = {}
         super().__init__()
 
     async def __call__(
@@ -38,6 +128,7 @@ class EditTool(BaseTool):
         old_str: str | None = None,
         new_str: str | None = None,
         insert_line: int | None = None,
+        edits: list[dict] | None = None,
         **kwargs,
     ):
         # Ask for user permission before executing the command
@@ -54,6 +145,8 @@ class EditTool(BaseTool):
             print(f"New string: {new_str}")
         if insert_line is not None:
             print(f"Insert line: {insert_line}")
+        if edits:
+            print(f"Edits: {edits}")
 
         user_input = input("Enter 'yes' to proceed, anything else to cancel: ")
 
@@ -70,7 +163,8 @@ class EditTool(BaseTool):
             if not file_text:
                 raise ToolError("Parameter `file_text` is required for command: create")
             self.write_file(_path, file_text)
-            self._file_history[_path].append(file_text)
+            # 撤销创建只会保留文件原样，与之前保存完整内容时的行为一致
+            self._record_undo(_path, _Patch(0, 0, b""))
             return ToolResult(output=f"File created successfully at: {_path}")
         elif command == "str_replace":
             if not old_str:
@@ -86,6 +180,12 @@ class EditTool(BaseTool):
             if not new_str:
                 raise ToolError("Parameter `new_str` is required for command: insert")
             return self.insert(_path, insert_line, new_str)
+        elif command == "multi_edit":
+            if not edits:
+                raise ToolError("Parameter `edits` is required for command: multi_edit")
+            if not isinstance(edits, list):
+                raise ToolError("Parameter `edits` must be a list of edits")
+            return self.multi_edit(_path, edits)
         elif command == "undo_edit":
             return self.undo_edit(_path)
         raise ToolError(
@@ -133,15 +233,19 @@ class EditTool(BaseTool):
                 stdout = f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n{stdout}\n"
             return CLIResult(output=stdout, error=stderr)
 
-        file_content = self.read_file(path)
         init_line = 1
-        if view_range:
-            if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range):
-                raise ToolError(
-                    "Invalid `view_range`. It should be a list of two integers."
-                )
-            file_lines = file_content.split("\n")
-            n_lines_file = len(file_lines)
+        if not view_range:
+            return CLIResult(
+                output=self._make_output(self._read_head(path), str(path), init_line=init_line)
+            )
+
+        if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range):
+            raise ToolError(
+                "Invalid `view_range`. It should be a list of two integers."
+            )
+        with self._mapped(path) as data:
+            index = self._line_index(path, data)
+            n_lines_file = index.line_count()
             init_line, final_line = view_range
             if init_line < 1 or init_line > n_lines_file:
                 raise ToolError(
@@ -156,10 +260,8 @@ class EditTool(BaseTool):
                     f"Invalid `view_range`: {view_range}. It's second element `{final_line}` should be larger or equal than its first `{init_line}`"
                 )
 
-            if final_line == -1:
-                file_content = "\n".join(file_lines[init_line - 1 :])
-            else:
-                file_content = "\n".join(file_lines[init_line - 1 : final_line])
+            last = n_lines_file if final_line == -1 else final_line
+            file_content = "\n".join(index.lines(data, init_line - 1, last))
 
         return CLIResult(
             output=self._make_output(file_content, str(path), init_line=init_line)
@@ -167,10 +269,63 @@ class EditTool(BaseTool):
 
     def str_replace(self, path: Path, old_str: str, new_str: str | None):
         """实现str_replace命令，该命令将文件内容中的old_str替换为new_str"""
-        # 读取文件内容
+        new_str = new_str.expandtabs() if new_str is not None else ""
+        old = old_str.encode()
+        new = new_str.encode()
+
+        with self._mapped(path) as data:
+            occurrences = self._find_all(data, old)
+            # 查看文件时制表符被展开为空格，old_str 可能是按展开后的内容写的
+            expand_tabs = not occurrences and data.find(b"\t") != -1
+            if occurrences:
+                index = self._line_index(path, data)
+                lines = sorted({index.line_of(data, offset) + 1 for offset in occurrences})
+                offset = occurrences[0]
+                after = offset + len(old)
+
+                # 创建已编辑节的片段
+                replacement_line = lines[0] - 1
+                start_line = max(0, replacement_line - SNIPPET_LINES)
+                end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
+                snippet_text = (
+                    _decode(data[index.line_offset(data, start_line) : offset])
+                    + new_str
+                    + _decode(data[after : _skip_lines(data, after, SNIPPET_LINES + 1)])
+                )
+                snippet = "\n".join(snippet_text.split("\n")[: end_line - start_line + 1])
+
+        if expand_tabs:
+            return self._str_replace_expanded(path, old_str, new_str)
+
+        # Check if old_str is unique in the file
+        if not occurrences:
+            raise ToolError(
+                f"未进行更换, old_str `{old_str}` 未在中逐字出现 {path}."
+            )
+        elif len(occurrences) > 1:
+            raise ToolError(
+                f"未进行置换。old_str多次出现 `{old_str}` 行 {lines}. 请确保其唯一"
+            )
+
+        # 只把改动的区域写入新文件，其余部分按块复制
+        self._rewrite(path, [(offset, after, new)])
+
+        # 将反向补丁保存到历史记录
+        self._record_undo(path, _Patch(offset, len(new), old))
+
+        # 准备成功消息
+        success_msg = f"The file {path} has been edited. "
+        success_msg += self._make_output(
+            snippet, f"a snippet of {path}", start_line + 1
+        )
+        success_msg += "检查更改并确保它们符合预期。如有必要，再次编辑该文件。"
+
+        return CLIResult(output=success_msg)
+
+    def _str_replace_expanded(self, path: Path, old_str: str, new_str: str):
+        """在展开制表符后的完整文件内容上替换，只有 old_str 按原样找不到且文件含制表符时使用"""
         file_content = self.read_file(path).expandtabs()
         old_str = old_str.expandtabs()
-        new_str = new_str.expandtabs() if new_str is not None else ""
 
         # Check if old_str is unique in the file
         occurrences = file_content.count(old_str)
@@ -193,10 +348,9 @@ class EditTool(BaseTool):
         new_file_content = file_content.replace(old_str, new_str)
 
         # 将新内容写入文件
+        original = path.read_bytes()
         self.write_file(path, new_file_content)
-
-        # 将内容保存到历史记录
-        self._file_history[path].append(file_content)
+        self._record_undo(path, _Patch(0, len(new_file_content.encode()), original))
 
         # 创建已编辑节的片段
         replacement_line = file_content.split(old_str)[0].count("\n")
@@ -215,33 +369,35 @@ class EditTool(BaseTool):
 
     def insert(self, path: Path, insert_line: int, new_str: str):
         """执行insert命令，在文件内容的指定行插入new_str。"""
-        file_text = self.read_file(path).expandtabs()
         new_str = new_str.expandtabs()
-        file_text_lines = file_text.split("\n")
-        n_lines_file = len(file_text_lines)
 
-        if insert_line < 0 or insert_line > n_lines_file:
-            raise ToolError(
-                f"无效的'insert_line'参数: {insert_line}. 它应该在文件的行的范围内: {[0, n_lines_file]}"
-            )
+        with self._mapped(path) as data:
+            index = self._line_index(path, data)
+            n_lines_file = index.line_count()
 
-        new_str_lines = new_str.split("\n")
-        new_file_text_lines = (
-            file_text_lines[:insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:]
-        )
-        snippet_lines = (
-            file_text_lines[max(0, insert_line - SNIPPET_LINES) : insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line : insert_line + SNIPPET_LINES]
-        )
+            if insert_line < 0 or insert_line > n_lines_file:
+                raise ToolError(
+                    f"无效的'insert_line'参数: {insert_line}. 它应该在文件的行的范围内: {[0, n_lines_file]}"
+                )
 
-        new_file_text = "\n".join(new_file_text_lines)
-        snippet = "\n".join(snippet_lines)
+            new_str_lines = new_str.split("\n")
+            snippet_lines = (
+                index.lines(data, max(0, insert_line - SNIPPET_LINES), insert_line)
+                + new_str_lines
+                + index.lines(data, insert_line, insert_line + SNIPPET_LINES)
+            )
+            snippet = "\n".join(snippet_lines)
 
-        self.write_file(path, new_file_text)
-        self._file_history[path].append(file_text)
+            # 插入到第 insert_line 行之前；插在最后一行之后时换行符在新内容之前
+            if insert_line < n_lines_file:
+                offset = index.line_offset(data, insert_line)
+                inserted = (new_str + "\n").encode()
+            else:
+                offset = len(data)
+                inserted = ("\n" + new_str).encode()
+
+        self._rewrite(path, [(offset, offset, inserted)])
+        self._record_undo(path, _Patch(offset, len(inserted), b""))
 
         success_msg = f"The file {path} has been edited. "
         success_msg += self._make_output(
@@ -252,18 +408,263 @@ class EditTool(BaseTool):
         success_msg += "检查更改并确保它们符合预期(正确的缩进、无重复行等)。 如有必要，再次编辑文件."
         return CLIResult(output=success_msg)
 
+    def multi_edit(self, path: Path, edits: list[dict]):
+        """
+        执行multi_edit命令：一次应用一组 str_replace/insert 编辑.
+
+        所有 old_str 和 insert_line 都相对于编辑前的文件定位，编辑之间不能重叠；
+        插入到同一位置的内容按给出的顺序排列. 任何一个编辑无法定位时文件保持不变.
+        文件只写一次（临时文件 + os.replace），整批编辑对应一条撤销记录.
+        """
+        started = time.perf_counter()
+        expanded = None
+        with self._mapped(path) as data:
+            try:
+                located = self._locate_edits(path, data, self._line_index(path, data), edits)
+            except ToolError:
+                # 与 str_replace 相同：文件含制表符时按展开制表符后的内容再定位一次
+                if data.find(b"\t") == -1:
+                    raise
+                expanded = self.read_file(path).expandtabs().encode()
+        if expanded is not None:
+            located = self._locate_edits(path, expanded, _LineIndex(expanded), edits, expand_tabs=True)
+        located_at = time.perf_counter()
+
+        ranges = [(start, end, replacement) for start, end, replacement, _, _, _ in located]
+        if expanded is None:
+            self._rewrite(path, ranges)
+            # 反向补丁的 offset 是编辑后文件中的位置
+            patches = []
+            shift = 0
+            for start, end, replacement, _, old, _ in located:
+                patches.append(_Patch(start + shift, len(replacement), old))
+                shift += len(replacement) - (end - start)
+            self._record_undo(path, *patches)
+        else:
+            original = path.read_bytes()
+            new_size = len(expanded) + sum(len(replacement) - (end - start) for start, end, replacement in ranges)
+            self._rewrite(path, ranges, source=expanded)
+            self._record_undo(path, _Patch(0, new_size, original))
+        written_at = time.perf_counter()
+
+        # 按给出的顺序列出每个编辑在编辑后文件中的行号
+        lines = {}
+        line_shift = 0
+        for start, end, replacement, line, old, order in located:
+            lines[order] = line + line_shift + 1
+            line_shift += replacement.count(b"\n") - old.count(b"\n")
+        summary = "\n".join(
+            f"  {order + 1}. {edits[order]['command']} at line {lines[order]}" for order in sorted(lines)
+        )
+        return CLIResult(
+            output=(
+                f"The file {path} has been edited: {len(located)} edits applied in one write.\n"
+                f"{summary}\n"
+                f"Timing: locate {(located_at - started) * 1000:.1f}ms, "
+                f"write {(written_at - located_at) * 1000:.1f}ms, "
+                f"total {(written_at - started) * 1000:.1f}ms\n"
+                "检查更改并确保它们符合预期。如有必要，使用 view 查看编辑后的内容。"
+            )
+        )
+
+    def _locate_edits(self, path: Path, data, index: _LineIndex, edits: list[dict], expand_tabs: bool = False):
+        """
+        把 multi_edit 的每个编辑定位为 data 中要替换的区域.
+
+        返回按位置排序的 (start, end, replacement, line, old, order) 列表，
+        line 是编辑所在的行号（从 0 开始），old 是被替换的原内容.
+        """
+        located = []
+        n_lines_file = index.line_count()
+        for order, edit in enumerate(edits):
+            if not isinstance(edit, dict):
+                raise ToolError(
+                    f"Edit {order + 1}: each edit must be an object with a `command`, got {type(edit).__name__}"
+                )
+            command = edit.get("command")
+            new_str = edit.get("new_str") or ""
+            if not isinstance(new_str, str):
+                raise ToolError(f"Edit {order + 1}: parameter `new_str` must be a string")
+            new_str = new_str.expandtabs()
+            if command == "str_replace":
+                old_str = edit.get("old_str")
+                if not old_str:
+                    raise ToolError(f"Edit {order + 1}: parameter `old_str` is required for str_replace")
+                if not isinstance(old_str, str):
+                    raise ToolError(f"Edit {order + 1}: parameter `old_str` must be a string")
+                if expand_tabs:
+                    old_str = old_str.expandtabs()
+                old = old_str.encode()
+                occurrences = self._find_all(data, old)
+                if not occurrences:
+                    raise ToolError(
+                        f"未进行任何编辑. 第 {order + 1} 个编辑的 old_str `{old_str}` 未在中逐字出现 {path}."
+                    )
+                lines = sorted({index.line_of(data, offset) + 1 for offset in occurrences})
+                if len(occurrences) > 1:
+                    raise ToolError(
+                        f"未进行任何编辑. 第 {order + 1} 个编辑的 old_str `{old_str}` 多次出现在行 {lines}. 请确保其唯一"
+                    )
+                start = occurrences[0]
+                located.append((start, start + len(old), new_str.encode(), lines[0] - 1, old, order))
+            elif command == "insert":
+                insert_line = edit.get("insert_line")
+                if not isinstance(insert_line, int) or insert_line < 0 or insert_line > n_lines_file:
+                    raise ToolError(
+                        f"未进行任何编辑. 第 {order + 1} 个编辑的'insert_line'参数无效: {insert_line}. 它应该在文件的行的范围内: {[0, n_lines_file]}"
+                    )
+                if not new_str:
+                    raise ToolError(f"Edit {order + 1}: parameter `new_str` is required for insert")
+                # 与 insert 命令相同：插在最后一行之后时换行符在新内容之前
+                if insert_line < n_lines_file:
+                    start = index.line_offset(data, insert_line)
+                    inserted = (new_str + "\n").encode()
+                else:
+                    start = len(data)
+                    inserted = ("\n" + new_str).encode()
+                located.append((start, start, inserted, insert_line, b"", order))
+            else:
+                raise ToolError(
+                    f"Edit {order + 1}: unsupported command {command}. multi_edit accepts str_replace and insert"
+                )
+
+        # 同一位置的插入排在替换之前，多个插入按给出的顺序排列
+        located.sort(key=lambda item: (item[0], item[1] > item[0], item[5]))
+        for previous, current in zip(located, located[1:]):
+            if previous[1] > current[0]:
+                raise ToolError(
+                    f"未进行任何编辑. 第 {previous[5] + 1} 个和第 {current[5] + 1} 个编辑的区域重叠"
+                )
+        return located
+
     def undo_edit(self, path: Path):
-        """执行undo_edit命令."""
-        if not self._file_history[path]:
+        """
+        执行undo_edit命令.
+
+        反向补丁只对编辑刚完成时的文件有效：文件在那之后被其他程序修改过时拒绝撤销，
+        否则补丁会写到错误的位置.
+        """
+        history = self._file_history[path]
+        if not history:
             raise ToolError(f"No edit history found for {path}.")
 
-        old_text = self._file_history[path].pop()
-        self.write_file(path, old_text)
+        entry = history[-1]
+        stat = path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (entry.size, entry.mtime_ns):
+            raise ToolError(
+                f"{path} has been modified since the last edit, so the edit cannot be undone. "
+                "View the file and edit it directly instead."
+            )
+        history.pop()
+        self._rewrite(path, [(patch.offset, patch.offset + patch.length, patch.old) for patch in entry.patches])
+        if history:
+            # 文件现在与上一次编辑刚完成时相同，之后可以继续撤销
+            stat = path.stat()
+            history[-1] = history[-1]._replace(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
 
         return CLIResult(
-            output=f"Last edit to {path} undone successfully. {self._make_output(old_text, str(path))}"
+            output=f"Last edit to {path} undone successfully. {self._make_output(self._read_head(path), str(path))}"
         )
 
+    def _record_undo(self, path: Path, *patches: _Patch):
+        """
+        把一次编辑的反向补丁（按 offset 排序）保存为一条撤销记录，
+        超出 UNDO_HISTORY_BYTES 时丢弃最早的记录（至少保留最近一次）.
+        必须在编辑写入文件之后调用，记录中的大小和修改时间用于撤销前的校验.
+        """
+        stat = path.stat()
+        history = self._file_history[path]
+        history.append(_UndoEntry(patches, stat.st_size, stat.st_mtime_ns))
+        total = sum(len(patch.old) for entry in history for patch in entry.patches)
+        while len(history) > 1 and total > UNDO_HISTORY_BYTES:
+            total -= sum(len(patch.old) for patch in history.popleft().patches)
+
+    @contextmanager
+    def _mapped(self, path: Path):
+        """以只读 mmap 打开文件（空文件得到 b""），读取出错时引发ToolError."""
+        try:
+            file = path.open("rb")
+        except Exception as e:
+            raise ToolError(f"Ran into {e} while trying to read {path}") from None
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def _line_index(self, path: Path, data) -> _LineIndex:
+        """返回文件的行偏移索引，文件未改变时复用之前建立的索引"""
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._line_indexes.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        index = _LineIndex(data)
+        self._line_indexes[path] = (key, index)
+        return index
+
+    @staticmethod
+    def _find_all(data, needle: bytes, limit: int = 100) -> list[int]:
+        """needle 在 data 中（不重叠）出现的位置，最多返回 limit 个"""
+        positions = []
+        position = data.find(needle)
+        while position != -1 and len(positions) < limit:
+            positions.append(position)
+            position = data.find(needle, position + len(needle))
+        return positions
+
+    def _read_head(self, path: Path) -> str:
+        """只读取显示时不会被截断的开头部分"""
+        try:
+            with path.open("rb") as file:
+                head = file.read(MAX_RESPONSE_LEN * 4 + 4)
+        except Exception as e:
+            raise ToolError(f"Ran into {e} while trying to read {path}") from None
+        return codecs.getincrementaldecoder("utf-8")(errors="replace").decode(head)
+
+    def _rewrite(self, path: Path, edits: list[tuple[int, int, bytes]], source: bytes | None = None):
+        """
+        把文件中的若干区域 [start, end) 替换为新内容.
+
+        edits 按 start 排序且互不重叠. 未改动的部分按块从 mmap（或给出的 source）复制到
+        同目录下的临时文件，再用 os.replace 替换原文件，写入过程中出错不会留下写了一半的文件.
+
+        path 是符号链接时替换的是它指向的文件，链接本身保持不变. 文件有多个硬链接时
+        os.replace 会让这个路径与其他链接分离，因此改为把临时文件的内容写回原文件，
+        这种情况下写入不是原子的.
+        """
+        self._line_indexes.pop(path, None)
+        target = path.resolve()
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            reader = nullcontext(source) if source is not None else self._mapped(path)
+            with os.fdopen(fd, "wb") as out, reader as data:
+                position = 0
+                for start, end, replacement in edits:
+                    for chunk in range(position, start, _COPY_CHUNK):
+                        out.write(data[chunk : min(start, chunk + _COPY_CHUNK)])
+                    out.write(replacement)
+                    position = end
+                for chunk in range(position, len(data), _COPY_CHUNK):
+                    out.write(data[chunk : chunk + _COPY_CHUNK])
+            if os.stat(target).st_nlink > 1:
+                with open(temp_path, "rb") as new, open(target, "r+b") as out:
+                    shutil.copyfileobj(new, out, _COPY_CHUNK)
+                    out.truncate()
+                os.unlink(temp_path)
+            else:
+                shutil.copymode(target, temp_path)
+                os.replace(temp_path, target)
+        except Exception as e:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            if isinstance(e, ToolError):
+                raise
+            raise ToolError(f"Ran into {e} while trying to write to {path}") from None
+
     def read_file(self, path: Path):
         """从给定路径读取文件的内容；如果发生错误，则引发ToolError."""
         try:
@@ -0,0 +1,284 @@
+"""
+NLU 意图提取结果的本地缓存。
+
+Jarvis.preprocess 每次都会把命令发给 DeepSeek 做意图提取。对于重复的命令，
+这里按规范化后的命令文本缓存 {"intent", "entities"} 结果，命中时无需网络往返。
+依赖上下文的命令（如“再打开一次”）会把最近几轮对话的摘要一并作为键。
+缓存持久化到磁盘（合并短时间内的多次写入），按 LRU 淘汰，支持 TTL，
+并在 prompts.json 变化时自动失效。
+"""
+import atexit
+import copy
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from package.log_manager import LogManager
+
+logger = LogManager.get_logger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".butler_intent_cache.json")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s。！？!?,，.；;]+$")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# 指代、省略之前对话内容的说法，这类命令的意图取决于上下文。
+# 代词按整词匹配（“其他”“吉他”中的“他”不算）；指示词后面跟着名词时（“这些数字”“this file”）
+# 命令本身已经说清了对象，只有单独使用的指示词（“打开这个”“close that”）才算引用上下文
+_CONTEXT_REFERENCE = re.compile(
+    r"(?<![其吉])[它他她](?:们)?(?![人乡])|刚才|刚刚|上一个|上次|之前|再来|再次|再一次|再\w{1,4}一[次遍]|继续|同样"
+    r"|(?:这|那)(?:个|些|里)?(?=$|[\s，,。！？!?；;吧呢啊吗了]|(?:关|删|打开|复制|移|保存|发|再))"
+    r"|\b(?:it|its|them|they|again|same|previous|last one|one more time)\b"
+    r"|\b(?:this|that|these|those)\b(?!\s+(?!(?:one|ones|for|to|with|and|again|please|now|too|then|in|on|up|down|off)\b)[\w/~.])"
+)
+# 上下文摘要与命令文本之间的分隔符
+_CONTEXT_SEPARATOR = "\x00ctx:"
+
+
+def normalize_command(command):
+    """规范化命令文本：合并空白、去掉结尾标点。保留大小写，路径、文本等参数的大小写可能有意义"""
+    text = _WHITESPACE.sub(" ", command.strip())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def is_context_dependent(command):
+    """命令是否引用了之前的对话（此时仅凭命令文本无法确定意图）"""
+    return bool(_CONTEXT_REFERENCE.search(normalize_command(command).lower()))
+
+
+def context_digest(messages):
+    """最近几轮对话的摘要，用作依赖上下文的命令的缓存键的一部分"""
+    payload = json.dumps([[m.get("role"), m.get("content")] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _bigram_vector(text):
+    text = text.replace(" ", "")
+    if len(text) < 2:
+        return Counter([text])
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _cosine(a, b):
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(v * v for v in a.values()))
+    norm_b = math.sqrt(sum(v * v for v in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class IntentCache:
+    """
+    磁盘持久化的 LRU 意图缓存。
+
+    Args:
+        path: 缓存文件路径。
+        max_entries: 最多保留的条目数，超出后淘汰最久未使用的条目。
+        ttl: 条目有效期（秒），None 表示永不过期。
+        prompts_path: prompts.json 的路径，其内容变化时整个缓存失效。
+        similarity_threshold: 设置后，精确未命中时会按字符二元组余弦相似度查找近似命令。
+            由于数字通常会成为实体，只有数字完全相同的命令才会参与近似匹配。
+        save_delay: 写入后延迟多少秒保存到磁盘，期间的多次写入只保存一次；
+            0 表示每次写入都立即保存。退出时会自动保存未写入的修改。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=256, ttl=7 * 24 * 3600,
+                 prompts_path=None, similarity_threshold=None, save_delay=2.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prompts_path = prompts_path
+        self.similarity_threshold = similarity_threshold
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {normalized_command: {"result": ..., "created": ...}}
+        self._prompts_mtime = None
+        self._prompts_fingerprint = None
+        self._invalidation_callbacks = []
+        self._dirty = False
+        self._save_timer = None
+
+        self._refresh_prompts_fingerprint()
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    # --- 失效处理 ---
+    def add_invalidation_callback(self, callback):
+        """注册缓存失效时的回调，例如在 prompts.json 变化后重新加载提示词"""
+        self._invalidation_callbacks.append(callback)
+
+    def invalidate(self, reason="manual"):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.flush()
+        logger.info(f"意图缓存已清空 ({reason})")
+        for callback in self._invalidation_callbacks:
+            try:
+                callback(reason)
+            except Exception as e:
+                logger.error(f"意图缓存失效回调出错: {e}")
+
+    def _refresh_prompts_fingerprint(self):
+        """prompts.json 的修改时间变化时重新计算指纹，返回指纹是否改变"""
+        if not self.prompts_path:
+            return False
+        try:
+            mtime = os.stat(self.prompts_path).st_mtime
+        except OSError:
+            return False
+        if mtime == self._prompts_mtime:
+            return False
+
+        self._prompts_mtime = mtime
+        with open(self.prompts_path, 'rb') as f:
+            fingerprint = hashlib.sha256(f.read()).hexdigest()
+        changed = self._prompts_fingerprint is not None and fingerprint != self._prompts_fingerprint
+        self._prompts_fingerprint = fingerprint
+        return changed
+
+    def _check_prompts(self):
+        if self._refresh_prompts_fingerprint():
+            self.invalidate("prompts.json changed")
+
+    # --- 读写 ---
+    def get(self, command, context=None):
+        """
+        返回缓存的意图结果（深拷贝），未命中时返回 None。
+
+        context 是命令之前的最近几轮对话；给出时只有上下文完全相同才会命中。
+        """
+        self._check_prompts()
+        key = self._key(command, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                self._dirty = True
+                entry = None
+            if entry is None and self.similarity_threshold and context is None:
+                key = self._find_similar(key)
+                entry = self._entries.get(key) if key else None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry["result"])
+
+    def put(self, command, result, context=None):
+        """缓存一次成功的意图提取结果，context 与 get 的含义相同"""
+        key = self._key(command, context)
+        with self._lock:
+            self._entries[key] = {"result": copy.deepcopy(result), "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            self._schedule_save()
+
+    def flush(self):
+        """立即保存尚未写入磁盘的修改"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def stats(self):
+        """返回命中/未命中计数"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    @staticmethod
+    def _key(command, context):
+        key = normalize_command(command)
+        if context is not None:
+            key += _CONTEXT_SEPARATOR + context_digest(context)
+        return key
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry["created"] > self.ttl
+
+    def _find_similar(self, key):
+        numbers = _NUMBER.findall(key)
+        vector = _bigram_vector(key)
+        best_key, best_score = None, 0.0
+        for candidate, entry in self._entries.items():
+            if (self._expired(entry) or _CONTEXT_SEPARATOR in candidate
+                    or _NUMBER.findall(candidate) != numbers):
+                continue
+            score = _cosine(vector, _bigram_vector(candidate))
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key if best_score >= self.similarity_threshold else None
+
+    # --- 持久化 ---
+    def _schedule_save(self):
+        """在 save_delay 秒后保存，期间的写入合并为一次（调用方需持有锁）"""
+        if not self.path:
+            return
+        if not self.save_delay:
+            self._save()
+            self._dirty = False
+            return
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取意图缓存失败，将重新创建: {e}")
+            return
+
+        if data.get("prompts_fingerprint") != self._prompts_fingerprint:
+            logger.info("prompts.json 已变化，丢弃旧的意图缓存")
+            return
+        for key, entry in data.get("entries", []):
+            if not self._expired(entry):
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {
+            "prompts_fingerprint": self._prompts_fingerprint,
+            "entries": list(self._entries.items()),
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".intent_cache_")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"保存意图缓存失败: {e}")
@@ -0,0 +1,216 @@
+"""
+本地规则意图匹配器。
+
+很多 /legacy 命令（排序、斐波那契、打开程序、退出……）可以直接用规则识别，
+无需调用 DeepSeek。意图处理函数通过 @intent_patterns 声明正则模式，插件通过
+get_commands() 声明关键词；LocalIntentMatcher 将它们预编译，在微秒级完成匹配，
+只有置信度不足时才回退到 LLM 意图提取。
+"""
+import functools
+import re
+from typing import NamedTuple, Optional
+
+from .intent_cache import normalize_command
+
+# 置信度：关键词完全匹配 > 正则完整匹配 > 正则部分匹配（部分匹配不足以跳过 LLM）
+EXACT_CONFIDENCE = 1.0
+FULL_MATCH_CONFIDENCE = 0.95
+PARTIAL_MATCH_CONFIDENCE = 0.6
+DEFAULT_THRESHOLD = 0.9
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def intent_patterns(*patterns, extract=None, verify=None):
+    """
+    装饰器：为意图处理函数声明本地快速匹配使用的正则模式。
+
+    模式以忽略大小写的方式匹配规范化后的命令（见 normalize_command），命名分组会被转换为实体
+    （保留命令中原有的大小写）：
+    ``numbers`` 解析为数字列表，``number``/``target`` 解析为单个数字，其余保留为字符串。
+
+    Args:
+        *patterns: 正则表达式字符串。
+        extract: 可选的自定义实体提取函数，接收 re.Match，返回实体字典；
+            返回 None 表示该匹配不可信。
+        verify: 可选的校验函数，接收处理函数所属的对象和提取出的实体，返回是否可信。
+            校验失败时完整匹配也只按部分匹配计算置信度，交由 LLM 判断意图。
+    """
+    def decorator(func):
+        func.intent_patterns = patterns
+        func.intent_extractor = extract
+        func.intent_verifier = verify
+        return func
+    return decorator
+
+
+def _parse_number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def extract_entities(match):
+    """默认的实体提取：按分组名转换类型"""
+    entities = {}
+    for name, value in match.groupdict().items():
+        if value is None:
+            continue
+        if name == "numbers":
+            numbers = [_parse_number(n) for n in _NUMBER.findall(value)]
+            if not numbers:
+                return None
+            entities[name] = numbers
+        elif name in ("number", "target"):
+            entities[name] = _parse_number(value)
+        else:
+            value = value.strip()
+            if not value:
+                return None
+            entities[name] = value
+    return entities
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    entities: dict
+    confidence: float
+    plugin_name: Optional[str] = None
+
+
+class _Rule(NamedTuple):
+    intent: str
+    regex: re.Pattern
+    extract: object
+    verify: object
+
+
+class LocalIntentMatcher:
+    """预编译的本地意图匹配器"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._keywords = {}  # {小写的规范化关键词: IntentMatch}
+        self._rules = []
+
+    def add_rule(self, intent, patterns, extract=None, verify=None):
+        """为意图添加一组正则模式，verify(entities) 返回 False 时完整匹配不被信任"""
+        for pattern in patterns:
+            self._rules.append(_Rule(intent, re.compile(pattern, re.IGNORECASE), extract or extract_entities, verify))
+
+    def add_handler(self, intent, handler):
+        """读取处理函数上由 @intent_patterns 声明的模式"""
+        patterns = getattr(handler, "intent_patterns", None)
+        if patterns:
+            verify = getattr(handler, "intent_verifier", None)
+            owner = getattr(handler, "__self__", None)
+            if verify is not None and owner is not None:
+                verify = functools.partial(verify, owner)
+            self.add_rule(intent, patterns, getattr(handler, "intent_extractor", None), verify)
+
+    def add_keyword(self, keyword, intent, entities=None, plugin_name=None):
+        """添加一个需要完整匹配的关键词"""
+        key = normalize_command(keyword).lower()
+        if key:
+            self._keywords[key] = IntentMatch(intent, entities or {}, EXACT_CONFIDENCE, plugin_name)
+
+    def add_plugin(self, plugin):
+        """将插件 get_commands() 返回的命令注册为关键词"""
+        get_commands = getattr(plugin, "get_commands", None)
+        if get_commands is None:
+            return
+        name = plugin.get_name()
+        for command in get_commands():
+            self.add_keyword(command, "plugin", plugin_name=name)
+
+    def match(self, command):
+        """
+        返回置信度最高的本地匹配结果，没有任何匹配时返回 None。
+        """
+        text = normalize_command(command)
+        exact = self._keywords.get(text.lower())
+        if exact is not None:
+            return IntentMatch(exact.intent, dict(exact.entities), exact.confidence, exact.plugin_name)
+
+        partial = None
+        for rule in self._rules:
+            m = rule.regex.fullmatch(text)
+            if m is not None:
+                entities = rule.extract(m)
+                if entities is not None:
+                    if rule.verify is None or rule.verify(entities):
+                        return IntentMatch(rule.intent, entities, FULL_MATCH_CONFIDENCE)
+                    if partial is None:
+                        partial = IntentMatch(rule.intent, entities, PARTIAL_MATCH_CONFIDENCE)
+                    continue
+            if partial is None:
+                m = rule.regex.search(text)
+                if m is not None:
+                    entities = rule.extract(m)
+                    if entities is not None:
+                        partial = IntentMatch(rule.intent, entities, PARTIAL_MATCH_CONFIDENCE)
+        return partial
+
+    def resolve(self, command):
+        """只返回置信度达到阈值的匹配，否则返回 None（调用方应回退到 LLM）"""
+        result = self.match(command)
+        if result is not None and result.confidence >= self.threshold:
+            return result
+        return None
+
+
+def _benchmark(corpus_path, repeat, live):
+    import json
+    import time
+    from .main import Jarvis
+    from .intent_cache import IntentCache
+
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    jarvis = Jarvis(None)
+    # 基准测试时禁用意图缓存，保证 LLM 路径的测量是真实的网络往返
+    jarvis.intent_cache = IntentCache(path=None, max_entries=0)
+
+    local_hits = correct = 0
+    start = time.perf_counter()
+    for iteration in range(repeat):
+        for item in corpus:
+            result = jarvis.intent_matcher.resolve(item["command"])
+            if result is not None and iteration == 0:
+                local_hits += 1
+                correct += result.intent == item["intent"]
+    local_us = (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+    print(f"命令语料: {len(corpus)} 条, 本地命中 {local_hits} 条, 其中意图正确 {correct} 条")
+    print(f"本地匹配平均耗时: {local_us:.1f}us/条")
+
+    if not live:
+        print("使用 --live 并设置 DEEPSEEK_API_KEY 以测量端到端延迟对比")
+        return
+
+    def end_to_end(use_matcher):
+        timings = []
+        for item in corpus:
+            # 每条命令都从空的对话历史开始，与正常运行时一样由 handle_user_command 先写入当前命令
+            jarvis.conversation_history.clear()
+            jarvis.conversation_history.append({"role": "user", "content": item["command"]})
+            t0 = time.perf_counter()
+            jarvis.resolve_intent(item["command"], use_local=use_matcher)
+            timings.append(time.perf_counter() - t0)
+        return sum(timings) / len(timings) * 1000
+
+    llm_ms = end_to_end(False)
+    hybrid_ms = end_to_end(True)
+    print(f"仅LLM: {llm_ms:.1f}ms/条, 本地快速路径+LLM回退: {hybrid_ms:.1f}ms/条")
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Benchmark the local intent fast path")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "intent_corpus.json"))
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--live", action="store_true", help="Also measure end-to-end latency against DeepSeek")
+    args = parser.parse_args()
+    _benchmark(args.corpus, args.repeat, args.live)
@@ -6,32 +6,57 @@ import importlib.util
 import datetime
 import subprocess
 import json
+import re
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox
-import requests
 import shutil
 import tempfile
 import concurrent.futures
 from functools import lru_cache
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from dotenv import load_dotenv
-import numpy as np
 import heapq
 import math
-import cv2
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 # 假设这些模块存在
 from package.thread import process_tasks
 from .binary_extensions import binary_extensions
 from package.virtual_keyboard import VirtualKeyboard
 from package.log_manager import LogManager
+from package.conversation_history import ConversationHistory
 from butler.CommandPanel import CommandPanel
 from plugin.PluginManager import PluginManager
+from plugin.utils.lazy_import import lazy_import, print_import_profile
 from . import algorithms
-from local_interpreter.interpreter import Interpreter
+from .intent_cache import IntentCache, is_context_dependent
+from .intent_matcher import LocalIntentMatcher, intent_patterns
+
+# 重量级依赖在首次使用时才加载（如 _handle_edge_detect_image），以缩短启动时间。
+# 使用 --import-profile 查看启动时各模块的导入耗时。
+requests = lazy_import("requests")
+cv2 = lazy_import("cv2")
+
+# 流式朗读时用于切分完整句子的结束标点
+SENTENCE_END_PATTERN = re.compile(r"[。！？；!?;\n]|\.(?=\s)")
+
+
+def split_complete_sentences(buffer):
+    """
+    从缓冲文本中切出已经完整的句子。
+
+    Returns:
+        tuple[list[str], str]: (完整句子列表, 剩余的未完成文本)
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(buffer):
+        sentence = buffer[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, buffer[start:]
 
 class Jarvis:
     def __init__(self, root):
@@ -39,7 +64,11 @@ class Jarvis:
         load_dotenv()
         # 替换为DeepSeek API密钥
         self.deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-        self.engine = None # Will be initialized in speak()
+        # pyttsx3 引擎不是线程安全的：每个朗读线程使用自己的引擎（见 _tts_engine）
+        self._tts_local = threading.local()
+        # 流式回复的句子由一个常驻线程依次朗读
+        self._stream_tts_queue = None
+        self._stream_tts_lock = threading.Lock()
         self.logging = LogManager.get_logger(__name__)
         self.plugin_manager = PluginManager("plugin")
 
@@ -47,14 +76,12 @@ class Jarvis:
         self.JARVIS_AUDIO_FILE = os.path.join(base_dir, "resources", "jarvis.wav")
 
         # Load prompts from the JSON file
-        try:
-            prompts_path = os.path.join(base_dir, "prompts.json")
-            with open(prompts_path, 'r', encoding='utf-8') as f:
-                self.prompts = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            self.logging.error(f"Failed to load prompts: {e}")
-            # Fallback to empty prompts if loading fails
-            self.prompts = {}
+        self.prompts_path = os.path.join(base_dir, "prompts.json")
+        self.reload_prompts()
+
+        # NLU 意图提取结果缓存，prompts.json 变化时自动失效并重新加载提示词
+        self.intent_cache = IntentCache(prompts_path=self.prompts_path)
+        self.intent_cache.add_invalidation_callback(lambda reason: self.reload_prompts())
 
         # Paths for temporary files are relative to the current working directory
         self.OUTPUT_FILE = "./temp.wav"
@@ -67,27 +94,154 @@ class Jarvis:
             self.logging.error(f"Failed to load program mapping: {e}")
             self.program_mapping = {}
 
-        self.conversation_history = []
+        self.MAX_HISTORY_MESSAGES = 10
+        self.HISTORY_TOKEN_BUDGET = 2000
+        # 按 token 预算裁剪的历史，旧的轮次会被压缩进滚动摘要
+        self.conversation_history = ConversationHistory(
+            token_budget=self.HISTORY_TOKEN_BUDGET, max_messages=self.MAX_HISTORY_MESSAGES
+        )
         self.running = True
         self.matched_program = None
         self.panel = None
-        self.MAX_HISTORY_MESSAGES = 10
-        self.interpreter = Interpreter()
+        self._interpreter = None
+        self._interpreter_lock = threading.Lock()
+        self._llm_client = None
         self.program_folder = []
-        
+        # 最近一次传入的动态程序列表，本地意图匹配时用来确认程序名是否存在
+        self.programs = {}
+        # 流式模式：LLM 的输出逐段推送到界面，朗读从第一句完整的话开始
+        self.streaming = False
+        # 无法识别的 /legacy 命令是否当作对话交给 LLM 回复；关闭时（且未开启流式模式）只提示无法理解
+        self.chat_fallback = False
+
+        self.intent_handlers = {
+            "sort_numbers": self._handle_sort_numbers,
+            "find_number": self._handle_find_number,
+            "calculate_fibonacci": self._handle_calculate_fibonacci,
+            "edge_detect_image": self._handle_edge_detect_image,
+            "text_similarity": self._handle_text_similarity,
+            "open_program": self._handle_open_program,
+            "exit": self._handle_exit,
+        }
+        self.intent_matcher = self.build_intent_matcher()
+
+    def build_intent_matcher(self):
+        """根据意图处理函数声明的模式和插件命令构建本地意图匹配器"""
+        matcher = LocalIntentMatcher()
+        for intent, handler in self.intent_handlers.items():
+            matcher.add_handler(intent, handler)
+        for plugin in self.plugin_manager.get_all_plugins():
+            matcher.add_plugin(plugin)
+        return matcher
+
+    def reload_prompts(self):
+        try:
+            with open(self.prompts_path, 'r', encoding='utf-8') as f:
+                self.prompts = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            self.logging.error(f"Failed to load prompts: {e}")
+            # Fallback to empty prompts if loading fails
+            self.prompts = {}
+
+    @property
+    def llm_client(self):
+        """共享的带连接池的 DeepSeek 客户端，首次使用时才加载 requests"""
+        if self._llm_client is None:
+            from package.llm_client import get_llm_client
+            self._llm_client = get_llm_client()
+        return self._llm_client
+
+    @property
+    def interpreter(self):
+        """本地解释器在第一次使用时才创建，避免启动时加载工具模块等依赖"""
+        if self._interpreter is None:
+            from local_interpreter.interpreter import Interpreter
+            self._interpreter = Interpreter()
+        return self._interpreter
+
     def set_panel(self, panel):
         self.panel = panel
+        # 插件在后台线程中执行，结果回调交回Tk主循环处理
+        self.plugin_manager.callback_dispatcher = panel.call_soon if panel else None
+        if panel:
+            panel.set_stats_provider(self.format_stats)
+            panel.set_cancel_callback(self.cancel_running_commands)
+
+    def cancel_running_commands(self):
+        """Stop 按钮和 /stop 命令：终止解释器通过 run_shell 启动、仍在运行的命令"""
+        if self._interpreter is None:
+            return "没有正在运行的命令"
+        from local_interpreter.tools.shell_tool import cancel_running_commands
+        cancelled = cancel_running_commands()
+        return f"已终止 {cancelled} 个正在运行的命令" if cancelled else "没有正在运行的命令"
+
+    def format_stats(self):
+        """/stats 命令显示的内容：插件执行统计、意图缓存命中率和 LLM 调用延迟"""
+        lines = [self.plugin_manager.format_stats()]
+        cache = self.intent_cache.stats()
+        lines.append(f"意图缓存: {cache['entries']} 条, 命中率 {cache['hit_rate']:.1%}")
+        if self._llm_client is not None:
+            for name, stats in self._llm_client.metrics.snapshot().items():
+                lines.append(f"LLM {name}: {stats['calls']} 次, 平均 {stats['avg_ms']:.1f}ms, "
+                             f"p50 {stats['p50_ms']:.1f}ms, 错误 {stats['errors']}")
+        return "\n".join(lines)
+
+    def ui_print(self, message, tag='ai_response', stream=False):
+        """
+        将消息输出到控制台和界面。
+
+        stream=True 时 message 是流式输出的一个片段，会被追加到当前的流式段落中，
+        由 CommandPanel 按帧合并后刷新。
+        """
+        if stream:
+            print(message, end='', flush=True)
+            if self.panel:
+                self.panel.append_stream(message)
+            return
 
-    def ui_print(self, message, tag='ai_response'):
         print(message)
         if self.panel:
-            self.panel.append_to_history(message, tag)
+            if threading.current_thread() is threading.main_thread():
+                self.panel.append_to_history(message, tag)
+            else:
+                self.panel.post_to_history(message, tag)
+
+    def ui_stream_start(self, tag='ai_response'):
+        """开始一段流式输出"""
+        if self.panel:
+            self.panel.begin_stream(tag)
+
+    def ui_stream_end(self):
+        """结束当前的流式输出"""
+        print()
+        if self.panel:
+            self.panel.end_stream()
+
+    def _intent_cache_context(self, text, turns=4):
+        """
+        引用了之前对话的命令，其意图取决于上下文：返回命令之前的最近几轮对话，
+        作为意图缓存键的一部分。其余命令返回 None，仅按命令文本缓存。
+        """
+        if not is_context_dependent(text):
+            return None
+        messages = self.conversation_history.messages()
+        # 历史的最后一条就是当前命令本身
+        if messages and messages[-1].get("content") == text:
+            messages = messages[:-1]
+        return messages[-turns:]
 
     # 核心功能
     def preprocess(self, text):
         """
         使用DeepSeek API将用户输入文本转换为结构化的意图和实体。
+        相同的命令会直接从意图缓存返回，无需网络往返。
         """
+        context = self._intent_cache_context(text)
+        cached = self.intent_cache.get(text, context)
+        if cached is not None:
+            self.logging.info(f"意图缓存命中: {text}")
+            return cached
+
         # 从加载的配置中获取系统提示
         system_prompt = self.prompts.get("nlu_intent_extraction", {}).get("prompt")
         if not system_prompt:
@@ -95,33 +249,24 @@ class Jarvis:
             # Provide a minimal fallback prompt to avoid crashing
             system_prompt = "You are an NLU assistant. Return JSON with 'intent' and 'entities'."
 
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.deepseek_api_key}",
-            "Content-Type": "application/json"
-        }
         # 构造发送给API的消息列表
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(self.conversation_history)
 
-        payload = {
-            "model": "deepseek-chat",
-            "messages": messages,
-            "max_tokens": 512,
-            "temperature": 0
-        }
-
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            result_text = response.json()['choices'][0]['message']['content']
+            result_text = self.llm_client.chat_completion_text(
+                messages, model="deepseek-chat", max_tokens=512, temperature=0
+            )
 
             # 清理和解析JSON
             # LLM有时会返回被markdown代码块包围的JSON
             if result_text.strip().startswith("```json"):
                 result_text = result_text.strip()[7:-4].strip()
 
-            return json.loads(result_text)
+            nlu_result = json.loads(result_text)
+            if nlu_result.get("intent", "unknown") != "unknown":
+                self.intent_cache.put(text, nlu_result, context)
+            return nlu_result
         except requests.exceptions.RequestException as e:
             self.ui_print(f"DeepSeek API 请求失败: {e}")
             return {"intent": "unknown", "entities": {"error": str(e)}}
@@ -133,67 +278,164 @@ class Jarvis:
             self.ui_print(f"API响应格式不符合预期: {e}")
             return {"intent": "unknown", "entities": {"error": "Unexpected API response format"}}
 
-    def generate_response(self, text):
+    def generate_response(self, text, stream=False):
+        """
+        生成对话回复。
+
+        stream=True 时返回一个逐段产出回复文本的生成器，可直接交给 speak_stream。
+        """
         # 使用DeepSeek API
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.deepseek_api_key}",
-            "Content-Type": "application/json"
-        }
         # 从加载的配置中获取系统提示
         system_prompt = self.prompts.get("general_response", {}).get("prompt")
         if not system_prompt:
             self.logging.error("General response prompt not found. Using fallback.")
             system_prompt = "You are a helpful AI assistant."
 
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-            "max_tokens": 150,
-            "temperature": 0.5
-        }
-        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+        if stream:
+            return self._stream_response(messages)
+
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result['choices'][0]['message']['content']
+            return self.llm_client.chat_completion_text(
+                messages, model="deepseek-chat", max_tokens=150, temperature=0.5
+            )
         except Exception as e:
             self.ui_print(f"DeepSeek API调用失败: {e}")
             return "抱歉，我暂时无法回答这个问题。"  # 出错时返回默认响应
 
+    def _stream_response(self, messages):
+        received = False
+        try:
+            for fragment in self.llm_client.stream_chat_completion_text(
+                messages, model="deepseek-chat", max_tokens=150, temperature=0.5
+            ):
+                received = True
+                yield fragment
+        except Exception as e:
+            self.ui_print(f"DeepSeek API调用失败: {e}")
+            if not received:
+                yield "抱歉，我暂时无法回答这个问题。"  # 出错时返回默认响应
+
     def speak(self, audio):
-        import pyttsx3
         self.ui_print(audio, tag='ai_response')
+        self._remember_assistant_message(audio)
+        self._say(audio)
+
+    def speak_stream(self, fragments):
+        """
+        流式输出并朗读回复：片段到达即显示，每凑齐一句完整的话就交给朗读线程，
+        不必等待整段回复生成完毕。
+
+        会一直阻塞到最后一句朗读完毕，应在后台线程中调用（见 respond）。
+
+        Args:
+            fragments: 逐段产出文本的可迭代对象，例如 generate_response(text, stream=True)。
+
+        Returns:
+            str: 完整的回复文本。
+        """
+        sentences = self._get_stream_tts_queue()
+
+        parts = []
+        pending = ""
+        self.ui_stream_start(tag='ai_response')
+        try:
+            for fragment in fragments:
+                parts.append(fragment)
+                self.ui_print(fragment, stream=True)
+                complete, pending = split_complete_sentences(pending + fragment)
+                for sentence in complete:
+                    sentences.put(sentence)
+        finally:
+            self.ui_stream_end()
+            if pending.strip():
+                sentences.put(pending.strip())
+            done = threading.Event()
+            sentences.put(done)
+
+        audio = "".join(parts)
+        self._remember_assistant_message(audio)
+        done.wait()
+        return audio
+
+    def respond(self, text):
+        """
+        对无法识别为指令的输入给出对话回复。
 
-        # 将助手的响应添加到历史记录
+        在后台线程中生成并朗读回复，不阻塞Tk主循环；流式模式下回复逐段显示，
+        并从第一句完整的话开始朗读。
+        """
+        def run():
+            if self.streaming:
+                self.speak_stream(self.generate_response(text, stream=True))
+            else:
+                self.speak(self.generate_response(text))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _get_stream_tts_queue(self):
+        """返回流式朗读队列，首次使用时启动常驻的朗读线程"""
+        with self._stream_tts_lock:
+            if self._stream_tts_queue is None:
+                self._stream_tts_queue = queue.Queue()
+                threading.Thread(target=self._stream_tts_worker, args=(self._stream_tts_queue,),
+                                 daemon=True).start()
+            return self._stream_tts_queue
+
+    def _stream_tts_worker(self, sentences):
+        while True:
+            item = sentences.get()
+            if isinstance(item, threading.Event):
+                # 一段回复的所有句子都已朗读
+                item.set()
+                continue
+            try:
+                self._say(item)
+            except Exception as e:
+                self.logging.error(f"朗读失败: {e}")
+
+    def _remember_assistant_message(self, audio):
+        # 将助手的响应添加到历史记录（超出预算时自动压缩旧消息）
         self.conversation_history.append({"role": "assistant", "content": audio})
-        # 裁剪历史记录，防止其无限增长
-        if len(self.conversation_history) > self.MAX_HISTORY_MESSAGES:
-            self.conversation_history = self.conversation_history[-self.MAX_HISTORY_MESSAGES:]
 
-        if not self.engine:
-            self.engine = pyttsx3.init()
+    def _tts_engine(self):
+        """返回当前线程的 pyttsx3 引擎"""
+        engine = getattr(self._tts_local, "engine", None)
+        if engine is None:
+            import pyttsx3
+            # pyttsx3.init() 会在所有线程之间共享同一个引擎，这里为每个线程单独创建
+            engine = self._tts_local.engine = pyttsx3.Engine()
+        return engine
+
+    def _say(self, audio):
+        """合成并播放语音"""
+        engine = self._tts_engine()
+        # 不同线程可能同时朗读，各自使用自己的临时文件
+        output_file = self.OUTPUT_FILE
+        if threading.current_thread() is not threading.main_thread():
+            root, ext = os.path.splitext(self.OUTPUT_FILE)
+            output_file = f"{root}_{threading.get_ident()}{ext}"
 
         # 保存临时语音文件
-        self.engine.save_to_file(audio, self.OUTPUT_FILE)
-        self.engine.runAndWait()
+        engine.save_to_file(audio, output_file)
+        engine.runAndWait()
         
         try:
             from pydub import AudioSegment
             from pydub.playback import play
             # 直接播放合成语音
-            sound = AudioSegment.from_wav(self.OUTPUT_FILE)
+            sound = AudioSegment.from_wav(output_file)
             play(sound)
         except Exception as e:
             self.ui_print(f"音频处理出错: {e}")
         finally:
             # 清理临时文件
-            if os.path.exists(self.OUTPUT_FILE):
-                os.remove(self.OUTPUT_FILE)
+            if os.path.exists(output_file):
+                os.remove(output_file)
 
     def takecommand(self):
         import azure.cognitiveservices.speech as speechsdk
@@ -229,9 +471,35 @@ class Jarvis:
             self.logging.error(f"语音识别出错: {e}")
             return None
 
+    def _run_plugins_async(self, names, command, entities, report_errors=False, on_unhandled=None):
+        """
+        依次在后台尝试运行插件，直到有一个成功，避免慢插件阻塞Tk主循环。
+
+        Args:
+            names: 按优先级排列的插件名称。
+            report_errors: 为 True 时播报失败插件的错误信息，而不是尝试下一个插件。
+            on_unhandled: 所有插件都失败（或没有候选插件）时调用。
+        """
+        if not names:
+            if on_unhandled:
+                on_unhandled()
+            return
+
+        def on_result(plugin_result):
+            if plugin_result.success:
+                self.speak(plugin_result.result)
+            elif report_errors:
+                self.speak(plugin_result.error_message)
+            else:
+                self._run_plugins_async(names[1:], command, entities, report_errors, on_unhandled)
+
+        self.plugin_manager.run_plugin_async(names[0], command, entities, callback=on_result)
+
     def handle_user_command(self, command, programs):
         if command is None:
             return
+        if programs:
+            self.programs = programs
 
         # The user command is already displayed on the panel by `send_text_command`
         # self.ui_print(f"User: {command}", tag='user_prompt')
@@ -244,49 +512,84 @@ class Jarvis:
 
             # --- Start of original logic ---
             self.conversation_history.append({"role": "user", "content": legacy_command})
-            nlu_result = self.preprocess(legacy_command)
-            intent = nlu_result.get("intent", "unknown")
-            entities = nlu_result.get("entities", {})
-
-            intent_handlers = {
-                "sort_numbers": self._handle_sort_numbers,
-                "find_number": self._handle_find_number,
-                "calculate_fibonacci": self._handle_calculate_fibonacci,
-                "edge_detect_image": self._handle_edge_detect_image,
-                "text_similarity": self._handle_text_similarity,
-                "open_program": self._handle_open_program,
-                "exit": self._handle_exit,
-            }
-
-            handler = intent_handlers.get(intent)
-
-            if handler:
+            intent, entities, plugin_name = self.resolve_intent(legacy_command)
+
+            handler = self.intent_handlers.get(intent)
+
+            if plugin_name:
+                self._run_plugins_async([plugin_name], legacy_command, entities, report_errors=True)
+            elif handler:
                 handler(entities=entities, programs=programs)
             else:
                 # Fallback to plugin or unknown command
-                plugin_found = False
-                for plugin in self.plugin_manager.get_all_plugins():
-                    if plugin.get_name().lower() in legacy_command.lower():
-                        plugin_result = self.plugin_manager.run_plugin(plugin.get_name(), legacy_command, entities)
-                        if plugin_result.success:
-                            self.speak(plugin_result.result)
-                            plugin_found = True
-                            break
+                candidates = self.plugin_manager.match_plugin_names(legacy_command)
+                command_plugin = self.plugin_manager.match_command(legacy_command)
+                if command_plugin is not None and command_plugin not in candidates:
+                    candidates.insert(0, command_plugin)
 
-                if not plugin_found:
-                    self.ui_print(f"未知指令或意图: {legacy_command}")
+                def on_unhandled():
                     self.logging.warning(f"未知指令或意图: {intent}")
-                    self.speak("抱歉，我不太理解您的意思，请换一种方式表达。")
+                    if self.streaming or self.chat_fallback:
+                        # 不是指令：当作对话，由 LLM 回复
+                        self.respond(legacy_command)
+                    else:
+                        self.ui_print(f"未知指令或意图: {legacy_command}")
+                        self.speak("抱歉，我不太理解您的意思，请换一种方式表达。")
+
+                self._run_plugins_async([plugin.get_name() for plugin in candidates],
+                                        legacy_command, entities, on_unhandled=on_unhandled)
             # --- End of original logic ---
 
         else:
             # Default to the new interpreter
             if self.interpreter.is_ready:
-                result = self.interpreter.run(command)
-                self.ui_print(f"Jarvis: {result}")
+                if self.streaming:
+                    # 在后台线程中运行，生成的代码逐段显示，避免阻塞Tk主循环
+                    threading.Thread(
+                        target=self._run_interpreter_streaming, args=(command,), daemon=True
+                    ).start()
+                else:
+                    result = self.interpreter.run(command)
+                    self.ui_print(f"Jarvis: {result}")
             else:
                 self.ui_print("Jarvis: Interpreter is not ready. Please check API key.")
 
+    def resolve_intent(self, command, use_local=True):
+        """
+        识别命令的意图。先尝试本地规则匹配，置信度不足时再调用 LLM（preprocess）。
+
+        Returns:
+            tuple: (intent, entities, plugin_name)，plugin_name 仅在命中插件命令时不为 None。
+        """
+        if use_local and self.intent_matcher is not None:
+            match = self.intent_matcher.resolve(command)
+            if match is not None:
+                self.logging.info(f"本地意图匹配: {match.intent} (置信度 {match.confidence})")
+                return match.intent, match.entities, match.plugin_name
+
+        nlu_result = self.preprocess(command)
+        return nlu_result.get("intent", "unknown"), nlu_result.get("entities", {}), None
+
+    def _run_interpreter_streaming(self, command):
+        from local_interpreter.tools.shell_tool import stream_output_to
+
+        def show(fragment):
+            self.ui_print(fragment, stream=True)
+
+        with self._interpreter_lock:
+            self.ui_stream_start(tag='system_message')
+            try:
+                # run_shell 的输出在命令运行期间就追加到同一段流式输出中
+                with stream_output_to(show):
+                    result = self.interpreter.run(command, on_token=show)
+            finally:
+                self.ui_stream_end()
+        self.ui_print(f"Jarvis: {result}")
+
+    @intent_patterns(
+        r"(?:请)?(?:帮我)?(?:对)?(?:这些)?(?:数字)?(?:进行)?(?:排序|排列|sort)(?:一下)?(?:这些)?(?:数字|numbers)?\s*[:：]?\s*(?P<numbers>-?\d[-\d.,，、\s]*)",
+        r"(?:sort|order)\s+(?:the\s+)?(?:numbers\s*)?:?\s*(?P<numbers>-?\d[-\d.,\s]*)",
+    )
     def _handle_sort_numbers(self, entities, **kwargs):
         try:
             numbers = entities.get("numbers", [])
@@ -298,6 +601,10 @@ class Jarvis:
         except Exception as e:
             self.speak(f"排序时发生错误: {e}")
 
+    @intent_patterns(
+        r"(?:请)?(?:帮我)?在\s*(?P<numbers>-?\d[-\d.,，、\s]*?)\s*中(?:查找|找|搜索)(?:数字)?\s*(?P<target>-?\d+(?:\.\d+)?)",
+        r"find\s+(?P<target>-?\d+(?:\.\d+)?)\s+in\s+(?P<numbers>-?\d[-\d.,\s]*)",
+    )
     def _handle_find_number(self, entities, **kwargs):
         try:
             numbers = entities.get("numbers", [])
@@ -315,6 +622,10 @@ class Jarvis:
         except Exception as e:
             self.speak(f"查找时发生错误: {e}")
 
+    @intent_patterns(
+        r"(?:请)?(?:帮我)?(?:计算)?(?:斐波那契|fibonacci)(?:数列|数)?(?:的)?(?:第)?\s*(?P<number>\d+)\s*(?:项|个)?(?:是多少)?",
+        r"(?:请)?(?:帮我)?(?:计算)?第\s*(?P<number>\d+)\s*(?:项|个)斐波那契(?:数)?(?:是多少)?",
+    )
     def _handle_calculate_fibonacci(self, entities, **kwargs):
         try:
             n = entities.get("number")
@@ -358,31 +669,46 @@ class Jarvis:
         except Exception as e:
             self.speak(f"计算相似度时出错: {e}")
 
+    def _find_program(self, program_name, programs=None):
+        """依次在程序映射表、动态加载的程序中查找，最后按映射表模糊匹配（忽略大小写）；找不到返回 None"""
+        if not program_name:
+            return None
+        if program_name in self.program_mapping:
+            return self.program_mapping[program_name]
+        if programs and program_name in programs:
+            return programs[program_name]
+        lowered = program_name.lower()
+        for key in self.program_mapping:
+            if lowered in key.lower():
+                return self.program_mapping[key]
+        return None
+
+    def _is_known_program(self, entities):
+        # “运行一下这段代码”“启动倒计时”之类的话也会被模式匹配到，只有程序名确实存在才可信
+        return self._find_program(entities.get("program_name"), self.programs) is not None
+
+    @intent_patterns(
+        r"(?:请)?(?:帮我)?(?:打开|启动|运行)\s*(?P<program_name>\S.*)",
+        r"(?:open|launch|start)\s+(?P<program_name>\S.*)",
+        verify=_is_known_program,
+    )
     def _handle_open_program(self, entities, programs, **kwargs):
         program_name = entities.get("program_name")
         if not program_name:
             self.speak("无法打开程序，未指定程序名称。")
             return
 
-        # 优先匹配程序映射表
-        if program_name in self.program_mapping:
-            self.execute_program(self.program_mapping[program_name])
+        program = self._find_program(program_name, programs)
+        if program is not None:
+            self.execute_program(program)
             return
 
-        # 其次匹配动态加载的程序
-        if program_name in programs:
-            self.execute_program(programs[program_name])
-            return
-
-        # 最后模糊匹配
-        for key in self.program_mapping:
-            if program_name in key:
-                self.execute_program(self.program_mapping[key])
-                return
-
         self.ui_print(f"未找到程序 '{program_name}'")
         self.speak(f"未找到程序 {program_name}")
 
+    @intent_patterns(
+        r"(?:退出|再见|拜拜|\b(?:exit|quit|bye)\b)(?:程序|吧)?",
+    )
     def _handle_exit(self, **kwargs):
         self.logging.info("程序已退出")
         self.speak("再见")
@@ -512,6 +838,7 @@ class Jarvis:
             self.execute_program(command_payload)
 
     def main(self):
+        # from watchdog.observers import Observer
         # handler = self.ProgramHandler(self.program_folder)
         # observer = Observer()
         # for folder in self.program_folder:
@@ -552,12 +879,25 @@ def main():
     import traceback
     parser = argparse.ArgumentParser()
     parser.add_argument("--headless", action="store_true", help="Run in headless mode without GUI")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream LLM output into the panel as it is generated")
+    parser.add_argument("--chat", action="store_true",
+                        help="Answer unrecognised /legacy commands with a chat reply instead of an apology")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="Print a per-module import-time breakdown of butler.main and exit")
     args = parser.parse_args()
 
+    if args.import_profile:
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        print_import_profile("butler.main", cwd=project_root)
+        return
+
     try:
         if args.headless:
             print("Running in headless mode")
             jarvis = Jarvis(None)
+            jarvis.streaming = args.stream
+            jarvis.chat_fallback = args.chat
             jarvis.main()
             # Keep the application running for testing
             while True:
@@ -568,6 +908,8 @@ def main():
             root.geometry("800x600")
 
             jarvis = Jarvis(root)
+            jarvis.streaming = args.stream
+            jarvis.chat_fallback = args.chat
 
             # Load programs once and pass them to the panel
             programs = jarvis.open_programs("./package", external_folders=["."])
@@ -0,0 +1,183 @@
+# _BashSession 的输出读取与 _BashSessionPool 的并发、重启
+import asyncio
+import sys
+import time
+import types
+
+import pytest
+
+from butler import base
+
+if "anthropic" not in sys.modules:
+    try:
+        import anthropic.types.beta  # noqa: F401
+    except ImportError:
+        beta = types.ModuleType("anthropic.types.beta")
+        beta.BetaToolBash20241022Param = dict
+        sys.modules.setdefault("anthropic", types.ModuleType("anthropic"))
+        sys.modules.setdefault("anthropic.types", types.ModuleType("anthropic.types"))
+        sys.modules["anthropic.types.beta"] = beta
+if not hasattr(base, "BaseAnthropicTool"):
+    base.BaseAnthropicTool = base.BaseTool
+
+from butler.bash import BashTool, _BashSession, _BashSessionPool  # noqa: E402
+from butler.base import ToolError  # noqa: E402
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="需要 bash")
+
+
+_started = []
+
+
+@pytest.fixture(autouse=True)
+def auto_confirm(monkeypatch):
+    # 跳过执行前的用户确认
+    monkeypatch.setattr("builtins.input", lambda prompt="": "yes")
+
+
+@pytest.fixture(autouse=True)
+def track_sessions(monkeypatch):
+    start = _BashSession.start
+
+    async def tracked_start(self):
+        await start(self)
+        _started.append(self)
+
+    monkeypatch.setattr(_BashSession, "start", tracked_start)
+    yield
+    _started.clear()
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await asyncio.wait_for(coroutine, 20)
+        finally:
+            # 在事件循环关闭前等待所有 bash 进程退出
+            for session in _started:
+                if session._process.returncode is None:
+                    session.stop()
+                await session._process.wait()
+
+    return asyncio.run(main())
+
+
+async def _with_session(body):
+    session = _BashSession()
+    await session.start()
+    return await body(session)
+
+
+def test_stdout_and_stderr_are_separated():
+    async def body(session):
+        result = await session._execute("echo out; echo err >&2")
+        assert (result.output, result.error) == ("out", "err")
+        result = await session._execute("echo second")
+        assert (result.output, result.error) == ("second", "")
+
+    run(_with_session(body))
+
+
+@pytest.mark.parametrize("redirect", ["exec 2>/dev/null", "exec 2>{tmp}/stderr.log"])
+def test_redirected_stderr_does_not_hang(redirect, tmp_path):
+    async def body(session):
+        await session._execute(redirect.format(tmp=tmp_path))
+        start = time.monotonic()
+        result = await session._execute("echo visible; echo hidden >&2")
+        assert time.monotonic() - start < 2
+        assert result.output == "visible"
+        assert not result.error
+
+    run(_with_session(body))
+
+
+def test_on_output_streams_both_streams():
+    chunks = []
+
+    async def body(session):
+        result = await session._execute("echo 你好; echo 出错 >&2", chunks.append)
+        assert result.output == "你好"
+
+    run(_with_session(body))
+    assert "你好\n" in "".join(chunks) and "出错\n" in "".join(chunks)
+
+
+def test_large_output_is_complete():
+    async def body(session):
+        result = await session._execute("seq 1 200000; seq 1 50000 >&2")
+        assert result.output.splitlines()[-1] == "200000"
+        assert len(result.output.splitlines()) == 200000
+        assert result.error.splitlines()[-1] == "50000"
+
+    run(_with_session(body))
+
+
+def test_pool_sessions_run_in_parallel_and_keep_state():
+    async def body():
+        pool = _BashSessionPool(max_sessions=2)
+        try:
+            await pool.run("a", "cd /tmp")
+            start = time.monotonic()
+            first, second = await asyncio.gather(pool.run("a", "sleep 0.5; pwd"), pool.run("b", "sleep 0.5; pwd"))
+            assert time.monotonic() - start < 0.95
+            assert first.output == "/tmp"
+            assert second.output != "/tmp"
+
+            # 同一会话中的命令按顺序执行
+            order = []
+            await asyncio.gather(pool.run("a", "sleep 0.2; echo 1", order.append),
+                                 pool.run("a", "echo 2", order.append))
+            assert "".join(order) == "1\n2\n"
+            assert pool.stats()["sessions"] == 2
+        finally:
+            pool.close()
+
+    run(body())
+
+
+def test_pool_evicts_least_recently_used_session():
+    async def body():
+        pool = _BashSessionPool(max_sessions=2)
+        try:
+            await pool.run("a", "export MARK=a")
+            await pool.run("b", "true")
+            await pool.run("c", "true")
+            assert set(pool._sessions) == {"b", "c"}
+            assert (await pool.run("a", "echo ${MARK:-unset}")).output == "unset"
+        finally:
+            pool.close()
+
+    run(body())
+
+
+def test_restart_interrupts_running_command():
+    async def body():
+        tool = BashTool()
+        try:
+            await tool(command="export MARK=1")
+            hanging = asyncio.create_task(tool(command="sleep 30"))
+            await asyncio.sleep(0.3)
+            result = await tool(restart=True)
+            assert result.system == "tool has been restarted."
+            assert "bash已退出" in (await hanging).error
+            assert (await tool(command="echo ${MARK:-unset}")).output == "unset"
+        finally:
+            tool.close()
+
+    run(body())
+
+
+def test_timed_out_session_is_replaced():
+    async def body():
+        pool = _BashSessionPool()
+        try:
+            await pool.run("a", "true")
+            pool._sessions["a"]._timeout = 0.2
+            with pytest.raises(ToolError):
+                await pool.run("a", "sleep 5")
+            assert "a" not in pool._sessions
+            assert (await pool.run("a", "echo back")).output == "back"
+        finally:
+            pool.close()
+
+    run(body())
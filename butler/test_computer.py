@@ -0,0 +1,108 @@
+# ComputerTool 截图在内存中编码，变化区域模式下只返回相对上一帧变化的部分
+import asyncio
+import base64
+import io
+import sys
+import types
+
+import pytest
+from PIL import Image, ImageDraw
+
+from butler import base
+
+SCREEN_SIZE = (1024, 768)
+_frames = []
+
+if "pyautogui" not in sys.modules:
+    try:
+        import pyautogui  # noqa: F401
+    except ImportError:
+        sys.modules["pyautogui"] = types.ModuleType("pyautogui")
+if "deepseek" not in sys.modules:
+    try:
+        import deepseek.types.beta  # noqa: F401
+    except ImportError:
+        beta = types.ModuleType("deepseek.types.beta")
+        beta.BetaToolComputerUse20241022Param = dict
+        sys.modules.setdefault("deepseek", types.ModuleType("deepseek"))
+        sys.modules.setdefault("deepseek.types", types.ModuleType("deepseek.types"))
+        sys.modules["deepseek.types.beta"] = beta
+if not hasattr(base, "BaseDeepSeekTool"):
+    base.BaseDeepSeekTool = base.BaseTool
+
+from butler import computer  # noqa: E402
+from butler.computer import ComputerTool  # noqa: E402
+from butler.base import ToolError  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fake_screen(monkeypatch):
+    # 用预先准备的图像代替真实屏幕
+    monkeypatch.setattr(computer, "MSS_INSTALLED", False)
+    monkeypatch.setattr(computer.pyautogui, "size", lambda: SCREEN_SIZE, raising=False)
+    monkeypatch.setattr(computer.pyautogui, "screenshot", lambda: _frames.pop(0), raising=False)
+    yield
+    _frames.clear()
+
+
+def _frame(box=None):
+    image = Image.new("RGB", SCREEN_SIZE, "white")
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill="black")
+    return image
+
+
+def _shoot(tool, frame, full_frame=False):
+    _frames.append(frame)
+    return asyncio.run(tool.screenshot(full_frame))
+
+
+def _decode(result):
+    return Image.open(io.BytesIO(base64.b64decode(result.base64_image)))
+
+
+@pytest.mark.parametrize("image_format, pil_format", [("png", "PNG"), ("jpeg", "JPEG"), ("webp", "WEBP")])
+def test_screenshot_is_encoded_in_requested_format(image_format, pil_format):
+    tool = ComputerTool(image_format=image_format)
+    result = _shoot(tool, _frame((10, 10, 50, 50)), full_frame=True)
+    image = _decode(result)
+    assert image.format == pil_format and image.size == SCREEN_SIZE
+    assert tool.media_type == f"image/{image_format}"
+    assert tool.last_screenshot_stats["bytes"] == len(base64.b64decode(result.base64_image))
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ToolError):
+        ComputerTool(image_format="bmp")
+
+
+def test_dirty_regions_return_only_changed_tiles():
+    tool = ComputerTool(dirty_regions=True)
+    assert _decode(_shoot(tool, _frame())).size == SCREEN_SIZE
+
+    unchanged = _shoot(tool, _frame())
+    assert unchanged.base64_image is None and "没有变化" in unchanged.output
+
+    result = _shoot(tool, _frame((70, 130, 100, 140)))
+    assert tool.last_screenshot_stats["region"] == (64, 128, 128, 192)
+    assert _decode(result).size == (64, 64)
+    assert "x=64, y=128" in result.output
+
+
+def test_large_change_and_explicit_screenshot_return_full_frame():
+    tool = ComputerTool(dirty_regions=True)
+    _shoot(tool, _frame())
+
+    result = _shoot(tool, _frame((0, 0, 900, 700)))
+    assert _decode(result).size == SCREEN_SIZE and result.output is None
+
+    result = _shoot(tool, _frame((0, 0, 900, 710)), full_frame=True)
+    assert _decode(result).size == SCREEN_SIZE
+    assert tool.last_screenshot_stats["region"] is None
+
+
+def test_without_dirty_regions_every_screenshot_is_full():
+    tool = ComputerTool()
+    _shoot(tool, _frame())
+    result = _shoot(tool, _frame((70, 130, 100, 140)))
+    assert _decode(result).size == SCREEN_SIZE
@@ -0,0 +1,239 @@
+# EditTool 的编辑与撤销必须与原来基于完整文本的实现结果一致
+import asyncio
+import os
+import random
+
+import pytest
+
+from butler.base import ToolError
+from butler.edit import EditTool
+
+
+@pytest.fixture(autouse=True)
+def auto_confirm(monkeypatch):
+    # 跳过执行前的用户确认
+    monkeypatch.setattr("builtins.input", lambda prompt="": "yes")
+
+
+def call(tool, **kwargs):
+    return asyncio.run(tool(**kwargs))
+
+
+class ReferenceEditor:
+    """原来的实现：读入完整文本，编辑后整体写回，撤销时写回编辑前的完整文本"""
+
+    def __init__(self, text):
+        self.text = text
+        self.history = []
+
+    def str_replace(self, old_str, new_str):
+        if self.text.count(old_str) != 1:
+            raise ToolError("not unique")
+        self.history.append(self.text)
+        self.text = self.text.replace(old_str, new_str)
+
+    def insert(self, insert_line, new_str):
+        lines = self.text.split("\n")
+        if insert_line < 0 or insert_line > len(lines):
+            raise ToolError("bad line")
+        self.history.append(self.text)
+        self.text = "\n".join(lines[:insert_line] + new_str.split("\n") + lines[insert_line:])
+
+    def undo(self):
+        if not self.history:
+            raise ToolError("no history")
+        self.text = self.history.pop()
+
+
+def test_random_edits_and_undos_match_reference(tmp_path):
+    rng = random.Random(1)
+    path = tmp_path / "file.txt"
+    words = ["alpha", "beta", "gamma", "delta", "你好", "世界", ""]
+    initial = "\n".join(" ".join(rng.choice(words) for _ in range(3)) + f" #{i}" for i in range(40))
+
+    tool = EditTool()
+    call(tool, command="create", path=str(path), file_text=initial)
+    reference = ReferenceEditor(initial)
+    reference.history.append(initial)
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.4:
+            line = rng.randrange(len(reference.text.split("\n")))
+            old_str = f" #{line}" if f" #{line}\n" in reference.text + "\n" else "#"
+            new_str = rng.choice(["", "X", "多行\n替换", f" #{line} {rng.choice(words)}"])
+            expected, actual = _both(lambda: reference.str_replace(old_str, new_str),
+                                     lambda: tool.str_replace(path, old_str, new_str))
+        elif action < 0.75:
+            insert_line = rng.randint(0, len(reference.text.split("\n")))
+            new_str = rng.choice(["inserted", "两行\n插入", "  indented"])
+            expected, actual = _both(lambda: reference.insert(insert_line, new_str),
+                                     lambda: tool.insert(path, insert_line, new_str))
+        else:
+            expected, actual = _both(reference.undo, lambda: tool.undo_edit(path))
+        assert expected == actual, step
+        assert path.read_text() == reference.text, step
+
+
+def _both(reference_edit, tool_edit):
+    outcomes = []
+    for edit in (reference_edit, tool_edit):
+        try:
+            edit()
+            outcomes.append(None)
+        except ToolError:
+            outcomes.append(ToolError)
+    return outcomes
+
+
+def test_undo_refuses_after_external_change(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("one\ntwo\nthree\n")
+    tool = EditTool()
+    tool.str_replace(path, "two", "2")
+
+    path.write_text("one\n2\nthree\nexternal\n")
+    with pytest.raises(ToolError, match="modified since the last edit"):
+        tool.undo_edit(path)
+    assert path.read_text() == "one\n2\nthree\nexternal\n"
+
+
+def test_consecutive_undos_restore_each_state(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a\nb\nc")
+    tool = EditTool()
+    tool.str_replace(path, "a", "A")
+    tool.insert(path, 3, "d")
+    tool.str_replace(path, "b", "BB")
+    assert path.read_text() == "A\nBB\nc\nd"
+    for expected in ("A\nb\nc\nd", "A\nb\nc", "a\nb\nc"):
+        tool.undo_edit(path)
+        assert path.read_text() == expected
+
+
+def test_edit_through_symlink_keeps_link(tmp_path):
+    target = tmp_path / "real.txt"
+    target.write_text("hello world")
+    os.chmod(target, 0o640)
+    link = tmp_path / "link.txt"
+    link.symlink_to(target)
+
+    tool = EditTool()
+    tool.str_replace(link, "world", "there")
+    assert link.is_symlink()
+    assert target.read_text() == "hello there"
+    assert os.stat(target).st_mode & 0o777 == 0o640
+    tool.undo_edit(link)
+    assert link.is_symlink() and target.read_text() == "hello world"
+
+
+def test_edit_keeps_hard_links(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("hello world")
+    other = tmp_path / "other.txt"
+    os.link(path, other)
+
+    tool = EditTool()
+    tool.str_replace(path, "world", "there")
+    assert other.read_text() == "hello there"
+    assert os.stat(path).st_ino == os.stat(other).st_ino
+    tool.undo_edit(path)
+    assert other.read_text() == "hello world"
+
+
+def test_str_replace_on_tabbed_file_matches_expanded_text(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("def f():\n\treturn 1\n")
+    tool = EditTool()
+    tool.str_replace(path, "        return 1", "        return 2")
+    assert path.read_text() == "def f():\n        return 2\n"
+    tool.undo_edit(path)
+    assert path.read_text() == "def f():\n\treturn 1\n"
+
+
+def test_multi_edit_positions_are_relative_to_original(tmp_path):
+    path = tmp_path / "file.txt"
+    original = "one\ntwo\nthree\nfour"
+    path.write_text(original)
+    tool = EditTool()
+    result = call(tool, command="multi_edit", path=str(path), edits=[
+        {"command": "str_replace", "old_str": "three", "new_str": "3\n3b"},
+        {"command": "insert", "insert_line": 1, "new_str": "after one"},
+        {"command": "str_replace", "old_str": "one", "new_str": "1"},
+        {"command": "insert", "insert_line": 4, "new_str": "end"},
+    ])
+    assert path.read_text() == "1\nafter one\ntwo\n3\n3b\nfour\nend"
+    # 行号是每个编辑在编辑后文件中的位置，按给出的顺序列出
+    assert "1. str_replace at line 4" in result.output
+    assert "2. insert at line 2" in result.output
+    assert "3. str_replace at line 1" in result.output
+    assert "4. insert at line 7" in result.output
+
+    # 整批编辑只对应一条撤销记录
+    tool.undo_edit(path)
+    assert path.read_text() == original
+    with pytest.raises(ToolError):
+        tool.undo_edit(path)
+
+
+def test_multi_edit_inserts_at_same_line_keep_given_order(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a\nb")
+    tool = EditTool()
+    tool.multi_edit(path, [
+        {"command": "str_replace", "old_str": "b", "new_str": "B"},
+        {"command": "insert", "insert_line": 1, "new_str": "first"},
+        {"command": "insert", "insert_line": 1, "new_str": "second"},
+    ])
+    # 同一位置的插入排在替换之前
+    assert path.read_text() == "a\nfirst\nsecond\nB"
+
+
+def test_multi_edit_matches_sequential_edits(tmp_path):
+    rng = random.Random(2)
+    lines = [f"line {i}" for i in range(30)]
+    path = tmp_path / "file.txt"
+    path.write_text("\n".join(lines))
+
+    # 互不重叠的替换，从后往前依次应用时位置不受前面编辑的影响
+    chosen = sorted(rng.sample(range(30), 8), reverse=True)
+    reference = ReferenceEditor("\n".join(lines))
+    edits = []
+    for i in chosen:
+        new_str = rng.choice(["", "x", "two\nlines"])
+        edits.append({"command": "str_replace", "old_str": f"line {i}\n" if i < 29 else "\nline 29",
+                      "new_str": new_str})
+        reference.str_replace(edits[-1]["old_str"], new_str)
+    rng.shuffle(edits)
+
+    tool = EditTool()
+    tool.multi_edit(path, edits)
+    assert path.read_text() == reference.text
+
+
+@pytest.mark.parametrize("edits, message", [
+    ([{"command": "str_replace", "old_str": "a", "new_str": "A"}, "insert"], "Edit 2: each edit must be an object"),
+    ([None], "Edit 1: each edit must be an object"),
+    ([{"command": "str_replace", "old_str": 1, "new_str": "A"}], "Edit 1: parameter `old_str` must be a string"),
+    ([{"command": "insert", "insert_line": 0, "new_str": ["x"]}], "Edit 1: parameter `new_str` must be a string"),
+    ([{"command": "delete"}], "Edit 1: unsupported command"),
+    ([{"command": "str_replace", "old_str": "a\nb", "new_str": ""},
+      {"command": "str_replace", "old_str": "b\nc", "new_str": ""}], "重叠"),
+    ([{"command": "str_replace", "old_str": "a", "new_str": "A"},
+      {"command": "str_replace", "old_str": "missing", "new_str": ""}], "第 2 个编辑"),
+])
+def test_multi_edit_rejects_bad_edits_without_writing(tmp_path, edits, message):
+    path = tmp_path / "file.txt"
+    path.write_text("a\nb\nc")
+    tool = EditTool()
+    with pytest.raises(ToolError, match=message):
+        tool.multi_edit(path, edits)
+    assert path.read_text() == "a\nb\nc"
+    assert not tool._file_history[path]
+
+
+def test_multi_edit_rejects_non_list(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a")
+    with pytest.raises(ToolError, match="must be a list"):
+        call(EditTool(), command="multi_edit", path=str(path), edits={"command": "insert"})
@@ -0,0 +1,73 @@
+# IntentCache 的上下文键与延迟保存
+import json
+
+from butler.intent_cache import IntentCache, is_context_dependent
+
+RESULT = {"intent": "open_program", "entities": {"program_name": "notepad"}}
+
+
+def test_context_free_command_hits_regardless_of_history(tmp_path):
+    cache = IntentCache(path=str(tmp_path / "cache.json"), save_delay=0)
+    cache.put("打开记事本", RESULT)
+    assert cache.get("打开记事本。") == RESULT
+
+
+def test_context_dependent_command_keyed_by_history(tmp_path):
+    cache = IntentCache(path=None)
+    first = [{"role": "user", "content": "打开记事本"}]
+    second = [{"role": "user", "content": "打开浏览器"}]
+    assert is_context_dependent("再打开一次它")
+    assert not is_context_dependent("打开记事本")
+
+    cache.put("再打开一次它", RESULT, first)
+    assert cache.get("再打开一次它", first) == RESULT
+    assert cache.get("再打开一次它", second) is None
+    assert cache.get("再打开一次它") is None
+
+
+def test_similarity_lookup_ignores_context_entries():
+    cache = IntentCache(path=None, similarity_threshold=0.5)
+    cache.put("再打开一次它", RESULT, [{"role": "user", "content": "打开记事本"}])
+    assert cache.get("再打开一次它吧") is None
+
+
+def test_puts_are_batched_until_flush(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = IntentCache(path=str(path), save_delay=60)
+    cache.put("打开记事本", RESULT)
+    cache.put("打开浏览器", RESULT)
+    assert not path.exists()
+
+    cache.flush()
+    entries = dict(json.loads(path.read_text(encoding="utf-8"))["entries"])
+    assert set(entries) == {"打开记事本", "打开浏览器"}
+    assert IntentCache(path=str(path)).get("打开浏览器") == RESULT
+
+
+def test_delayed_save_writes_once(tmp_path, monkeypatch):
+    cache = IntentCache(path=str(tmp_path / "cache.json"), save_delay=0.2)
+    saves = []
+    original = cache._save
+    monkeypatch.setattr(cache, "_save", lambda: (saves.append(1), original()))
+    for i in range(10):
+        cache.put(f"命令{i}", RESULT)
+    cache._save_timer.join()
+    assert saves == [1]
+
+
+def test_self_contained_commands_hit_across_turns():
+    cache = IntentCache(path=None)
+    for command in ("sort these numbers 5 3 1", "对这些数字排序", "open this file /tmp/A.txt", "打开其他程序"):
+        assert not is_context_dependent(command), command
+        cache.put(command, RESULT)
+        assert cache.get(command) == RESULT
+
+    for command in ("打开它", "把这个关掉", "用刚才的参数", "close that", "open it again"):
+        assert is_context_dependent(command), command
+
+
+def test_key_keeps_argument_case():
+    cache = IntentCache(path=None)
+    cache.put("open /tmp/A.txt", RESULT)
+    assert cache.get("open /tmp/a.txt") is None
+    assert cache.get("open  /tmp/A.txt。") == RESULT
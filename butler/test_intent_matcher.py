@@ -0,0 +1,95 @@
+# 本地意图匹配：正例要跳过 LLM，容易误判的说法必须交给 LLM
+import pytest
+
+from butler.intent_matcher import LocalIntentMatcher, intent_patterns
+from butler.main import Jarvis
+
+
+@pytest.fixture
+def matcher():
+    jarvis = Jarvis.__new__(Jarvis)
+    jarvis.program_mapping = {"记事本": "notepad.exe", "chrome": "chrome.exe"}
+    jarvis.programs = {"package.timer": "./package/timer.py"}
+    matcher = LocalIntentMatcher()
+    matcher.add_handler("sort_numbers", jarvis._handle_sort_numbers)
+    matcher.add_handler("open_program", jarvis._handle_open_program)
+    matcher.add_handler("exit", jarvis._handle_exit)
+    return matcher
+
+
+@pytest.mark.parametrize("command, intent, entities", [
+    ("打开记事本", "open_program", {"program_name": "记事本"}),
+    ("请帮我启动chrome", "open_program", {"program_name": "chrome"}),
+    ("open chrome", "open_program", {"program_name": "chrome"}),
+    ("Open Chrome", "open_program", {"program_name": "Chrome"}),
+    ("运行 package.timer", "open_program", {"program_name": "package.timer"}),
+    ("退出程序", "exit", {}),
+    ("Bye!", "exit", {}),
+    ("排序 3, 1, 2", "sort_numbers", {"numbers": [3, 1, 2]}),
+])
+def test_resolves_locally(matcher, command, intent, entities):
+    match = matcher.resolve(command)
+    assert match is not None
+    assert (match.intent, match.entities) == (intent, entities)
+
+
+@pytest.mark.parametrize("command", [
+    "startup time of my pc",
+    "openai news",
+    "运行一下这段代码看看结果",
+    "启动倒计时 5 分钟",
+    "open the download url http://x",
+    "退出全屏模式",
+    "goodbye everyone",
+    "how do I exit vim",
+])
+def test_ambiguous_commands_fall_back_to_llm(matcher, command):
+    assert matcher.resolve(command) is None
+
+
+def test_unverified_full_match_is_partial(matcher):
+    match = matcher.match("打开不存在的程序")
+    assert match.intent == "open_program"
+    assert match.confidence < matcher.threshold
+
+
+def test_plain_function_verifier_receives_entities():
+    @intent_patterns(r"say (?P<word>\w+)", verify=lambda entities: entities["word"] == "hi")
+    def handler(**kwargs):
+        pass
+
+    matcher = LocalIntentMatcher()
+    matcher.add_handler("say", handler)
+    assert matcher.resolve("say hi").entities == {"word": "hi"}
+    assert matcher.resolve("say bye") is None
+
+
+def test_live_benchmark_runs_with_stubbed_llm(tmp_path, monkeypatch, capsys):
+    import json
+
+    from butler.intent_matcher import _benchmark
+    from package import llm_client
+
+    class FakeClient:
+        def __init__(self):
+            self.requests = []
+
+        def chat_completion_text(self, messages, **params):
+            self.requests.append(messages)
+            return json.dumps({"intent": "chat", "entities": {}})
+
+    client = FakeClient()
+    monkeypatch.setattr(llm_client, "get_llm_client", lambda: client)
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps([
+        {"command": "退出程序", "intent": "exit"},
+        {"command": "讲个笑话", "intent": "chat"},
+        {"command": "再打开一次它", "intent": "open_program"},
+    ], ensure_ascii=False), encoding="utf-8")
+
+    _benchmark(str(corpus), repeat=1, live=True)
+    assert "仅LLM" in capsys.readouterr().out
+    # 仅LLM 三条，本地快速路径下退出命令不经过 LLM；每次请求只带当前这一条命令
+    assert len(client.requests) == 5
+    assert all(messages[1:] == [{"role": "user", "content": messages[-1]["content"]}]
+               for messages in client.requests)
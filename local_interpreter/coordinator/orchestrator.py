@@ -1,89 +1,151 @@
 import os
 import re
-import importlib
-from openai import OpenAI
-from ..tools.tool_decorator import TOOL_REGISTRY
+from typing import List, NamedTuple, Optional
 
-def load_all_tools():
-    """
-    Dynamically imports all modules in the 'tools' directory to populate the TOOL_REGISTRY.
-    This should be run once at startup.
-    """
-    tools_dir = os.path.dirname(__file__)
-    tools_path = os.path.join(os.path.dirname(tools_dir), "tools")
-
-    for filename in os.listdir(tools_path):
-        if filename.endswith(".py") and not filename.startswith("__"):
-            module_name = f"local_interpreter.tools.{filename[:-3]}"
-            try:
-                importlib.import_module(module_name)
-            except Exception as e:
-                print(f"Error loading tool module {module_name}: {e}")
-
-def generate_system_prompt():
+from package.llm_client import get_llm_client
+from ..tools.tool_decorator import TOOL_REGISTRY, catalog_version, get_tool_schemas, load_all_tools
+from ..executor.tool_dispatcher import RUN_PYTHON_SCHEMA, RUN_PYTHON_TOOL, ToolCall, parse_tool_calls
+
+def generate_system_prompt(persistent_session=False):
     """
     Generates the system prompt dynamically based on the registered tools.
+
+    With `persistent_session`, the model is told that variables survive between turns.
+
+    The layout is ordered from most to least stable: fixed instructions, then the tool
+    list (sorted by name, so it only changes when a tool does), then per-interpreter
+    options. Requests therefore share the longest possible byte-identical prefix, which
+    is what providers' server-side prompt caching keys on.
     """
     prompt_header = """
 You are a helpful assistant that translates natural language commands into executable Python code.
 You have access to a set of safe tools to interact with the system.
-"""
 
-    tools_section = "**Available Tools:**\n"
-    for tool_name, tool_data in TOOL_REGISTRY.items():
-        tools_section += f"- `{tool_name}{tool_data['signature']}`: {tool_data['docstring']}\n"
-
-    prompt_footer = """
 **Instructions:**
 - Choose the best tool for the job. For file operations, use the dedicated file tools.
 - Only output the raw Python code to be executed. Do not add any explanation or formatting.
 - Wrap the code in triple backticks (```python).
 - If you cannot generate code for a command, output the word "Error" inside backticks.
 """
-    return f"{prompt_header}\n{tools_section}\n{prompt_footer}"
+
+    tools_section = "**Available Tools:**\n"
+    for tool_name, tool_data in sorted(TOOL_REGISTRY.items()):
+        tools_section += f"- `{tool_name}{tool_data['signature']}`: {tool_data['docstring']}\n"
+
+    prompt_footer = ""
+    if persistent_session:
+        prompt_footer += """
+- Variables from earlier turns are kept (see "Session variables"). Reuse them instead of re-reading files or recomputing results.
+"""
+    return f"{prompt_header}\n{tools_section}{prompt_footer}"
+
+
+# Generated prompts, keyed by (kind, persistent_session, tool catalog version)
+_prompt_cache = {}
+
+
+def get_system_prompt(persistent_session=False):
+    """Returns generate_system_prompt(), cached until a tool module changes."""
+    key = ("code", persistent_session, catalog_version())
+    prompt = _prompt_cache.get(key)
+    if prompt is None:
+        prompt = _prompt_cache[key] = generate_system_prompt(persistent_session)
+    return prompt
+
+
+def generate_tool_calling_prompt(persistent_session=False):
+    """
+    Generates the system prompt for function-calling mode. The tools are described by
+    their JSON schemas in the request, so the prompt does not repeat them.
+    """
+    prompt = f"""
+You are a helpful assistant that carries out commands on the user's machine by calling tools.
+- Call the tools directly. If a request needs several independent tools, call them all in one response.
+- Only when no tool can do the job, call `{RUN_PYTHON_TOOL}` with Python code; the tools are available inside it.
+- If the request needs no action, answer briefly in plain text.
+"""
+    if persistent_session:
+        prompt += f"""- Variables from earlier `{RUN_PYTHON_TOOL}` calls are kept (see "Session variables"). Reuse them.
+"""
+    return prompt
+
+
+class ToolPlan(NamedTuple):
+    """The model's answer in function-calling mode: tool calls to run, or a plain-text reply."""
+    tool_calls: List[ToolCall]
+    text: Optional[str] = None
 
 
 class Orchestrator:
-    def __init__(self):
+    def __init__(self, persistent_session=False):
         """
         Initializes the Orchestrator:
         1. Loads all available tools.
         2. Generates the system prompt.
-        3. Sets up the Deepseek API client.
+        3. Sets up the Deepseek API client (shared, pooled keep-alive connection).
+
+        Tools and prompts are cached process-wide, so constructing further Orchestrators
+        only re-checks the tool modules' modification times.
         """
+        self.persistent_session = persistent_session
+        self.tool_calling_prompt = generate_tool_calling_prompt(persistent_session)
+        self._catalog_version = None
+        # Token usage reported by the last function-calling request (incl. prompt cache hits)
+        self.last_usage = {}
         try:
-            load_all_tools()
-            self.system_prompt = generate_system_prompt()
+            self.refresh_tools()
 
             from dotenv import load_dotenv
             load_dotenv()
             self.api_key = os.getenv("DEEPSEEK_API_KEY")
             if not self.api_key:
                 raise ValueError("DEEPSEEK_API_KEY not found in environment variables.")
-            self.client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
+            self.client = get_llm_client()
         except Exception as e:
             print(f"Error initializing Orchestrator: {e}")
             self.client = None
 
-    def process_user_input(self, history: list) -> str:
+    def refresh_tools(self):
+        """Reloads changed tool modules and rebuilds the prompt and schemas if anything changed."""
+        version = load_all_tools()
+        if version != self._catalog_version:
+            self.system_prompt = get_system_prompt(self.persistent_session)
+            self.tool_schemas = get_tool_schemas() + [RUN_PYTHON_SCHEMA]
+            self._catalog_version = version
+
+    def process_user_input(self, history: list, on_token=None) -> str:
         """
         Takes the conversation history, sends it to the Deepseek LLM to generate Python code,
         and returns the code to be executed.
+
+        If `on_token` is given, the completion is streamed and `on_token` is called with
+        each text fragment as it arrives.
         """
         if not self.client:
             return 'print("Orchestrator not initialized. Please check API key.")'
 
-        messages = [{"role": "system", "content": self.system_prompt}] + history
+        self.refresh_tools()
+        messages = [{"role": "system", "content": self.system_prompt}] + list(history)
 
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-coder",
-                messages=messages,
-                max_tokens=500,
-                temperature=0,
-            )
-
-            generated_text = response.choices[0].message.content
+            if on_token is None:
+                generated_text = self.client.chat_completion_text(
+                    messages,
+                    model="deepseek-coder",
+                    max_tokens=500,
+                    temperature=0,
+                )
+            else:
+                fragments = []
+                for fragment in self.client.stream_chat_completion_text(
+                    messages,
+                    model="deepseek-coder",
+                    max_tokens=500,
+                    temperature=0,
+                ):
+                    fragments.append(fragment)
+                    on_token(fragment)
+                generated_text = "".join(fragments)
 
             # Extract code from within the triple backticks
             match = re.search(r"```(python\n)?(.*?)```", generated_text, re.DOTALL)
@@ -99,3 +161,86 @@ class Orchestrator:
         except Exception as e:
             print(f"Error calling Deepseek API: {e}")
             return f'print("Error during code generation: {e}")'
+
+    def plan_tool_calls(self, history: list) -> ToolPlan:
+        """
+        Asks the model for structured tool calls instead of free-form code.
+
+        A reply without tool calls that still contains a fenced code block is turned into
+        a `run_python` call, so callers only deal with tool calls or plain text.
+
+        Raises:
+            requests.exceptions.RequestException: the API call failed (e.g. the endpoint
+                does not support function calling); callers fall back to process_user_input.
+            ValueError: the model returned malformed tool arguments.
+        """
+        self.refresh_tools()
+        messages = [{"role": "system", "content": self.tool_calling_prompt}] + list(history)
+        result = self.client.chat_completion(
+            messages,
+            model="deepseek-coder",
+            max_tokens=500,
+            temperature=0,
+            tools=self.tool_schemas,
+            tool_choice="auto",
+        )
+        self.last_usage = result.get("usage") or {}
+        message = result["choices"][0]["message"]
+        tool_calls = parse_tool_calls(message)
+        if tool_calls:
+            return ToolPlan(tool_calls)
+
+        content = message.get("content") or ""
+        match = re.search(r"```(python\n)?(.*?)```", content, re.DOTALL)
+        if match:
+            return ToolPlan([ToolCall("call_0", RUN_PYTHON_TOOL, {"code": match.group(2).strip()})])
+        return ToolPlan([], content.strip())
+
+
+def _benchmark(rounds):
+    """
+    Measures Orchestrator construction time (first vs. cached) and, when DEEPSEEK_API_KEY is
+    set, time-to-first-token with a stable prompt prefix vs. one that changes every request.
+    """
+    import time
+    import uuid
+
+    start = time.perf_counter()
+    orchestrator = Orchestrator()
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        Orchestrator()
+    cached_ms = (time.perf_counter() - start) / rounds * 1000
+    print(f"Orchestrator(): first {first_ms:.1f} ms, cached {cached_ms:.2f} ms")
+
+    if not orchestrator.client:
+        print("Set DEEPSEEK_API_KEY to measure time-to-first-token.")
+        return
+
+    history = [{"role": "user", "content": "show the current directory"}]
+
+    def ttft(make_prompt):
+        timings = []
+        for _ in range(rounds):
+            messages = [{"role": "system", "content": make_prompt()}] + history
+            start = time.perf_counter()
+            for _ in orchestrator.client.stream_chat_completion_text(
+                    messages, model="deepseek-coder", max_tokens=1, temperature=0):
+                timings.append(time.perf_counter() - start)
+                break
+        return sum(timings) / len(timings) * 1000 if timings else float("nan")
+
+    # A prefix that differs on every request (as when the tool order or a timestamp
+    # changes) can never hit the provider's prompt cache
+    unstable_ms = ttft(lambda: f"Request {uuid.uuid4()}\n{orchestrator.system_prompt}")
+    stable_ms = ttft(lambda: orchestrator.system_prompt)
+    print(f"Time to first token: changing prefix {unstable_ms:.1f} ms, stable prefix {stable_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark prompt caching and time-to-first-token")
+    parser.add_argument("--rounds", type=int, default=5)
+    _benchmark(parser.parse_args().rounds)
@@ -0,0 +1,147 @@
+# local_interpreter/executor/code_cache.py
+# 已验证代码对象的缓存。
+# LLM 在重试或重复命令时经常生成完全相同的代码；按源码内容的哈希缓存通过了 AST 和字节码验证的
+# 代码对象，重复执行时可以跳过解析、验证和编译。
+# 内存中按 LRU 淘汰；可选地用 marshal 持久化到磁盘，让所有沙盒工作进程和后续启动共享。
+import hashlib
+import importlib.util
+import marshal
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("SANDBOX_CODE_CACHE_SIZE", "256"))
+# 设置后启用磁盘缓存；磁盘上的代码对象加载后不再验证，目录只应对当前用户可写
+DEFAULT_CACHE_DIR = os.path.expanduser(os.getenv("SANDBOX_CODE_CACHE_DIR", "")) or None
+
+
+def cache_key(source, policy_fingerprint):
+    """源码、验证策略和解释器字节码版本共同决定缓存键"""
+    digest = hashlib.sha256()
+    digest.update(importlib.util.MAGIC_NUMBER)
+    digest.update(policy_fingerprint.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CompiledCodeCache:
+    """
+    已验证代码对象的 LRU 缓存。
+
+    Args:
+        max_entries: 内存中最多保留的代码对象数量。
+        directory: 磁盘缓存目录，None 表示只使用内存。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=DEFAULT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: (code_obj, validation_seconds)}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.validation_seconds = 0.0
+        self.saved_seconds = 0.0
+
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def get(self, key):
+        """
+        返回 (code_obj, validation_seconds)，未命中时返回 None。
+        validation_seconds 是该代码首次验证时花费的时间，即这次命中节省的时间。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry
+
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self.saved_seconds += entry[1]
+            self._store(key, entry)
+            return entry
+
+    def put(self, key, code_obj, validation_seconds):
+        """缓存一个通过验证的代码对象"""
+        entry = (code_obj, validation_seconds)
+        with self._lock:
+            self.validation_seconds += validation_seconds
+            self._store(key, entry)
+        self._save(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回命中率和节省的验证时间（毫秒）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "validation_ms": self.validation_seconds * 1000,
+                "saved_ms": self.saved_seconds * 1000,
+            }
+
+    # --- 磁盘存储 ---
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".marshal")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                validation_seconds, code_obj = marshal.load(f)
+            return code_obj, validation_seconds
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _save(self, key, entry):
+        if not self.directory:
+            return
+        code_obj, validation_seconds = entry
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".code_")
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump((validation_seconds, code_obj), f)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            pass
+
+
+_cache_lock = threading.Lock()
+_shared_cache = None
+
+
+def get_code_cache():
+    """返回进程内共享的代码缓存（每个沙盒工作进程各有一份内存缓存，磁盘缓存共享）"""
+    global _shared_cache
+    with _cache_lock:
+        if _shared_cache is None:
+            _shared_cache = CompiledCodeCache()
+        return _shared_cache
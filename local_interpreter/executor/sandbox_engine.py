@@ -0,0 +1,821 @@
+# local_interpreter/executor/sandbox_engine.py
+# 沙盒引擎：解析、验证、编译并在资源限制下执行不受信任的代码。
+# 允许的模块、禁止的属性/调用、可用的内置函数以及资源限制都由 SandboxPolicy 描述，
+# 解释器（code_executor）和 package/quarantine 共用这一个引擎，只是策略不同。
+import ast
+import dis
+import opcode
+import os
+import signal
+import sys
+import threading
+import time
+from collections.abc import Mapping
+
+from .code_cache import cache_key, get_code_cache
+
+class SandboxError(Exception):
+    """沙盒执行错误基类"""
+    pass
+
+class SecurityError(SandboxError):
+    """安全违规错误"""
+    pass
+
+class TimeoutError(SandboxError):
+    """执行超时错误"""
+    pass
+
+class ResourceLimitError(SandboxError):
+    """资源限制错误"""
+    pass
+
+class SandboxPolicy:
+    """
+    沙盒策略：描述代码可以使用什么，以及可以消耗多少资源。
+
+    所有集合都是 frozenset，策略可以安全地在多个 Sandbox 之间共享；
+    需要调整时用 replace() 派生一个新策略，例如
+    ``DEFAULT_POLICY.replace(forbidden_modules=DEFAULT_POLICY.forbidden_modules | {'os'})``。
+
+    Args:
+        allowed_modules: 运行时允许导入的模块白名单。
+        module_attributes: {模块名: 允许 from-import 的属性集合}。
+        forbidden_modules: 在 AST 阶段就拒绝导入的模块。
+        forbidden_calls: 禁止调用的函数/方法名。
+        forbidden_attributes: 禁止访问的属性名（也作用于 getattr/setattr/delattr）。
+        allowed_builtins: 执行环境中可用的内置函数名。
+        memory_limit: 内存限制（字节）。
+        instruction_limit: opcode 模式下的操作码数 / line 模式下的行数上限。
+        budget_mode: 指令预算的计量方式，见 BUDGET_MODES。
+        cpu_time_limit: cpu 模式下允许使用的 CPU 时间（秒）。
+    """
+
+    FIELDS = (
+        'allowed_modules', 'module_attributes', 'forbidden_modules', 'forbidden_calls',
+        'forbidden_attributes', 'allowed_builtins', 'memory_limit', 'instruction_limit',
+        'budget_mode', 'cpu_time_limit',
+    )
+
+    def __init__(self, allowed_modules, module_attributes, forbidden_modules, forbidden_calls,
+                 forbidden_attributes, allowed_builtins, memory_limit=100*1024*1024,
+                 instruction_limit=1000000, budget_mode='opcode', cpu_time_limit=5):
+        if budget_mode not in BUDGET_MODES:
+            raise ValueError(f"未知的预算模式: {budget_mode}")
+        self.allowed_modules = frozenset(allowed_modules)
+        self.module_attributes = {name: frozenset(attrs) for name, attrs in module_attributes.items()}
+        self.forbidden_modules = frozenset(forbidden_modules)
+        self.forbidden_calls = frozenset(forbidden_calls)
+        self.forbidden_attributes = frozenset(forbidden_attributes)
+        self.allowed_builtins = frozenset(allowed_builtins)
+        self.memory_limit = memory_limit
+        self.instruction_limit = instruction_limit
+        self.budget_mode = budget_mode
+        self.cpu_time_limit = cpu_time_limit
+
+    def replace(self, **changes):
+        """返回修改了部分字段的新策略"""
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"未知的策略字段: {', '.join(sorted(unknown))}")
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        values.update(changes)
+        return SandboxPolicy(**values)
+
+    def __repr__(self):
+        return (f"SandboxPolicy(modules={len(self.allowed_modules)}, "
+                f"forbidden_modules={sorted(self.forbidden_modules)}, "
+                f"memory_limit={self.memory_limit}, instruction_limit={self.instruction_limit}, "
+                f"budget_mode={self.budget_mode!r})")
+
+
+# 指令预算的计量方式：
+# - opcode: sys.settrace 逐个操作码计数，最精确，开销最大（通常慢一个数量级以上）
+# - line:   只对行事件计数，instruction_limit 表示可执行的行数，开销明显更低
+# - cpu:    不跟踪执行，用 ITIMER_VIRTUAL 信号限制 CPU 时间（cpu_time_limit 秒），几乎没有开销；
+#           信号只能在主线程处理，因此要求 timeout=None 且在主线程执行（例如沙盒工作进程中），
+#           否则退回到 line
+# - none:   不限制（仍受墙钟超时约束）
+BUDGET_MODES = ('opcode', 'line', 'cpu', 'none')
+
+# 默认策略：解释器执行 LLM 生成代码时使用
+DEFAULT_POLICY = SandboxPolicy(
+    allowed_modules={
+        'math', 'cmath', 'decimal', 'fractions', 'random', 'statistics',
+        'datetime', 'calendar', 'collections', 'heapq', 'bisect', 'array',
+        'queue', 'itertools', 'functools', 'operator', 'copy', 'pprint',
+        'string', 're', 'json', 'struct', 'hashlib', 'hmac', 'secrets',
+        'time', 'threading', 'contextlib', 'abc', 'atexit', 'logging',
+        'typing', 'enum', 'numbers', 'html', 'xml', 'unicodedata', 'base64',
+        'zlib', 'gzip', 'bz2', 'lzma', 'zipfile', 'tarfile', 'csv', 'configparser',
+        'argparse', 'getopt', 'readline', 'getpass', 'cmd', 'shlex', 'sysconfig',
+    },
+    module_attributes={
+        'sys': {'version', 'version_info', 'platform', 'argv', 'path', 'modules'},
+        'os': {'name', 'environ', 'pathsep', 'sep', 'linesep'},
+    },
+    forbidden_modules={
+        'io', 'socket', 'subprocess', 'ctypes', 'mmap', 'fcntl', 'select', 'selectors',
+        'signal', 'resource', 'pwd', 'grp', 'termios', 'tty', 'pty', 'posix', 'nt',
+        '_winreg', 'winreg', 'msvcrt',
+    },
+    forbidden_calls={
+        'eval', 'exec', 'execfile', 'compile', 'input', 'open',
+        'exit', 'quit', 'help', 'license', 'copyright', 'credits',
+    },
+    forbidden_attributes={
+        '__subclasses__', '__bases__', '__mro__', '__class__', '__dict__',
+        '__globals__', '__closure__', '__code__', '__func__', '__self__',
+        '__module__', '__builtins__', '__import__', '__getattribute__',
+        '__getattr__', '__setattr__', '__delattr__', '__dir__', '__get__',
+        '__set__', '__delete__', '__slots__', '__weakref__', '__next__',
+        '__enter__', '__exit__', '__aenter__', '__aexit__', '__iter__',
+        '__anext__', '__await__', '__call__', '__new__', '__init__',
+        '__init_subclass__', '__prepare__', '__instancecheck__',
+        '__subclasscheck__', '__getitem__', '__setitem__', '__delitem__',
+        '__contains__', '__len__', '__reversed__', '__add__',
+        '__sub__', '__mul__', '__matmul__', '__truediv__', '__floordiv__',
+        '__mod__', '__divmod__', '__pow__', '__lshift__', '__rshift__',
+        '__and__', '__xor__', '__or__', '__radd__', '__rsub__', '__rmul__',
+        '__rmatmul__', '__rtruediv__', '__rfloordiv__', '__rmod__',
+        '__rdivmod__', '__rpow__', '__rlshift__', '__rrshift__', '__rand__',
+        '__rxor__', '__ror__', '__iadd__', '__isub__', '__imul__',
+        '__imatmul__', '__itruediv__', '__ifloordiv__', '__imod__',
+        '__ipow__', '__ilshift__', '__irshift__', '__iand__', '__ixor__',
+        '__ior__', '__neg__', '__pos__', '__abs__', '__invert__', '__complex__',
+        '__int__', '__float__', '__index__', '__round__', '__trunc__',
+        '__floor__', '__ceil__', '__bool__', '__hash__', '__str__',
+        '__repr__', '__bytes__', '__format__', '__lt__', '__le__', '__eq__',
+        '__ne__', '__gt__', '__ge__', '__getnewargs__', '__getnewargs_ex__',
+        '__getstate__', '__setstate__', '__reduce__', '__reduce_ex__',
+        '__sizeof__', '__subclasshook__',
+    },
+    allowed_builtins={
+        'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray', 'bytes', 'chr',
+        'complex', 'dict', 'dir', 'divmod', 'enumerate', 'filter', 'float', 'format',
+        'frozenset', 'hash', 'hex', 'int', 'isinstance', 'issubclass', 'iter',
+        'len', 'list', 'map', 'max', 'min', 'next', 'oct', 'ord', 'pow', 'print',
+        'range', 'repr', 'reversed', 'round', 'set', 'slice', 'sorted', 'str', 'sum',
+        'tuple', 'type', 'zip', 'hasattr', 'getattr', 'setattr', 'delattr',
+        'property', 'staticmethod', 'classmethod', 'super', 'id', 'vars', 'locals', 'globals',
+    },
+)
+
+
+class RestrictedBuiltins(Mapping):
+    """受限制的内置函数集合，只包含策略允许的名称"""
+    def __init__(self, policy=None, importer_func=None):
+        policy = policy or DEFAULT_POLICY
+        self.forbidden_attributes = policy.forbidden_attributes
+
+        def safe_getattr(obj, name, *args):
+            if name in self.forbidden_attributes:
+                raise SecurityError(f"禁止通过 getattr 访问属性: {name}")
+            return getattr(obj, name, *args)
+
+        def safe_setattr(obj, name, value):
+            if name in self.forbidden_attributes:
+                raise SecurityError(f"禁止通过 setattr 设置属性: {name}")
+            setattr(obj, name, value)
+
+        def safe_delattr(obj, name):
+            if name in self.forbidden_attributes:
+                raise SecurityError(f"禁止通过 delattr 删除属性: {name}")
+            delattr(obj, name)
+
+        # 允许的安全内置函数白名单
+        self._safe_builtins = {
+            'abs': abs, 'all': all, 'any': any, 'ascii': ascii, 'bin': bin,
+            'bool': bool, 'bytearray': bytearray, 'bytes': bytes, 'chr': chr,
+            'complex': complex, 'dict': dict, 'dir': dir, 'divmod': divmod,
+            'enumerate': enumerate, 'filter': filter, 'float': float, 'format': format,
+            'frozenset': frozenset, 'hash': hash, 'hex': hex, 'int': int,
+            'isinstance': isinstance, 'issubclass': issubclass, 'iter': iter,
+            'len': len, 'list': list, 'map': map, 'max': max, 'min': min,
+            'next': next, 'oct': oct, 'ord': ord, 'pow': pow, 'print': print,
+            'range': range, 'repr': repr, 'reversed': reversed, 'round': round,
+            'set': set, 'slice': slice, 'sorted': sorted, 'str': str, 'sum': sum,
+            'tuple': tuple, 'type': type, 'zip': zip,
+            'hasattr': hasattr,
+            'getattr': safe_getattr,
+            'setattr': safe_setattr,
+            'delattr': safe_delattr,
+            'property': property, 'staticmethod': staticmethod, 'classmethod': classmethod,
+            'super': super, 'id': id, 'vars': vars, 'locals': locals, 'globals': globals,
+            '__build_class__': __build_class__, '__name__': '__main__', '__debug__': __debug__,
+            '__import__': importer_func or SafeImporter(policy.allowed_modules,
+                                                        policy.module_attributes).import_module,
+        }
+        # 按策略过滤；__build_class__、__import__ 等解释器自身需要的名称始终保留
+        self._safe_builtins = {
+            name: value for name, value in self._safe_builtins.items()
+            if name in policy.allowed_builtins or name.startswith('__')
+        }
+    
+    def __getitem__(self, key):
+        if key in self._safe_builtins:
+            return self._safe_builtins[key]
+        raise SecurityError(f"访问受限内置函数 '{key}'")
+    
+    def __iter__(self):
+        return iter(self._safe_builtins)
+    
+    def __len__(self):
+        return len(self._safe_builtins)
+
+class SafeImporter:
+    """安全的模块导入器"""
+    def __init__(self, allowed_modules=None, module_attributes=None):
+        # 允许导入的模块白名单（复制一份，调整某个实例不会影响共享的策略）
+        self.allowed_modules = set(DEFAULT_POLICY.allowed_modules if allowed_modules is None
+                                   else allowed_modules)
+        
+        # 模块特定的允许属性
+        self.module_attributes = dict(DEFAULT_POLICY.module_attributes if module_attributes is None
+                                      else module_attributes)
+    
+    def import_module(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """安全的模块导入函数"""
+        # 检查模块是否允许导入
+        if name not in self.allowed_modules:
+            raise SecurityError(f"禁止导入模块: {name}")
+        
+        # 实际导入模块
+        module = __import__(name, globals, locals, fromlist, level)
+        
+        # 如果是从模块导入特定属性，检查这些属性是否允许
+        if fromlist:
+            for attr in fromlist:
+                if attr.startswith('_'):
+                    raise SecurityError(f"禁止访问以下划线开头的属性: {attr}")
+                
+                # 检查模块特定的属性限制
+                if name in self.module_attributes and attr not in self.module_attributes[name]:
+                    raise SecurityError(f"禁止从模块 {name} 导入属性: {attr}")
+        
+        return module
+
+class ASTValidator(ast.NodeVisitor):
+    """AST 验证器，用于检查和限制代码结构"""
+    
+    def __init__(self, policy=None):
+        policy = policy or DEFAULT_POLICY
+        # 允许的节点类型白名单
+        self.allowed_nodes = {
+            # 模块和函数定义
+            ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+            
+            # 控制流
+            ast.If, ast.For, ast.AsyncFor, ast.While, ast.Break, ast.Continue,
+            ast.Try, ast.With, ast.AsyncWith, ast.Raise, ast.Assert, ast.Pass,
+            
+            # 作用域和变量
+            ast.Global, ast.Nonlocal, ast.Delete, ast.Assign, ast.AugAssign, ast.AnnAssign,
+            ast.NamedExpr,
+            
+            # 表达式
+            ast.Expr, ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare, ast.Call,
+            ast.IfExp, ast.Attribute, ast.Subscript, ast.Starred, ast.Name, ast.Constant,
+            ast.JoinedStr, ast.FormattedValue,
+            
+            # 集合
+            ast.List, ast.Tuple, ast.Set, ast.Dict, ast.ListComp, ast.SetComp,
+            ast.DictComp, ast.GeneratorExp,
+            
+            # 其他
+            ast.Slice, ast.Index, ast.ExtSlice, ast.comprehension, ast.arguments,
+            ast.arg, ast.keyword, ast.alias, ast.withitem, ast.excepthandler,
+        }
+        
+        # 禁止的节点类型黑名单
+        self.forbidden_nodes = {
+            ast.Yield, ast.YieldFrom, ast.Await,  # 生成器和协程
+        }
+        
+        # 禁止导入的模块、禁止调用的函数和禁止访问的属性来自策略
+        self.forbidden_modules = set(policy.forbidden_modules)
+        self.forbidden_calls = set(policy.forbidden_calls)
+        self.forbidden_attributes = set(policy.forbidden_attributes)
+    
+    def validate(self, node):
+        """验证 AST 节点"""
+        if type(node) not in self.allowed_nodes:
+            raise SecurityError(f"禁止的语法结构: {type(node).__name__}")
+        
+        if type(node) in self.forbidden_nodes:
+            raise SecurityError(f"明确禁止的语法结构: {type(node).__name__}")
+        
+        self.generic_visit(node)
+    
+    def visit_Import(self, node):
+        """检查导入语句"""
+        for alias in node.names:
+            if alias.name.startswith('_'):
+                raise SecurityError(f"禁止导入以下划线开头的模块: {alias.name}")
+            
+            # 检查模块黑名单
+            if alias.name in self.forbidden_modules:
+                raise SecurityError(f"禁止导入模块: {alias.name}")
+        
+        self.generic_visit(node)
+    
+    def visit_ImportFrom(self, node):
+        """检查从模块导入语句"""
+        if node.module and node.module.startswith('_'):
+            raise SecurityError(f"禁止从以下划线开头的模块导入: {node.module}")
+        
+        # 检查模块黑名单
+        if node.module in self.forbidden_modules:
+            raise SecurityError(f"禁止从模块导入: {node.module}")
+        
+        # 检查导入的属性
+        for alias in node.names:
+            if alias.name.startswith('_'):
+                raise SecurityError(f"禁止导入以下划线开头的属性: {alias.name}")
+            
+            if alias.name in self.forbidden_attributes:
+                raise SecurityError(f"禁止导入属性: {alias.name}")
+        
+        self.generic_visit(node)
+    
+    def visit_Call(self, node):
+        """检查函数调用"""
+        # 检查直接调用危险函数
+        if isinstance(node.func, ast.Name):
+            if node.func.id in self.forbidden_calls:
+                raise SecurityError(f"禁止调用函数: {node.func.id}")
+        
+        # 检查调用危险方法
+        if isinstance(node.func, ast.Attribute):
+            if node.func.attr in self.forbidden_calls:
+                raise SecurityError(f"禁止调用方法: {node.func.attr}")
+            
+            if node.func.attr in self.forbidden_attributes:
+                raise SecurityError(f"禁止调用方法: {node.func.attr}")
+        
+        self.generic_visit(node)
+    
+    def visit_Attribute(self, node):
+        """检查属性访问"""
+        if node.attr in self.forbidden_attributes:
+            raise SecurityError(f"禁止访问属性: {node.attr}")
+        
+        self.generic_visit(node)
+
+class BytecodeValidator:
+    """字节码验证器，用于检查和过滤危险操作码"""
+    
+    def __init__(self):
+        # Build the list of allowed opcodes dynamically to support multiple Python versions.
+        allowed_op_names = [
+            'POP_TOP', 'ROT_TWO', 'ROT_THREE', 'ROT_FOUR', 'DUP_TOP', 'DUP_TOP_TWO', 'NOP',
+            'UNARY_POSITIVE', 'UNARY_NEGATIVE', 'UNARY_NOT', 'UNARY_INVERT',
+            'BINARY_POWER', 'BINARY_MULTIPLY', 'BINARY_FLOOR_DIVIDE', 'BINARY_TRUE_DIVIDE',
+            'BINARY_MODULO', 'BINARY_ADD', 'BINARY_SUBTRACT', 'BINARY_SUBSCR',
+            'BINARY_LSHIFT', 'BINARY_RSHIFT', 'BINARY_AND', 'BINARY_XOR', 'BINARY_OR',
+            'INPLACE_ADD', 'INPLACE_SUBTRACT', 'INPLACE_MULTIPLY', 'INPLACE_FLOOR_DIVIDE',
+            'INPLACE_TRUE_DIVIDE', 'INPLACE_MODULO', 'INPLACE_POWER', 'INPLACE_LSHIFT',
+            'INPLACE_RSHIFT', 'INPLACE_AND', 'INPLACE_XOR', 'INPLACE_OR',
+            'STORE_SUBSCR', 'DELETE_SUBSCR', 'GET_ITER', 'GET_YIELD_FROM_ITER',
+            'PRINT_EXPR', 'LOAD_BUILD_CLASS', 'YIELD_FROM', 'SET_ADD', 'LIST_APPEND',
+            'MAP_ADD', 'LOAD_CONST', 'LOAD_NAME', 'STORE_NAME', 'LOAD_GLOBAL', 'LOAD_ATTR',
+            'COMPARE_OP', 'IMPORT_NAME', 'IMPORT_FROM', 'JUMP_FORWARD', 'JUMP_BACKWARD',
+            'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP', 'JUMP_ABSOLUTE',
+            'POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE', 'LOAD_FAST', 'STORE_FAST',
+            'DELETE_FAST', 'LOAD_CLOSURE', 'LOAD_DEREF', 'STORE_DEREF', 'DELETE_DEREF',
+            'RAISE_VARARGS', 'CALL', 'CALL_FUNCTION', 'CALL_FUNCTION_KW', 'CALL_FUNCTION_EX',
+            'LOAD_METHOD', 'CALL_METHOD', 'LIST_EXTEND', 'SET_UPDATE', 'DICT_UPDATE',
+            'DICT_MERGE', 'FORMAT_VALUE', 'BUILD_CONST_KEY_MAP', 'BUILD_STRING',
+            'BUILD_TUPLE', 'BUILD_LIST', 'BUILD_SET', 'BUILD_MAP', 'SETUP_ANNOTATIONS',
+            'LOAD_ASSERTION_ERROR', 'LIST_TO_TUPLE', 'RETURN_CONST', 'BINARY_OP',
+            # Python 3.9+
+            'IS_OP', 'CONTAINS_OP', 'JUMP_IF_NOT_EXC_MATCH', 'RERAISE', 'GEN_START',
+            # Python 3.10+
+            'ROT_FOUR',
+            # Python 3.11+
+            'PUSH_NULL', 'PRECALL', 'RESUME', 'RETURN_GENERATOR', 'SEND',
+            'SWAP', 'COPY', 'CACHE', 'PUSH_EXC_INFO', 'CHECK_EXC_MATCH',
+            'RETURN_VALUE', 'KW_NAMES', 'MAKE_FUNCTION', 'MAKE_CELL', 'COPY_FREE_VARS',
+            'UNPACK_SEQUENCE', 'UNPACK_EX', 'BUILD_SLICE', 'BEFORE_WITH', 'EXTENDED_ARG',
+            'STORE_ATTR', 'STORE_GLOBAL', 'DELETE_NAME', 'DELETE_GLOBAL', 'LOAD_CLASSDEREF',
+            'LOAD_FAST_CHECK', 'JUMP_BACKWARD_NO_INTERRUPT',
+            'POP_JUMP_FORWARD_IF_FALSE', 'POP_JUMP_FORWARD_IF_TRUE',
+            'POP_JUMP_BACKWARD_IF_FALSE', 'POP_JUMP_BACKWARD_IF_TRUE',
+            'POP_JUMP_FORWARD_IF_NONE', 'POP_JUMP_FORWARD_IF_NOT_NONE',
+            'POP_JUMP_BACKWARD_IF_NONE', 'POP_JUMP_BACKWARD_IF_NOT_NONE',
+            # Python 3.12+
+            'END_FOR', 'BINARY_SLICE', 'STORE_SLICE', 'POP_JUMP_IF_NONE', 'POP_JUMP_IF_NOT_NONE',
+            'CALL_INTRINSIC_1', 'LOAD_FAST_LOAD_FAST', 'LOAD_SUPER_ATTR',
+            # Other
+            'LOAD_FAST_AND_CLEAR'
+        ]
+        self.allowed_opcodes = {
+            op for op_name in allowed_op_names if (op := opcode.opmap.get(op_name)) is not None
+        }
+        
+        # For Python 3.8, use opcode.opmap.get to avoid errors on missing opcodes
+        _forbidden_op_names = [
+            'IMPORT_STAR',  # 禁止 from module import *
+            'EXEC_STMT',    # (Python 2) 禁止 exec 语句
+        ]
+        self.forbidden_opcodes = {
+            op for op_name in _forbidden_op_names if (op := opcode.opmap.get(op_name)) is not None
+        }
+
+        # Add opcodes needed for control flow to the allowed list
+        # Opcodes for loops, try/except, with statements
+        control_flow_opcodes = [
+            'FOR_ITER',
+            'SETUP_LOOP', 'BREAK_LOOP', 'CONTINUE_LOOP',
+            'SETUP_EXCEPT', 'POP_EXCEPT', 'SETUP_FINALLY', 'END_FINALLY',
+            'SETUP_WITH', 'WITH_EXCEPT_START', 'POP_BLOCK',
+            'GET_AWAITABLE', 'GET_AITER', 'GET_ANEXT', 'END_ASYNC_FOR',
+            'BEFORE_ASYNC_WITH', 'SETUP_ASYNC_WITH', 'GET_AEXIT_CORO'
+        ]
+        for op_name in control_flow_opcodes:
+            if (op := opcode.opmap.get(op_name)) is not None:
+                self.allowed_opcodes.add(op)
+    
+    def validate(self, code_obj):
+        """验证字节码"""
+        instructions = dis.get_instructions(code_obj)
+        
+        for instr in instructions:
+            if instr.opcode in self.forbidden_opcodes:
+                raise SecurityError(f"禁止的操作码: {instr.opname}")
+            
+            if instr.opcode not in self.allowed_opcodes:
+                raise SecurityError(f"不允许的操作码: {instr.opname}")
+
+def read_memory_usage():
+    """
+    返回当前进程的 (常驻内存, 虚拟内存) 字节数。
+
+    Linux 上读取 /proc/self/statm，开销只有几微秒；其他平台退回到 getrusage 的峰值常驻内存，
+    无法获取时对应项为 None。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            size, resident = f.read().split()[:2]
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        return int(resident) * page_size, int(size) * page_size
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return (max_rss if sys.platform == 'darwin' else max_rss * 1024), None
+
+
+class ResourceMonitor(threading.Thread):
+    """
+    资源监视器，用于监控代码执行的资源使用情况。
+
+    内存按执行开始以来常驻内存（RSS）的增量计算，每个 interval 采样一次并记录峰值。
+    监视线程无法直接中断被执行的代码，超限时记录在 error 中：跟踪模式下由 count_instruction
+    抛出，其余情况在执行结束后由 Sandbox 抛出；工作进程中另有地址空间 rlimit 作为硬限制。
+    """
+    
+    def __init__(self, interval=0.1, memory_limit=100*1024*1024, instruction_limit=1000000):
+        super().__init__()
+        self.interval = interval
+        self.memory_limit = memory_limit
+        self.instruction_limit = instruction_limit
+        self.stop_event = threading.Event()
+        self.instruction_count = 0
+        self.max_memory = 0
+        self.error = None
+        self.daemon = True
+        self._baseline_memory = None
+        self._watched_thread = None
+        self._last_instruction_count = -1
+    
+    def watch_for_stalls(self, thread_ident):
+        """
+        line 预算模式使用：单行循环（如 while True: pass）不会产生新的行事件，
+        若计数在一个监控周期内没有变化，则为该线程当前的帧开启 opcode 事件，使其继续消耗预算。
+        """
+        self._watched_thread = thread_ident
+
+    def _check_stall(self):
+        if self._watched_thread is None:
+            return
+        if self.instruction_count == self._last_instruction_count:
+            frame = sys._current_frames().get(self._watched_thread)
+            if frame is not None and frame.f_trace is not None:
+                frame.f_trace_opcodes = True
+        self._last_instruction_count = self.instruction_count
+
+    def run(self):
+        """监控资源使用"""
+        while not self.stop_event.wait(self.interval):
+            self._check_stall()
+            self._sample_memory()
+
+    def start(self):
+        """记录内存基线后开始监控"""
+        self._baseline_memory = read_memory_usage()[0]
+        super().start()
+
+    def stop(self):
+        """停止监控，并做最后一次内存采样"""
+        self.stop_event.set()
+        self._sample_memory()
+
+    def _sample_memory(self):
+        current_memory = self.get_memory_usage()
+        self.max_memory = max(self.max_memory, current_memory)
+        if current_memory > self.memory_limit and self.error is None:
+            self.error = ResourceLimitError(f"内存使用超过限制: {current_memory} > {self.memory_limit}")
+    
+    def get_memory_usage(self):
+        """获取执行开始以来新增的常驻内存（字节）"""
+        current, _ = read_memory_usage()
+        if current is None or self._baseline_memory is None:
+            return 0
+        return max(0, current - self._baseline_memory)
+    
+    def count_instruction(self):
+        """计数指令执行"""
+        if self.error is not None:
+            raise self.error
+        self.instruction_count += 1
+        if self.instruction_count > self.instruction_limit:
+            raise ResourceLimitError(f"指令执行超过限制: {self.instruction_count} > {self.instruction_limit}")
+
+class Sandbox:
+    """Python 沙盒执行环境"""
+    
+    def __init__(self, timeout=30, memory_limit=None, instruction_limit=None, budget_mode=None,
+                 cpu_time_limit=None, address_space_limit=False, code_cache=True, policy=None):
+        """
+        Args:
+            timeout: 墙钟超时（秒）；为 None 时在调用线程中直接执行，由调用方（工作进程池）负责超时。
+            memory_limit: 内存限制（字节），默认取自策略。
+            instruction_limit: opcode 模式下的操作码数 / line 模式下的行数上限，默认取自策略。
+            budget_mode: 指令预算的计量方式，见 BUDGET_MODES，默认取自策略。
+            cpu_time_limit: cpu 模式下允许使用的 CPU 时间（秒），默认取自策略。
+            address_space_limit: 为 True 时在执行期间用 RLIMIT_AS 把进程的地址空间限制为
+                当前大小 + memory_limit，超出时分配直接失败。会影响整个进程，只应在沙盒工作进程中使用。
+            code_cache: 已验证代码对象的缓存；True 使用进程内共享的缓存，None/False 不缓存。
+            policy: SandboxPolicy，默认为 DEFAULT_POLICY。
+        """
+        self.policy = policy or DEFAULT_POLICY
+        budget_mode = budget_mode or self.policy.budget_mode
+        if budget_mode not in BUDGET_MODES:
+            raise ValueError(f"未知的预算模式: {budget_mode}")
+        self.timeout = timeout
+        self.memory_limit = self.policy.memory_limit if memory_limit is None else memory_limit
+        self.instruction_limit = self.policy.instruction_limit if instruction_limit is None else instruction_limit
+        self.budget_mode = budget_mode
+        self.cpu_time_limit = self.policy.cpu_time_limit if cpu_time_limit is None else cpu_time_limit
+        self.address_space_limit = address_space_limit
+        self.code_cache = get_code_cache() if code_cache is True else (code_cache or None)
+        # 最近一次执行的资源使用情况：peak_memory（字节）、elapsed（秒）、instructions，
+        # 以及代码缓存是否命中（code_cache_hit）和验证耗时/节省的时间（validation_seconds/validation_saved）
+        self.last_stats = {}
+        self._compile_stats = {}
+        self.ast_validator = ASTValidator(self.policy)
+        self.bytecode_validator = BytecodeValidator()
+        self.importer = SafeImporter(self.policy.allowed_modules, self.policy.module_attributes)
+        self.resource_monitor = None
+    
+    def _start_budget(self):
+        """在执行代码的线程中安装指令预算，返回用于卸载的函数"""
+        mode = self.budget_mode
+        if mode == 'cpu' and not (hasattr(signal, 'setitimer')
+                                  and threading.current_thread() is threading.main_thread()):
+            mode = 'line'
+
+        if mode == 'none':
+            return lambda: None
+
+        if mode == 'cpu':
+            limit = self.cpu_time_limit
+
+            def on_cpu_limit(signum, frame):
+                raise ResourceLimitError(f"CPU 时间超过限制: {limit}秒")
+
+            previous_handler = signal.signal(signal.SIGVTALRM, on_cpu_limit)
+            # 超限后每 10ms 重复触发，代码即使捕获了异常也无法继续运行
+            signal.setitimer(signal.ITIMER_VIRTUAL, limit, 0.01)
+
+            def stop():
+                signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+                signal.signal(signal.SIGVTALRM, previous_handler)
+            return stop
+
+        count_instruction = self.resource_monitor.count_instruction
+        if mode == 'opcode':
+            def trace_dispatch(frame, event, arg):
+                if event == 'opcode':
+                    count_instruction()
+                elif event == 'call':
+                    # 只有开启 f_trace_opcodes 后才会产生 opcode 事件
+                    frame.f_trace_opcodes = True
+                return trace_dispatch
+        else:
+            def trace_dispatch(frame, event, arg):
+                # opcode 事件只会出现在被 ResourceMonitor 判定为停滞的帧上
+                if event == 'line' or event == 'opcode':
+                    count_instruction()
+                return trace_dispatch
+            self.resource_monitor.watch_for_stalls(threading.get_ident())
+
+        # count_instruction 超限时抛出的 ResourceLimitError 会中断正在执行的代码
+        sys.settrace(trace_dispatch)
+        return lambda: sys.settrace(None)
+
+    def _apply_address_space_limit(self):
+        """设置 RLIMIT_AS 硬性内存限制，返回用于恢复的函数"""
+        if not self.address_space_limit:
+            return lambda: None
+        try:
+            import resource
+        except ImportError:
+            return lambda: None
+        _, virtual_memory = read_memory_usage()
+        if virtual_memory is None:
+            return lambda: None
+
+        previous = resource.getrlimit(resource.RLIMIT_AS)
+        limit = virtual_memory + self.memory_limit
+        if previous[1] != resource.RLIM_INFINITY:
+            limit = min(limit, previous[1])
+        resource.setrlimit(resource.RLIMIT_AS, (limit, previous[1]))
+        return lambda: resource.setrlimit(resource.RLIMIT_AS, previous)
+
+    def create_restricted_globals(self):
+        """创建受限制的全局变量环境"""
+        restricted_globals = {
+            # CPython 在执行 import 等操作时直接按 dict 读取 __builtins__，
+            # 因此传入普通 dict；不在白名单中的名称照常引发 NameError
+            '__builtins__': dict(RestrictedBuiltins(self.policy, self.importer.import_module)),
+            '__name__': '__main__',
+            '__file__': None,
+            '__package__': None,
+            '__doc__': None,
+            '__loader__': None,
+            '__spec__': None,
+            '__import__': self.importer.import_module,
+        }
+        return restricted_globals
+    
+    def policy_fingerprint(self):
+        """验证策略的指纹：验证器的白名单/黑名单变化后，缓存的代码对象不再有效"""
+        validator = self.ast_validator
+        parts = [
+            sorted(node.__name__ for node in validator.allowed_nodes),
+            sorted(node.__name__ for node in validator.forbidden_nodes),
+            sorted(validator.forbidden_modules),
+            sorted(validator.forbidden_calls),
+            sorted(validator.forbidden_attributes),
+            sorted(self.bytecode_validator.allowed_opcodes),
+            sorted(self.bytecode_validator.forbidden_opcodes),
+        ]
+        return repr(parts)
+
+    def compile(self, code):
+        """
+        解析、验证并编译代码，返回通过验证的代码对象。
+
+        通过验证的代码对象按源码和验证策略缓存在 code_cache 中，重复的代码会跳过全部验证。
+
+        Raises:
+            SandboxError: 语法或编译错误
+            SecurityError: 如果检测到安全违规
+        """
+        key = None
+        if self.code_cache is not None:
+            key = cache_key(code, self.policy_fingerprint())
+            cached = self.code_cache.get(key)
+            if cached is not None:
+                code_obj, validation_seconds = cached
+                self._compile_stats = {'code_cache_hit': True, 'validation_seconds': 0.0,
+                                       'validation_saved': validation_seconds}
+                return code_obj
+
+        start_time = time.perf_counter()
+        # 解析代码为AST
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            raise SandboxError(f"语法错误: {e}")
+        
+        # 验证AST
+        self.ast_validator.validate(tree)
+        
+        # 编译AST
+        try:
+            code_obj = compile(tree, '<string>', 'exec')
+        except Exception as e:
+            raise SandboxError(f"编译错误: {e}")
+        
+        # 验证字节码
+        self.bytecode_validator.validate(code_obj)
+
+        validation_seconds = time.perf_counter() - start_time
+        self._compile_stats = {'code_cache_hit': False, 'validation_seconds': validation_seconds,
+                               'validation_saved': 0.0}
+        if key is not None:
+            self.code_cache.put(key, code_obj, validation_seconds)
+        return code_obj
+
+    def execute(self, code, globals_dict=None, locals_dict=None):
+        """
+        在沙盒中执行代码
+        
+        Args:
+            code (str): 要执行的Python代码
+            globals_dict (dict): 全局变量字典，如果为None则使用受限环境
+            locals_dict (dict): 局部变量字典
+        
+        Returns:
+            执行结果
+        
+        Raises:
+            SecurityError: 如果检测到安全违规
+            TimeoutError: 如果执行超时
+            ResourceLimitError: 如果资源使用超过限制
+        """
+        code_obj = self.compile(code)
+        
+        # 准备执行环境
+        if globals_dict is None:
+            globals_dict = self.create_restricted_globals()
+        
+        if locals_dict is None:
+            locals_dict = globals_dict
+        
+        # 启动资源监控（线程只能启动一次，每次执行使用新的监视器，Sandbox 因此可以复用）
+        self.resource_monitor = ResourceMonitor(
+            memory_limit=self.memory_limit,
+            instruction_limit=self.instruction_limit
+        )
+        self.resource_monitor.start()
+        
+        # 设置执行超时
+        result = None
+        exception = None
+        
+        def run_code():
+            nonlocal result, exception
+            stop_budget = self._start_budget()
+            restore_memory_limit = self._apply_address_space_limit()
+            try:
+                # 执行代码
+                exec(code_obj, globals_dict, locals_dict)
+                result = (globals_dict, locals_dict)
+            except MemoryError:
+                exception = ResourceLimitError(f"内存使用超过限制: {self.memory_limit}")
+            except Exception as e:
+                exception = e
+            finally:
+                restore_memory_limit()
+                stop_budget()
+        
+        start_time = time.perf_counter()
+        
+        if self.timeout is None:
+            # 调用方负责墙钟超时，直接在当前线程执行（cpu 模式依赖这一点）
+            run_code()
+            thread = None
+        else:
+            # 在单独的线程中执行代码
+            thread = threading.Thread(target=run_code)
+            thread.daemon = True
+            thread.start()
+            
+            # 等待执行完成或超时
+            thread.join(self.timeout)
+        
+        # 停止资源监控
+        self.resource_monitor.stop()
+        self.last_stats = dict(
+            self._compile_stats,
+            peak_memory=self.resource_monitor.max_memory,
+            elapsed=time.perf_counter() - start_time,
+            instructions=self.resource_monitor.instruction_count,
+        )
+        
+        # 检查执行结果
+        if thread is not None and thread.is_alive():
+            raise TimeoutError(f"执行超时: {self.timeout}秒")
+        
+        if exception:
+            if isinstance(exception, SecurityError):
+                raise exception
+            elif isinstance(exception, ResourceLimitError):
+                raise exception
+            else:
+                raise SandboxError(f"执行错误: {type(exception).__name__}: {exception}") from exception
+        
+        # 代码已经结束，但监视器在执行期间发现了超限（例如 cpu/none 模式下没有跟踪函数可以中断执行）
+        if self.resource_monitor.error is not None:
+            raise self.resource_monitor.error
+        
+        return result
+
@@ -0,0 +1,79 @@
+# Tests for the validated code object cache used by the sandbox.
+import os
+
+import pytest
+
+from local_interpreter.executor.code_cache import CompiledCodeCache, cache_key
+from local_interpreter.executor.sandbox_engine import DEFAULT_POLICY, Sandbox, SecurityError
+
+
+def _sandbox(cache, policy=None):
+    return Sandbox(timeout=None, code_cache=cache, policy=policy)
+
+
+def test_repeated_code_skips_validation():
+    cache = CompiledCodeCache(max_entries=8, directory=None)
+    sandbox = _sandbox(cache)
+    globals_dict, _ = sandbox.execute("x = 6 * 7")
+    assert globals_dict["x"] == 42
+    assert sandbox.last_stats["code_cache_hit"] is False
+
+    globals_dict, _ = sandbox.execute("x = 6 * 7")
+    assert globals_dict["x"] == 42
+    assert sandbox.last_stats["code_cache_hit"] is True
+    assert sandbox.last_stats["validation_seconds"] == 0.0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_rejected_code_is_never_cached():
+    cache = CompiledCodeCache(max_entries=8, directory=None)
+    sandbox = _sandbox(cache)
+    for _ in range(2):
+        with pytest.raises(SecurityError):
+            sandbox.compile("open('x', 'w')")
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hits"] == 0
+
+
+def test_stricter_policy_does_not_reuse_cached_code():
+    cache = CompiledCodeCache(max_entries=8, directory=None)
+    _sandbox(cache).compile("print(len('abc'))")
+
+    strict = DEFAULT_POLICY.replace(forbidden_calls=DEFAULT_POLICY.forbidden_calls | {"len"})
+    with pytest.raises(SecurityError):
+        _sandbox(cache, strict).compile("print(len('abc'))")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CompiledCodeCache(max_entries=2, directory=None)
+    keys = [cache_key(f"x = {i}", "policy") for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, compile(f"x = {i}", "<string>", "exec"), 0.1)
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], compile("x = 2", "<string>", "exec"), 0.1)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_cache_is_shared_between_instances(tmp_path):
+    first = CompiledCodeCache(directory=str(tmp_path))
+    _sandbox(first).compile("y = sum(range(10))")
+
+    second = CompiledCodeCache(directory=str(tmp_path))
+    sandbox = _sandbox(second)
+    globals_dict, _ = sandbox.execute("y = sum(range(10))")
+    assert globals_dict["y"] == 45
+    assert sandbox.last_stats["code_cache_hit"] is True
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = CompiledCodeCache(directory=str(tmp_path))
+    key = cache_key("z = 1", "policy")
+    os.makedirs(os.path.dirname(cache._path(key)))
+    with open(cache._path(key), "wb") as f:
+        f.write(b"not marshal data")
+    assert cache.get(key) is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,111 @@
+# Tests for persistent interpreter sessions: variables kept between runs, limits and resets.
+import pytest
+
+from local_interpreter.executor.code_executor import LocalSession, SessionNamespace, estimate_size, run_in_sandbox
+from local_interpreter.executor.worker_pool import SandboxWorkerPool
+
+
+def test_estimate_size_counts_nested_and_shared_objects_once():
+    shared = "x" * 1000
+    assert estimate_size([shared, shared]) < estimate_size([shared, "y" * 1000])
+    assert estimate_size({"key": [shared]}) > 1000
+    assert estimate_size(list(range(100000)), limit=1000) < estimate_size(list(range(100000)))
+
+
+def test_namespace_keeps_variables_between_runs():
+    namespace = SessionNamespace()
+    output, success, stats = run_in_sandbox("data = [1, 2, 3]", timeout=None, namespace=namespace)
+    assert success, output
+    assert stats["session"]["variables"] == {"data": "list"}
+
+    output, success, _ = run_in_sandbox("print(sum(data))", timeout=None, namespace=namespace)
+    assert success and output == "6\n"
+
+    namespace.reset()
+    output, success, _ = run_in_sandbox("print(data)", timeout=None, namespace=namespace)
+    assert not success and "NameError" in output
+
+
+def test_namespace_evicts_largest_variables_first():
+    namespace = SessionNamespace(max_bytes=50000, max_variables=10)
+    code = "small = 1\nbig = list(range(20000))\nmedium = 'm' * 1000"
+    output, success, stats = run_in_sandbox(code, timeout=None, namespace=namespace)
+    assert success
+    assert stats["session"]["evicted"] == ["big"]
+    assert "SessionLimit" in output and "big" in output
+    assert set(namespace.variables()) == {"small", "medium"}
+
+    namespace = SessionNamespace(max_variables=2)
+    run_in_sandbox("a = 1\nb = 'b' * 100\nc = 'c' * 10000", timeout=None, namespace=namespace)
+    assert set(namespace.variables()) == {"a", "b"}
+
+
+def test_local_session_reset():
+    session = LocalSession()
+    assert session.execute("x = 41")[1]
+    output, success, _ = session.execute("print(x + 1)")
+    assert success and output == "42\n"
+    session.reset()
+    assert not session.execute("print(x)")[1]
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxWorkerPool(size=1, timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_sessions_are_isolated(pool):
+    first, second = pool.open_session(), pool.open_session()
+    assert first.execute("value = 'first'")[1]
+    assert second.execute("value = 'second'")[1]
+    assert first.execute("print(value)")[0] == "first\n"
+    assert second.execute("print(value)")[0] == "second\n"
+
+    # Plain executions do not see session variables
+    output, success, _ = pool.execute("print(value)")
+    assert not success and "NameError" in output
+
+    first.reset()
+    assert not first.execute("print(value)")[1]
+    assert second.execute("print(value)")[0] == "second\n"
+
+
+def test_timed_out_session_worker_is_replaced(pool):
+    session = pool.open_session()
+    session.execute("kept = 1")
+    output, success, _ = session.execute("while True: pass", timeout=0.5, budget_mode="none")
+    assert not success
+    assert "TimeoutError" in output and "SessionReset" in output
+
+    output, success, _ = session.execute("print(kept)")
+    assert not success and "NameError" in output
+    assert session.execute("print('alive')")[0] == "alive\n"
+
+
+def test_closed_session_rejects_execution(pool):
+    session = pool.open_session()
+    session.close()
+    with pytest.raises(RuntimeError):
+        session.execute("x = 1")
+    assert session not in pool._sessions
+
+
+def test_interpreter_reset_is_reported_on_assistant_side():
+    from local_interpreter.interpreter import Interpreter
+    from package.conversation_history import ConversationHistory
+
+    interpreter = Interpreter.__new__(Interpreter)
+    interpreter.conversation_history = ConversationHistory()
+    interpreter.session = None
+    assert interpreter.reset_session() is False
+    assert len(interpreter.conversation_history) == 0
+
+    interpreter.session = LocalSession()
+    interpreter.session.execute("x = 1")
+    assert interpreter.reset_session() is True
+    assert not interpreter.session.execute("print(x)")[1]
+    messages = interpreter.conversation_history.messages()
+    assert [message["role"] for message in messages] == ["assistant"]
+    assert messages[0]["content"].startswith("Session variables: none")
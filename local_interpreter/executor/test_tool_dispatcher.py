@@ -0,0 +1,71 @@
+# Tests for direct tool dispatch: call ordering, parallel batches and per-call timeouts.
+import threading
+import time
+
+import pytest
+
+from local_interpreter.executor.tool_dispatcher import ToolCall, dispatch_tool_calls, run_tool_code
+from local_interpreter.tools import tool_decorator
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    release = threading.Event()
+
+    def register(name, func, pure=False, io_bound=False):
+        monkeypatch.setitem(tool_decorator.TOOL_REGISTRY, name, {
+            "function": func, "signature": "", "docstring": "", "parameters": {},
+            "pure": pure, "io_bound": io_bound,
+        })
+
+    def echo(text):
+        return text
+
+    def sleepy(seconds):
+        time.sleep(seconds)
+        return "slept"
+
+    def hang():
+        release.wait(10)
+        return "released"
+
+    register("echo", echo, pure=True, io_bound=True)
+    register("sleepy", sleepy, pure=True, io_bound=True)
+    register("hang", hang)
+    yield
+    release.set()
+
+
+def _call(name, **arguments):
+    return ToolCall(f"call_{name}", name, arguments)
+
+
+def test_results_keep_call_order(tools):
+    calls = [_call("sleepy", seconds=0.2), _call("echo", text="a"), _call("echo", text="b")]
+    start = time.perf_counter()
+    results = dispatch_tool_calls(calls)
+    assert [result.output for result in results] == ["slept", "a", "b"]
+    assert time.perf_counter() - start < 0.4
+
+
+def test_sequential_call_times_out(tools):
+    start = time.perf_counter()
+    results = dispatch_tool_calls([_call("hang"), _call("echo", text="after")], timeout=0.2)
+    assert time.perf_counter() - start < 2
+    assert not results[0].success and "timed out" in results[0].output
+    assert results[1].output == "after"
+
+
+def test_parallel_batch_times_out(tools):
+    calls = [_call("echo", text="fast"), _call("sleepy", seconds=2)]
+    results = dispatch_tool_calls(calls, timeout=0.3)
+    assert results[0].success and results[0].output == "fast"
+    assert not results[1].success and "timed out" in results[1].output
+
+
+def test_run_tool_code_stops_at_timeout(tools):
+    output, success, stats = run_tool_code("print(echo('one'))\nhang()\nprint(echo('two'))", timeout=0.2)
+    assert not success
+    assert output.startswith("one\n") and "timed out" in output
+    assert "two" not in output
+    assert stats["tool_calls"] == 2
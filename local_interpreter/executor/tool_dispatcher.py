@@ -0,0 +1,263 @@
+# local_interpreter/executor/tool_dispatcher.py
+# 直接执行工具调用：模型通过 function calling 返回的调用，以及只由工具调用组成的生成代码。
+# 这些调用不需要经过沙盒验证；连续的纯工具（pure 且 io_bound）调用在线程池中并行执行，
+# 其余调用按顺序执行，结果始终按调用顺序合并。
+import ast
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+from ..tools.tool_decorator import TOOL_REGISTRY
+
+# 同时执行的工具调用数上限
+DEFAULT_TOOL_WORKERS = int(os.getenv("INTERPRETER_TOOL_WORKERS", "4"))
+# 直接执行的工具调用不经过沙盒，没有沙盒的超时保护，因此每个调用单独限时（秒）
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("INTERPRETER_TOOL_TIMEOUT", "60"))
+
+# 让模型在没有合适工具时提交代码的伪工具，由调用方提供的 code_runner 在沙盒中执行
+RUN_PYTHON_TOOL = "run_python"
+RUN_PYTHON_SCHEMA = {
+    "type": "function",
+    "function": {
+        "name": RUN_PYTHON_TOOL,
+        "description": "Runs Python code in the sandbox when no single tool can do the job. "
+                       "The registered tools are available as functions inside the code.",
+        "parameters": {
+            "type": "object",
+            "properties": {"code": {"type": "string"}},
+            "required": ["code"],
+        },
+    },
+}
+
+
+class ToolCall(NamedTuple):
+    id: str
+    name: str
+    arguments: dict
+
+
+class ToolResult(NamedTuple):
+    call: ToolCall
+    output: str
+    success: bool
+    stats: dict
+
+
+def parse_tool_calls(message):
+    """
+    把 chat-completions 返回的 message["tool_calls"] 解析为 ToolCall 列表。
+
+    Raises:
+        ValueError: 参数不是合法的 JSON 对象
+    """
+    calls = []
+    for index, raw in enumerate(message.get("tool_calls") or []):
+        function = raw.get("function") or {}
+        arguments = function.get("arguments") or "{}"
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"工具 {function.get('name')} 的参数不是合法的 JSON: {e}") from e
+        if not isinstance(arguments, dict):
+            raise ValueError(f"工具 {function.get('name')} 的参数必须是 JSON 对象")
+        calls.append(ToolCall(raw.get("id") or f"call_{index}", function.get("name", ""), arguments))
+    return calls
+
+
+def format_tool_call(call):
+    """把工具调用格式化为类似 Python 调用的一行文本，例如 list_directory(path='/tmp')"""
+    if call.name == RUN_PYTHON_TOOL:
+        return call.arguments.get("code", "")
+    arguments = ", ".join(f"{key}={value!r}" for key, value in call.arguments.items())
+    return f"{call.name}({arguments})"
+
+
+def run_tool_call(call, code_runner=None):
+    """执行单个工具调用，返回 ToolResult；工具抛出的异常被转换为失败结果"""
+    start = time.perf_counter()
+    if call.name == RUN_PYTHON_TOOL and code_runner is not None:
+        output, success, stats = code_runner(call.arguments.get("code", ""))
+        return ToolResult(call, output, success, stats)
+
+    tool_data = TOOL_REGISTRY.get(call.name)
+    if tool_data is None:
+        return ToolResult(call, f"Error: unknown tool '{call.name}'", False, {})
+    try:
+        result = tool_data["function"](**call.arguments)
+        output, success = ("" if result is None else str(result)), True
+    except Exception as e:
+        output, success = f"{type(e).__name__}: {e}", False
+    return ToolResult(call, output, success, {"elapsed": time.perf_counter() - start})
+
+
+def _timed_out(call, timeout):
+    return ToolResult(call, f"Error: tool '{call.name}' timed out after {timeout}s", False, {"elapsed": timeout})
+
+
+def run_tool_call_with_timeout(call, code_runner=None, timeout=DEFAULT_TOOL_TIMEOUT):
+    """
+    在单独的守护线程中执行 run_tool_call，超过 timeout 秒返回失败结果。
+
+    Python 线程无法被强制停止，超时的工具会在后台继续运行直到自行返回，但调用方不再等待它。
+    run_python 由沙盒执行，沙盒有自己的超时，因此不在这里限时。
+    """
+    if timeout is None or call.name == RUN_PYTHON_TOOL:
+        return run_tool_call(call, code_runner)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(run_tool_call(call, code_runner)),
+                              name=f"tool-call-{call.name}", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return result[0] if result else _timed_out(call, timeout)
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_TOOL_WORKERS, thread_name_prefix="tool-call")
+        return _executor
+
+
+def can_run_in_parallel(call):
+    """只有声明为 pure 且 io_bound 的工具才会和其他调用并行执行"""
+    tool_data = TOOL_REGISTRY.get(call.name)
+    return tool_data is not None and tool_data.get("pure", False) and tool_data.get("io_bound", False)
+
+
+def _run_batch(calls, code_runner, timeout):
+    """在共享线程池中同时执行一批调用，所有调用共用一个 timeout"""
+    futures = [_get_executor().submit(run_tool_call, call, code_runner) for call in calls]
+    done, _ = wait(futures, timeout=timeout)
+    results = []
+    for call, future in zip(calls, futures):
+        if future in done:
+            results.append(future.result())
+        else:
+            # 尚未开始的调用直接取消；已经在运行的调用无法停止，只是不再等待
+            future.cancel()
+            results.append(_timed_out(call, timeout))
+    return results
+
+
+def dispatch_tool_calls(calls, code_runner=None, parallel=True, stop_on_error=False,
+                        timeout=DEFAULT_TOOL_TIMEOUT):
+    """
+    执行一组工具调用，返回与 calls 顺序一致的 ToolResult 列表。
+
+    连续的可并行调用（见 can_run_in_parallel）作为一批在共享线程池中同时执行，
+    其他调用（写文件、shell、run_python 等）按原顺序逐个执行，并且等前面的批次完成后才开始，
+    因此有副作用的调用之间以及它们与前后调用之间的先后关系保持不变。
+
+    Args:
+        calls: ToolCall 列表。
+        code_runner: 执行 run_python 伪工具的函数 code -> (output, success, stats)。
+        parallel: 为 False 时全部按顺序执行。
+        stop_on_error: 为 True 时在第一个失败的调用之后停止，返回的列表到该调用为止。
+        timeout: 每个调用（并行时为每一批）最长等待的秒数，超时的调用作为失败结果返回；
+            None 表示不限时。
+    """
+    results = []
+    index = 0
+    while index < len(calls):
+        end = index
+        while parallel and end < len(calls) and can_run_in_parallel(calls[end]):
+            end += 1
+        if end - index > 1 and DEFAULT_TOOL_WORKERS > 1:
+            batch = _run_batch(calls[index:end], code_runner, timeout)
+        else:
+            batch = [run_tool_call_with_timeout(calls[index], code_runner, timeout)]
+            end = index + 1
+        for result in batch:
+            results.append(result)
+            if stop_on_error and not result.success:
+                return results
+        index = end
+    return results
+
+
+def merge_tool_results(results):
+    """合并多个工具调用的输出；只有一个调用时原样返回它的输出"""
+    if len(results) == 1:
+        return results[0].output
+    sections = []
+    for result in results:
+        header = result.call.name if result.call.name == RUN_PYTHON_TOOL else format_tool_call(result.call)
+        sections.append(f"[{header}]\n{result.output.rstrip()}")
+    return "\n\n".join(sections) + "\n"
+
+
+def extract_tool_calls(code):
+    """
+    如果生成的代码只是若干个参数都是字面量的工具调用（可以包在 print 中），
+    返回 [(ToolCall, printed), ...]，否则返回 None。
+
+    例如 ``print(get_system_stats())`` 和 ``list_directory('/tmp')`` 各占一行的代码，
+    可以不经沙盒直接分发，其中的纯工具调用还可以并行执行。
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    calls = []
+    for index, statement in enumerate(tree.body):
+        if not isinstance(statement, ast.Expr):
+            return None
+        node, printed = statement.value, False
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'print'
+                and len(node.args) == 1 and not node.keywords):
+            node, printed = node.args[0], True
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+            return None
+        tool_data = TOOL_REGISTRY.get(node.func.id)
+        if tool_data is None or any(keyword.arg is None for keyword in node.keywords):
+            return None
+        try:
+            args = [ast.literal_eval(arg) for arg in node.args]
+            kwargs = {keyword.arg: ast.literal_eval(keyword.value) for keyword in node.keywords}
+            bound = inspect.signature(tool_data["function"]).bind(*args, **kwargs)
+        except (ValueError, TypeError, SyntaxError):
+            return None
+        calls.append((ToolCall(f"call_{index}", node.func.id, dict(bound.arguments)), printed))
+    return calls or None
+
+
+def run_tool_code(code, timeout=DEFAULT_TOOL_TIMEOUT):
+    """
+    把只由工具调用组成的代码（见 extract_tool_calls）直接分发执行，并行执行其中独立的纯工具调用。
+
+    输出与按顺序执行这段代码时打印的内容相同；某个调用失败或超时时，与沙盒一样在该处停止。
+
+    Returns:
+        (output, success, stats)，代码不是纯工具调用序列或只有一个调用时返回 None，由沙盒执行。
+    """
+    extracted = extract_tool_calls(code)
+    if not extracted or len(extracted) < 2:
+        return None
+
+    start = time.perf_counter()
+    calls = [call for call, _ in extracted]
+    results = dispatch_tool_calls(calls, stop_on_error=True, timeout=timeout)
+    output = []
+    for result, (_, printed) in zip(results, extracted):
+        if not result.success:
+            output.append(f"SandboxError: 执行错误: {result.output}\n")
+        elif printed:
+            output.append(f"{result.output}\n")
+    stats = {
+        "elapsed": time.perf_counter() - start,
+        "tool_calls": len(results),
+        "parallel_tool_calls": sum(can_run_in_parallel(call) for call in calls),
+    }
+    return "".join(output), all(result.success for result in results), stats
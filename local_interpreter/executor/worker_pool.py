@@ -0,0 +1,311 @@
+# local_interpreter/executor/worker_pool.py
+# 常驻的沙盒工作进程池。
+# 每个工作进程启动时预先导入允许的模块和工具，之后通过管道循环接收代码并执行。
+# 执行超时时父进程直接杀死工作进程并重建一个新的，Python 线程无法被终止的问题因此不复存在。
+# 每个请求都带有父进程的工具目录版本，版本变化时工作进程重新加载有改动的工具模块。
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from ..tools.tool_decorator import catalog_version
+
+DEFAULT_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+DEFAULT_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "30"))
+# 每个工作进程最多执行的代码段数，之后重建，避免上一次执行对模块状态的修改长期残留
+DEFAULT_MAX_TASKS_PER_WORKER = int(os.getenv("SANDBOX_MAX_TASKS_PER_WORKER", "100"))
+DEFAULT_PRELOAD_MODULES = (
+    'math', 'cmath', 'decimal', 'fractions', 'random', 'statistics', 'datetime',
+    'collections', 'itertools', 'functools', 'operator', 're', 'json', 'string',
+)
+
+
+def _worker_main(conn, preload_modules):
+    """工作进程主循环：预热后逐个执行父进程发来的代码"""
+    import importlib
+    from ..tools.tool_decorator import load_all_tools
+    from .code_executor import SessionNamespace, run_in_sandbox
+
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    load_all_tools()
+    conn.send(("ready", os.getpid()))
+
+    # 会话专用的工作进程在多次执行之间保留同一个命名空间
+    namespace = None
+    # 已同步到的父进程工具目录版本
+    tools_version = None
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        if request.get("tools_version") != tools_version:
+            # 父进程重新加载过工具模块：这里同样只重新导入修改过的模块
+            load_all_tools()
+            tools_version = request.get("tools_version")
+        if request.get("reset"):
+            if namespace is not None:
+                namespace.reset()
+            reply = ("result", "", True, {})
+        else:
+            if "session" in request and namespace is None:
+                namespace = SessionNamespace(**request["session"])
+            # 墙钟超时由父进程负责，这里不再另起计时线程；工作进程是独立进程，可以使用地址空间硬限制
+            options = dict(request.get("limits", {}))
+            options.setdefault("address_space_limit", True)
+            reply = ("result",) + run_in_sandbox(request["code"], timeout=None, namespace=namespace, **options)
+        try:
+            conn.send(reply)
+        except (BrokenPipeError, OSError):
+            break
+
+
+class _Worker:
+    def __init__(self, context, preload_modules):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, preload_modules),
+            name="sandbox-worker", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = self.conn.recv()[0] == "ready"
+        return self.ready
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        finally:
+            self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class SandboxWorkerPool:
+    """
+    预先启动的沙盒工作进程池。
+
+    Args:
+        size: 工作进程数量。
+        timeout: 默认的墙钟超时（秒），超时的工作进程会被杀死并重建。
+        max_tasks_per_worker: 每个工作进程最多执行的次数，之后重建。
+        preload_modules: 工作进程启动时预先导入的模块。
+        start_method: multiprocessing 启动方式，默认在支持时使用 forkserver，
+            避免从带有 Tk/网络线程的主进程直接 fork。
+    """
+
+    def __init__(self, size=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 max_tasks_per_worker=DEFAULT_MAX_TASKS_PER_WORKER,
+                 preload_modules=DEFAULT_PRELOAD_MODULES, start_method=None):
+        if start_method is None:
+            available = multiprocessing.get_all_start_methods()
+            start_method = "forkserver" if "forkserver" in available else "spawn"
+        self.context = multiprocessing.get_context(start_method)
+        self.size = size
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.preload_modules = tuple(preload_modules)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._sessions = set()
+        self._stats = {"executions": 0, "timeouts": 0, "crashes": 0, "respawns": 0, "total_seconds": 0.0,
+                       "code_cache_hits": 0, "code_cache_lookups": 0, "validation_saved_seconds": 0.0}
+
+        for _ in range(size):
+            self._idle.put(_Worker(self.context, self.preload_modules))
+
+    def execute(self, code, timeout=None, **limits):
+        """
+        在空闲的工作进程中执行代码，返回 (output, success, stats)。
+
+        stats 包含工作进程报告的 peak_memory、elapsed 和 instructions；
+        工作进程因超时或崩溃被替换时只包含 elapsed。
+
+        Args:
+            code: 要执行的代码。
+            timeout: 墙钟超时（秒），默认使用池的 timeout；包括等待工作进程就绪的时间。
+            **limits: 传给 Sandbox 的其他参数，如 instruction_limit、budget_mode。
+        """
+        if self._closed:
+            raise RuntimeError("沙盒工作进程池已关闭")
+        worker = self._idle.get()
+        result, alive = self._run(worker, {"code": code, "limits": limits}, timeout)
+        if not alive:
+            if not self._closed:
+                self._idle.put(self._spawn())
+            return result
+        if worker.tasks >= self.max_tasks_per_worker:
+            worker.close()
+            worker = self._spawn()
+        self._idle.put(worker)
+        return result
+
+    def open_session(self, **session_limits):
+        """
+        打开一个持久会话：会话独占一个新的工作进程，变量在多次执行之间保留。
+
+        Args:
+            **session_limits: 传给 SessionNamespace 的参数，如 max_bytes、max_variables。
+        """
+        if self._closed:
+            raise RuntimeError("沙盒工作进程池已关闭")
+        session = SandboxSession(self, session_limits)
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    def _run(self, worker, request, timeout):
+        """
+        在指定工作进程上执行一个请求，返回 ((output, success, stats), alive)。
+
+        工作进程超时或崩溃时会被杀死，alive 为 False，由调用方换上新的工作进程。
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        try:
+            if not worker.wait_ready(timeout):
+                return self._kill(worker, "timeouts", f"TimeoutError: 沙盒工作进程未能在 {timeout} 秒内就绪\n", start), False
+
+            worker.conn.send(dict(request, tools_version=catalog_version()))
+            remaining = max(0.0, timeout - (time.monotonic() - start))
+            if not worker.conn.poll(remaining):
+                return self._kill(worker, "timeouts", f"TimeoutError: 执行超时: {timeout}秒\n", start), False
+            _, output, success, stats = worker.conn.recv()
+        except (EOFError, BrokenPipeError, OSError):
+            return self._kill(worker, "crashes", "SandboxError: 沙盒工作进程意外退出\n", start), False
+
+        worker.tasks += 1
+        self._record("executions", time.monotonic() - start)
+        if "code_cache_hit" in stats:
+            with self._lock:
+                self._stats["code_cache_lookups"] += 1
+                self._stats["code_cache_hits"] += stats["code_cache_hit"]
+                self._stats["validation_saved_seconds"] += stats.get("validation_saved", 0.0)
+        return (output, success, stats), True
+
+    def _spawn(self):
+        with self._lock:
+            self._stats["respawns"] += 1
+        return _Worker(self.context, self.preload_modules)
+
+    def _kill(self, worker, reason, message, start):
+        """强制杀死出问题的工作进程，返回失败结果"""
+        worker.kill()
+        self._record(reason)
+        return message, False, {"elapsed": time.monotonic() - start}
+
+    def _record(self, name, elapsed=None):
+        with self._lock:
+            self._stats[name] += 1
+            if elapsed is not None:
+                self._stats["total_seconds"] += elapsed
+
+    def stats(self):
+        """返回执行次数、超时/崩溃次数、重建次数、平均耗时（毫秒）以及所有工作进程的代码缓存命中率"""
+        with self._lock:
+            stats = dict(self._stats)
+        executions = stats.pop("executions")
+        total = stats.pop("total_seconds")
+        lookups = stats["code_cache_lookups"]
+        stats.update(workers=self.size, executions=executions,
+                     avg_ms=total / executions * 1000 if executions else 0.0,
+                     code_cache_hit_rate=stats["code_cache_hits"] / lookups if lookups else 0.0,
+                     validation_saved_ms=stats.pop("validation_saved_seconds") * 1000)
+        return stats
+
+    def shutdown(self):
+        """关闭所有空闲的工作进程和会话"""
+        self._closed = True
+        with self._lock:
+            sessions, self._sessions = self._sessions, set()
+        for session in sessions:
+            session.close()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SandboxSession:
+    """
+    持久会话：独占一个工作进程，变量在多次执行之间保留在该进程的 SessionNamespace 中。
+
+    会话的工作进程不参与按任务数重建；超时或崩溃时工作进程被杀死，
+    会换上新的工作进程，但之前的变量随之丢失，失败结果中会说明这一点。
+    """
+
+    def __init__(self, pool, session_limits):
+        self.pool = pool
+        self.session_limits = dict(session_limits)
+        self._lock = threading.Lock()
+        self._worker = _Worker(pool.context, pool.preload_modules)
+
+    def execute(self, code, timeout=None, **limits):
+        """在会话中执行代码，返回 (output, success, stats)"""
+        with self._lock:
+            if self._worker is None:
+                raise RuntimeError("沙盒会话已关闭")
+            request = {"code": code, "limits": limits, "session": self.session_limits}
+            (output, success, stats), alive = self.pool._run(self._worker, request, timeout)
+            if not alive:
+                self._worker = self.pool._spawn()
+                output += "SessionReset: 会话工作进程已重建，之前定义的变量已丢失\n"
+            return output, success, stats
+
+    def reset(self):
+        """清空会话中的所有变量"""
+        with self._lock:
+            if self._worker is None:
+                return
+            _, alive = self.pool._run(self._worker, {"reset": True}, None)
+            if not alive:
+                self._worker = self.pool._spawn()
+
+    def close(self):
+        """关闭会话并结束它的工作进程"""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.close()
+        with self.pool._lock:
+            self.pool._sessions.discard(self)
+
+
+_pool_lock = threading.Lock()
+_shared_pool = None
+
+
+def get_worker_pool():
+    """返回进程内共享的工作进程池；SANDBOX_WORKERS=0 时返回 None（在进程内执行）"""
+    global _shared_pool
+    if DEFAULT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SandboxWorkerPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
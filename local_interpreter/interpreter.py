@@ -1,31 +1,96 @@
+import os
+import time
+
 from .coordinator.orchestrator import Orchestrator
-from .executor.code_executor import execute_python_code
+from .executor.code_executor import execute_python_code, format_execution_stats, open_session
+from .executor.tool_dispatcher import (
+    RUN_PYTHON_TOOL,
+    dispatch_tool_calls,
+    format_tool_call,
+    merge_tool_results,
+    run_tool_code,
+)
+from .executor.worker_pool import get_worker_pool
+from package.conversation_history import ConversationHistory
+
+# Keep variables between turns unless the caller decides otherwise
+PERSISTENT_SESSION = os.getenv("INTERPRETER_PERSISTENT_SESSION", "0").lower() in ("1", "true", "yes")
+# Ask the model for structured tool calls first, generating code only when no tool fits
+TOOL_CALLING = os.getenv("INTERPRETER_TOOL_CALLING", "1").lower() in ("1", "true", "yes")
+
 
 class Interpreter:
     """
     A class that encapsulates the local interpreter's functionality,
     providing a clean interface for other parts of the application.
     """
-    def __init__(self):
+    def __init__(self, persistent_session=None, tool_calling=None):
         """
         Initializes the Interpreter, which includes creating an Orchestrator
         and setting up a conversation history.
+
+        The history is bounded by an approximate token budget: long execution
+        outputs are truncated and older turns are folded into a rolling summary.
+
+        Args:
+            persistent_session: If True, snippets run in one session namespace, so
+                variables defined in earlier turns stay available (see reset_session).
+                Defaults to INTERPRETER_PERSISTENT_SESSION.
+            tool_calling: If True, the model calls tools directly through function calling
+                and only generates code when no tool fits. Defaults to INTERPRETER_TOOL_CALLING.
         """
-        self.orchestrator = Orchestrator()
-        self.conversation_history = []
+        if persistent_session is None:
+            persistent_session = PERSISTENT_SESSION
+        if tool_calling is None:
+            tool_calling = TOOL_CALLING
+        self.persistent_session = persistent_session
+        self.tool_calling = tool_calling
+        self.session = None
+        self.orchestrator = Orchestrator(persistent_session=persistent_session)
+        self.conversation_history = ConversationHistory(token_budget=3000, max_message_tokens=800)
+        # Peak memory and elapsed time of the most recent snippet
+        self.last_execution_stats = {}
         # A simple check to see if the orchestrator failed to init (e.g. no API key)
         if not self.orchestrator.client:
             self.is_ready = False
             print("Warning: Interpreter initialized without a valid API client.")
         else:
             self.is_ready = True
+            # Start the sandbox worker processes now so the first snippet runs on a warm worker
+            get_worker_pool()
+            if persistent_session:
+                self.session = open_session()
+
+    def reset_session(self) -> bool:
+        """
+        Drops every variable kept in the session namespace.
+
+        Returns False when persistent sessions are disabled and there was nothing to reset.
+        """
+        if self.session is None:
+            return False
+        self.session.reset()
+        # Reported on the assistant side, like the "Session variables" line after each execution
+        self.conversation_history.append(
+            {"role": "assistant", "content": "Session variables: none (the session was reset; "
+                                             "variables from earlier turns no longer exist)"}
+        )
+        return True
 
-    def run(self, user_input: str) -> str:
+    def close(self):
+        """Releases the session's worker process."""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def run(self, user_input: str, on_token=None) -> str:
         """
         Runs a single turn of the interpreter.
 
         Args:
             user_input: The natural language command from the user.
+            on_token: Optional callback that receives the generated code incrementally
+                while the model is still streaming it.
 
         Returns:
             A string containing the result of the execution.
@@ -36,16 +101,72 @@ class Interpreter:
         # Append the user's message to the history
         self.conversation_history.append({"role": "user", "content": user_input})
 
-        generated_code = self.orchestrator.process_user_input(self.conversation_history)
+        if self.tool_calling:
+            result = self._run_tool_calls(on_token)
+            if result is not None:
+                return result
+
+        generated_code = self.orchestrator.process_user_input(self.conversation_history, on_token=on_token)
 
         # Early exit if code generation fails
         if "Error:" in generated_code:
             return generated_code
 
-        output, success = execute_python_code(generated_code)
+        output, success, stats = self._run_code(generated_code)
+        return self._record_execution(generated_code, output, success, stats)
+
+    def _run_code(self, code):
+        # Code that only calls tools with literal arguments skips the sandbox, and its
+        # independent pure tool calls run concurrently
+        result = run_tool_code(code)
+        if result is not None:
+            return result
+        return execute_python_code(code, return_stats=True, session=self.session)
+
+    def _run_tool_calls(self, on_token=None):
+        """
+        Function-calling path: dispatches the model's tool calls directly, in parallel when
+        there are several. Returns None when the caller should fall back to code generation.
+        """
+        try:
+            plan = self.orchestrator.plan_tool_calls(self.conversation_history)
+        except Exception as e:
+            print(f"Tool calling failed, falling back to code generation: {e}")
+            return None
+
+        if not plan.tool_calls:
+            if not plan.text:
+                return None
+            self.last_execution_stats = {}
+            self.conversation_history.append({"role": "assistant", "content": plan.text})
+            return plan.text
+
+        executed = "\n".join(format_tool_call(call) for call in plan.tool_calls)
+        if on_token is not None:
+            on_token(executed + "\n")
+
+        start = time.perf_counter()
+        results = dispatch_tool_calls(plan.tool_calls, code_runner=self._run_code)
+        stats = {"elapsed": time.perf_counter() - start}
+        for result in results:
+            if result.call.name == RUN_PYTHON_TOOL and result.stats:
+                stats = dict(result.stats, elapsed=stats["elapsed"])
+        output = merge_tool_results(results)
+        return self._record_execution(executed, output, all(result.success for result in results), stats)
+
+    def _record_execution(self, code, output, success, stats):
+        """Stores the stats and adds the executed code and its output to the history."""
+        self.last_execution_stats = stats
 
-        # Append the assistant's response (the code and its output) to the history
-        assistant_response = f"Executed Code:\n```python\n{generated_code}```\nOutput:\n```\n{output}```"
+        # Append the assistant's response (the code, its output and resource usage) to the history
+        assistant_response = f"Executed Code:\n```python\n{code}```\nOutput:\n```\n{output}```"
+        if stats:
+            assistant_response += f"\nResources: {format_execution_stats(stats)}"
+        # Tell the model which variables it can reuse next turn
+        session_variables = (stats or {}).get("session", {}).get("variables")
+        if session_variables:
+            listed = ", ".join(f"{name} ({type_name})" for name, type_name in session_variables.items())
+            assistant_response += f"\nSession variables: {listed}"
         self.conversation_history.append({"role": "assistant", "content": assistant_response})
 
         return output if success else f"An error occurred:\n{output}"
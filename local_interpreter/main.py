@@ -1,4 +1,5 @@
 from .interpreter import Interpreter
+from .executor.code_executor import format_execution_stats
 
 # ANSI escape codes for colors
 class colors:
@@ -17,7 +18,7 @@ def main_loop():
     The main command-line loop for interacting with the local interpreter.
     """
     print(f"{colors.HEADER}{colors.BOLD}Welcome to Local Interpreter CLI{colors.ENDC}")
-    print("Type 'exit' to quit.")
+    print("Type 'exit' to quit, 'reset' to clear session variables.")
 
     interpreter = Interpreter()
     if not interpreter.is_ready:
@@ -30,11 +31,20 @@ def main_loop():
             if user_input.lower().strip() == 'exit':
                 print(f"{colors.WARNING}Exiting...{colors.ENDC}")
                 break
+            if user_input.lower().strip() == 'reset':
+                if interpreter.reset_session():
+                    print(f"{colors.OKCYAN}Session variables cleared.{colors.ENDC}")
+                else:
+                    print(f"{colors.WARNING}Persistent sessions are disabled; there are no session "
+                          f"variables to clear.{colors.ENDC}")
+                continue
 
             result = interpreter.run(user_input)
 
             print(f"{colors.OKBLUE}--- Result ---{colors.ENDC}")
             print(result)
+            if interpreter.last_execution_stats:
+                print(f"{colors.OKCYAN}({format_execution_stats(interpreter.last_execution_stats)}){colors.ENDC}")
             print(f"{colors.OKBLUE}--------------{colors.ENDC}\n")
 
         except KeyboardInterrupt:
@@ -0,0 +1,78 @@
+# Tests for run_shell's bounded output buffer and streaming.
+import platform
+import time
+
+import pytest
+
+from local_interpreter.tools.shell_tool import OutputBuffer, _pump, run_shell, stream_output_to
+
+
+class ChunkedStream:
+    """A pipe stand-in whose read() returns the given chunks one by one."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def read(self, size):
+        return self.chunks.pop(0) if self.chunks else b""
+
+    def close(self):
+        self.closed = True
+
+
+def test_output_buffer_keeps_small_output_whole():
+    buffer = OutputBuffer(max_bytes=16)
+    buffer.write(b"hello ")
+    buffer.write(b"world")
+    assert buffer.text() == "hello world"
+    assert buffer.total == 11
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(max_bytes=10)
+    for i in range(100):
+        buffer.write(b"%02d" % i)
+    assert bytes(buffer.head) == b"00010"
+    assert bytes(buffer.tail) == b"79899"
+    assert buffer.total == 200
+    assert buffer.text() == "00010\n...[190 bytes omitted]...\n79899"
+
+
+def test_output_buffer_single_large_write():
+    buffer = OutputBuffer(max_bytes=8)
+    buffer.write(b"abcdefghijklmnopqrstuvwxyz")
+    assert buffer.text() == "abcd\n...[18 bytes omitted]...\nwxyz"
+
+
+def test_pump_decodes_characters_split_across_reads():
+    data = "你好，世界".encode("utf-8")
+    # Split every character between two reads
+    chunks = [data[i:i + 2] for i in range(0, len(data), 2)]
+    received = []
+    buffer = OutputBuffer()
+    stream = ChunkedStream(chunks)
+    _pump(stream, buffer, received.append)
+    assert "".join(received) == "你好，世界"
+    assert "�" not in "".join(received)
+    assert buffer.text() == "你好，世界"
+    assert stream.closed
+
+
+def test_pump_flushes_truncated_character_at_eof():
+    received = []
+    _pump(ChunkedStream([b"ok", "好".encode("utf-8")[:2]]), OutputBuffer(), received.append)
+    assert "".join(received) == "ok�"
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="uses POSIX commands")
+def test_run_shell_streams_and_times_out():
+    received = []
+    with stream_output_to(received.append):
+        assert run_shell("echo streamed") == "STDOUT:\nstreamed\n"
+    assert "".join(received) == "streamed\n"
+
+    start = time.monotonic()
+    result = run_shell("sleep 5", timeout=0.3)
+    assert time.monotonic() - start < 3
+    assert result.startswith("Error: Command timed out after 0.3 seconds.")
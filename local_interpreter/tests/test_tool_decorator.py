@@ -0,0 +1,116 @@
+# Tests for incremental tool loading (load_all_tools) and its propagation to sandbox workers.
+import os
+import sys
+
+import pytest
+
+from local_interpreter.tools import tool_decorator
+from local_interpreter.tools.tool_decorator import TOOL_REGISTRY, catalog_version, load_all_tools
+
+PACKAGE = "zz_test_tools"
+MODULE = f"{PACKAGE}.reload_tool"
+
+TOOL_SOURCE = '''
+from local_interpreter.tools.tool_decorator import tool
+
+
+@tool
+def zz_answer() -> int:
+    """Returns a test value."""
+    return {value}
+'''
+
+
+@pytest.fixture
+def tools_dir(tmp_path, monkeypatch):
+    # Scan a throwaway tools package instead of writing into the source tree
+    directory = tmp_path / PACKAGE
+    directory.mkdir()
+    (directory / "__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(tool_decorator, "TOOLS_PACKAGE", PACKAGE)
+    monkeypatch.setattr(tool_decorator, "TOOLS_DIR", str(directory))
+    monkeypatch.setattr(tool_decorator, "_loaded_mtimes", {})
+    yield directory
+    tool_decorator._unregister_module(MODULE)
+    for name in [name for name in sys.modules if name.startswith(PACKAGE)]:
+        del sys.modules[name]
+
+
+def _write(directory, source, mtime_ns=None):
+    path = directory / "reload_tool.py"
+    path.write_text(source)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path.stat().st_mtime_ns
+
+
+def test_unchanged_modules_keep_catalog_version(tools_dir):
+    _write(tools_dir, TOOL_SOURCE.format(value=0))
+    version = load_all_tools()
+    assert load_all_tools() == version
+
+
+def test_test_modules_are_not_loaded(tools_dir):
+    (tools_dir / "test_something.py").write_text("raise ImportError('not a tool')")
+    assert tool_decorator._scan_tool_modules() == {}
+
+
+def test_edited_module_is_reloaded(tools_dir):
+    _write(tools_dir, TOOL_SOURCE.format(value=1))
+    version = load_all_tools()
+    assert TOOL_REGISTRY["zz_answer"]["function"]() == 1
+
+    mtime = (tools_dir / "reload_tool.py").stat().st_mtime_ns
+    _write(tools_dir, TOOL_SOURCE.format(value=2), mtime + 10 ** 9)
+    assert load_all_tools() > version
+    assert TOOL_REGISTRY["zz_answer"]["function"]() == 2
+
+    (tools_dir / "reload_tool.py").unlink()
+    load_all_tools()
+    assert "zz_answer" not in TOOL_REGISTRY
+
+
+def test_failed_import_is_retried_at_same_mtime(tools_dir):
+    mtime = _write(tools_dir, "this is not python")
+    version = load_all_tools()
+    assert "zz_answer" not in TOOL_REGISTRY
+    # Nothing was registered, so prompts built from the catalog stay valid
+    assert version == catalog_version()
+
+    # A module read half-written is retried even if the finished file has the same mtime
+    _write(tools_dir, TOOL_SOURCE.format(value=3), mtime)
+    assert load_all_tools() > version
+    assert TOOL_REGISTRY["zz_answer"]["function"]() == 3
+
+
+def test_failed_reload_is_retried_at_same_mtime(tools_dir):
+    mtime = _write(tools_dir, TOOL_SOURCE.format(value=4))
+    load_all_tools()
+
+    _write(tools_dir, "this is not python", mtime + 10 ** 9)
+    load_all_tools()
+    assert "zz_answer" not in TOOL_REGISTRY
+
+    _write(tools_dir, TOOL_SOURCE.format(value=5), mtime + 10 ** 9)
+    load_all_tools()
+    assert TOOL_REGISTRY["zz_answer"]["function"]() == 5
+
+
+def test_sandbox_workers_pick_up_reloaded_tools(tools_dir):
+    from local_interpreter.executor.worker_pool import SandboxWorkerPool
+
+    mtime = _write(tools_dir, TOOL_SOURCE.format(value=6))
+    load_all_tools()
+    # Forked workers inherit the patched tools directory
+    pool = SandboxWorkerPool(size=1, timeout=60, start_method="fork")
+    try:
+        output, success, _ = pool.execute("print(zz_answer())")
+        assert success and output.strip() == "6", output
+
+        _write(tools_dir, TOOL_SOURCE.format(value=7), mtime + 10 ** 9)
+        load_all_tools()
+        output, success, _ = pool.execute("print(zz_answer())")
+        assert success and output.strip() == "7", output
+    finally:
+        pool.shutdown()
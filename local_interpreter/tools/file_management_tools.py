@@ -1,7 +1,7 @@
 import os
 from .tool_decorator import tool
 
-@tool
+@tool(pure=True, io_bound=True)
 def read_file(path: str) -> str:
     """Reads the content of a file at the specified path."""
     try:
@@ -13,7 +13,7 @@ def read_file(path: str) -> str:
     except Exception as e:
         return f"Error reading file '{path}': {e}"
 
-@tool
+@tool(io_bound=True)
 def write_file(path: str, content: str) -> str:
     """Writes the given content to a file at the specified path, overwriting it if it exists."""
     try:
@@ -25,7 +25,7 @@ def write_file(path: str, content: str) -> str:
     except Exception as e:
         return f"Error writing to file '{path}': {e}"
 
-@tool
+@tool(pure=True, io_bound=True)
 def list_directory(path: str) -> str:
     """Lists all files and subdirectories within a specified directory."""
     try:
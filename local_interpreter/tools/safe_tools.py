@@ -2,12 +2,15 @@
 import os
 import time
 
+from .tool_decorator import tool
+
 # Define a safe working directory. Code from the sandbox can only access files here.
 # For simplicity, we'll create it inside the project.
 SAFE_WORKING_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace'))
 
 # --- Filesystem Tools ---
 
+@tool(pure=True, io_bound=True)
 def list_safe_directory(sub_path="."):
     """
     Lists the contents of a subdirectory within the SAFE_WORKING_DIR.
@@ -27,6 +30,7 @@ def list_safe_directory(sub_path="."):
 
 # --- System & Hardware Tools ---
 
+@tool(pure=True, io_bound=True)
 def get_system_stats():
     """
     Gets basic system stats (CPU and Memory usage).
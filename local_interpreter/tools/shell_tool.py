@@ -1,34 +1,191 @@
-import subprocess
+import codecs
+import os
 import platform
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
 from .tool_decorator import tool
 
-@tool
-def run_shell(command: str) -> str:
+# Wall-clock limit for a single command, and how much of its output is kept
+SHELL_TIMEOUT = float(os.getenv("SHELL_TIMEOUT", "60"))
+SHELL_MAX_OUTPUT_BYTES = int(os.getenv("SHELL_MAX_OUTPUT_BYTES", str(64 * 1024)))
+
+_READ_SIZE = 4096
+
+# Callback that receives output text while a command runs (see stream_output_to)
+_output_listener = None
+# Commands currently running, so the UI can cancel them
+_running = set()
+_running_lock = threading.Lock()
+
+
+class OutputBuffer:
+    """
+    Keeps the first and last `max_bytes // 2` bytes of a stream and counts the rest,
+    so a command that prints gigabytes only ever holds `max_bytes` in memory.
+    """
+
+    def __init__(self, max_bytes=SHELL_MAX_OUTPUT_BYTES):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    def text(self):
+        omitted = self.total - len(self.head) - len(self.tail)
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if omitted > 0:
+            return f"{head}\n...[{omitted} bytes omitted]...\n{tail}"
+        return head + tail
+
+
+@contextmanager
+def stream_output_to(callback):
+    """
+    While the block runs, every chunk of run_shell output is also passed to `callback(text)`
+    as it arrives (e.g. to show it in the UI before the command finishes).
+    """
+    global _output_listener
+    previous, _output_listener = _output_listener, callback
+    try:
+        yield
+    finally:
+        _output_listener = previous
+
+
+def cancel_running_commands():
+    """Kills every command started by run_shell that is still running. Returns how many."""
+    with _running_lock:
+        runs = list(_running)
+    for run in runs:
+        run.cancel()
+    return len(runs)
+
+
+class _ShellRun:
+    def __init__(self, process):
+        self.process = process
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.kill()
+
+    def kill(self):
+        if self.process.poll() is not None:
+            return
+        try:
+            if platform.system() != "Windows":
+                # The command runs in its own process group, so this also stops its children
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _pump(stream, buffer, listener):
+    """Reads a pipe until EOF, feeding the buffer and the listener chunk by chunk."""
+    read = getattr(stream, "read1", stream.read)
+    # A multi-byte character can be split across two reads; the decoder holds on to
+    # the partial bytes until the rest arrives
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def notify(text):
+        if listener is not None and text:
+            try:
+                listener(text)
+            except Exception:
+                pass
+
+    while True:
+        data = read(_READ_SIZE)
+        if not data:
+            break
+        buffer.write(data)
+        notify(decoder.decode(data))
+    notify(decoder.decode(b"", final=True))
+    stream.close()
+
+
+@tool(io_bound=True)
+def run_shell(command: str, timeout: float = SHELL_TIMEOUT) -> str:
     """
     Executes a shell command and returns its output.
     Useful for general-purpose commands when a specific tool is not available.
+
+    The command is stopped after `timeout` seconds. Output is read as it is produced;
+    only its beginning and end are kept when it exceeds the output limit.
     """
+    command_parts = command.split()
     try:
         # For cross-platform compatibility, split the command into a list.
         # This is generally safer than `shell=True`.
-        command_parts = command.split()
-
         # Windows needs a different way to run shell commands sometimes
         if platform.system() == "Windows":
-            result = subprocess.run(command, shell=True, capture_output=True, text=True, check=False)
-        else:
-            result = subprocess.run(command_parts, capture_output=True, text=True, check=False)
-
-        if result.returncode == 0:
-            return f"STDOUT:\n{result.stdout}"
+            process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         else:
-            return f"STDERR:\n{result.stderr}\nSTDOUT:\n{result.stdout}"
-
+            process = subprocess.Popen(command_parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       start_new_session=True)
     except FileNotFoundError:
-        return f"Error: Command '{command_parts[0]}' not found."
+        return f"Error: Command '{command_parts[0] if command_parts else command}' not found."
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
+    run = _ShellRun(process)
+    with _running_lock:
+        _running.add(run)
+    stdout, stderr = OutputBuffer(), OutputBuffer()
+    listener = _output_listener
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, stdout, listener), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr, listener), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        run.kill()
+        process.wait()
+    finally:
+        with _running_lock:
+            _running.discard(run)
+    # Background children that inherited the pipes may keep them open; don't wait for them forever
+    deadline = time.monotonic() + 1.0
+    for reader in readers:
+        reader.join(max(0.0, deadline - time.monotonic()))
+
+    if run.cancelled.is_set():
+        status = "Error: Command was cancelled.\n"
+    elif timed_out:
+        status = f"Error: Command timed out after {timeout} seconds.\n"
+    else:
+        status = ""
+
+    if process.returncode == 0 and not status:
+        return f"STDOUT:\n{stdout.text()}"
+    return f"{status}STDERR:\n{stderr.text()}\nSTDOUT:\n{stdout.text()}"
+
 # This can be used for direct testing of the tool
 if __name__ == '__main__':
     # Example usage:
@@ -1,28 +1,187 @@
+import importlib
 import inspect
+import os
+import sys
+import threading
 
 # A registry to hold all functions decorated with @tool
 TOOL_REGISTRY = {}
 
-def tool(func):
+# The package scanned for tool modules and its directory
+TOOLS_PACKAGE = __package__
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modification times of the tool modules as of the last load_all_tools() call, and a
+# version number that changes whenever the set of tools may have changed
+_loaded_mtimes = {}
+_catalog_version = 0
+_schema_cache = (None, None)
+_load_lock = threading.Lock()
+
+# JSON schema types for the annotations tools use; anything else is described as a string
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    tuple: "array",
+    dict: "object",
+}
+
+
+def build_parameters_schema(sig):
+    """
+    Builds the JSON schema of a tool's arguments from its signature, in the form
+    expected by function-calling APIs. Parameters without a default are required.
+    """
+    properties = {}
+    required = []
+    for name, param in sig.parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        annotation = getattr(param.annotation, "__origin__", param.annotation)
+        schema = {"type": _JSON_TYPES.get(annotation, "string")}
+        if param.default is param.empty:
+            required.append(name)
+        elif param.default is not None:
+            schema["default"] = param.default
+        properties[name] = schema
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def get_tool_schemas():
+    """
+    Returns the registered tools in the function-calling format:
+    [{"type": "function", "function": {"name", "description", "parameters"}}, ...]
+
+    Tools are sorted by name so the request is byte-identical from run to run, and the
+    list is cached until the catalog version changes (see load_all_tools).
+    """
+    global _schema_cache
+    version, schemas = _schema_cache
+    if version == _catalog_version and schemas is not None:
+        return list(schemas)
+    schemas = []
+    for name, tool_data in sorted(TOOL_REGISTRY.items()):
+        description = (tool_data["docstring"] or "").split("\n\n")[0].replace("\n", " ")
+        schemas.append({
+            "type": "function",
+            "function": {"name": name, "description": description, "parameters": tool_data["parameters"]},
+        })
+    _schema_cache = (_catalog_version, schemas)
+    return list(schemas)
+
+
+def catalog_version():
+    """Returns a number that changes whenever load_all_tools() picked up changed tool modules."""
+    return _catalog_version
+
+
+def tool(func=None, *, pure=False, io_bound=False):
     """
     A decorator to register a function as an available tool for the LLM.
 
     The function's name and a formatted version of its docstring will be
     stored in the TOOL_REGISTRY. The docstring is used to automatically
     generate the tool documentation for the system prompt.
+
+    Can be used bare (`@tool`) or with flags (`@tool(pure=True, io_bound=True)`):
+        pure: The tool has no side effects, so calls to it are independent of
+            each other and may run concurrently or in any order.
+        io_bound: The tool mostly waits on files, processes or the network, so
+            running it on a thread pool overlaps that waiting.
+    Pure, I/O-bound calls are the ones the interpreter runs in parallel.
+    """
+    def register(func):
+        # Extract the function signature
+        sig = inspect.signature(func)
+
+        # Extract a clean version of the docstring
+        doc = inspect.getdoc(func)
+
+        # Store the function and its metadata in the registry
+        TOOL_REGISTRY[func.__name__] = {
+            "function": func,
+            "signature": str(sig),
+            "docstring": doc,
+            "parameters": build_parameters_schema(sig),
+            "pure": pure,
+            "io_bound": io_bound,
+        }
+
+        # Return the original function so it can still be called normally
+        return func
+
+    if func is None:
+        return register
+    return register(func)
+
+
+def _scan_tool_modules():
+    """Returns {module name: mtime} for every tool module in the tools directory."""
+    modules = {}
+    for filename in sorted(os.listdir(TOOLS_DIR)):
+        # This module holds the registry itself; reloading it would empty TOOL_REGISTRY.
+        # Test modules are not tools and may import packages the runtime does not have
+        if (not filename.endswith(".py") or filename.startswith(("__", "test_"))
+                or filename == "tool_decorator.py"):
+            continue
+        try:
+            modules[f"{TOOLS_PACKAGE}.{filename[:-3]}"] = os.stat(os.path.join(TOOLS_DIR, filename)).st_mtime_ns
+        except OSError:
+            continue
+    return modules
+
+
+def _unregister_module(module_name):
+    for name in [name for name, data in TOOL_REGISTRY.items() if data["function"].__module__ == module_name]:
+        del TOOL_REGISTRY[name]
+
+
+def load_all_tools():
     """
-    # Extract the function signature
-    sig = inspect.signature(func)
+    Dynamically imports all modules in the 'tools' directory to populate the TOOL_REGISTRY.
+    This should be run once at startup (and once in every sandbox worker process).
 
-    # Extract a clean version of the docstring
-    doc = inspect.getdoc(func)
+    Later calls only stat the tool modules: unchanged modules are skipped, modified ones
+    are reloaded and deleted ones have their tools unregistered. A module's mtime is only
+    recorded once it imported successfully, so a module that failed (e.g. because it was
+    read half-written) is retried on the next call. Returns the catalog version, which
+    changes only when the registered tools may have changed.
+    """
+    global _catalog_version
+    with _load_lock:
+        current = _scan_tool_modules()
+        if current == _loaded_mtimes:
+            return _catalog_version
 
-    # Store the function and its metadata in the registry
-    TOOL_REGISTRY[func.__name__] = {
-        "function": func,
-        "signature": str(sig),
-        "docstring": doc
-    }
+        changed = False
+        for module_name in set(_loaded_mtimes) - set(current):
+            _unregister_module(module_name)
+            del _loaded_mtimes[module_name]
+            changed = True
+        for module_name, mtime in current.items():
+            if _loaded_mtimes.get(module_name) == mtime:
+                continue
+            reload = module_name in sys.modules and module_name in _loaded_mtimes
+            try:
+                if reload:
+                    # Its old tools are gone even if the reload fails
+                    _unregister_module(module_name)
+                    changed = True
+                    importlib.reload(sys.modules[module_name])
+                else:
+                    importlib.import_module(module_name)
+            except Exception as e:
+                print(f"Error loading tool module {module_name}: {e}")
+                if reload:
+                    # The module object stays in sys.modules; reload it again next time
+                    _loaded_mtimes[module_name] = None
+                continue
+            _loaded_mtimes[module_name] = mtime
+            changed = True
 
-    # Return the original function so it can still be called normally
-    return func
+        if changed:
+            _catalog_version += 1
+        return _catalog_version
@@ -0,0 +1,169 @@
+"""
+按 token 预算管理的对话历史。
+
+对话历史按近似 token 数计量：过长的单条消息（例如解释器的执行输出）会被截断，
+超出预算时最早的轮次会被压缩进一段滚动摘要，保证每次请求的提示长度受控。
+"""
+import re
+import threading
+
+from package.log_manager import LogManager
+
+logger = LogManager.get_logger(__name__)
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = "\n...[已截断 {omitted} 个字符]...\n"
+
+
+def estimate_tokens(text):
+    """
+    粗略估计文本的 token 数：中日韩字符约 1 token/字，其余约 4 字符/token。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_middle(text, max_tokens):
+    """保留文本的开头和结尾，截掉中间部分，使其不超过 max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 按比例估算可保留的字符数，开头和结尾各占一半
+    keep_chars = max(1, int(len(text) * max_tokens / estimate_tokens(text)))
+    head = keep_chars // 2
+    tail = keep_chars - head
+    omitted = len(text) - head - tail
+    return text[:head] + TRUNCATION_MARKER.format(omitted=omitted) + text[-tail:]
+
+
+def extractive_summarizer(previous_summary, messages, max_line_chars=120):
+    """
+    默认摘要器：不调用网络，每条被压缩的消息保留首行的前若干个字符。
+    """
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        content = (message.get("content") or "").strip()
+        first_line = content.splitlines()[0] if content else ""
+        if len(first_line) > max_line_chars:
+            first_line = first_line[:max_line_chars] + "…"
+        lines.append(f"- {message.get('role', 'user')}: {first_line}")
+    return "\n".join(lines)
+
+
+def make_llm_summarizer(client, model="deepseek-chat", max_tokens=256):
+    """
+    使用 LLM 生成摘要的摘要器，失败时回退到 extractive_summarizer。
+
+    Args:
+        client: package.llm_client.LLMClient 实例。
+    """
+    def summarize(previous_summary, messages):
+        transcript = "\n".join(f"{m.get('role')}: {m.get('content')}" for m in messages)
+        prompt = (
+            "请将下面的对话压缩成简洁的要点摘要，保留事实、文件路径、变量名和未完成的任务。\n"
+            f"已有摘要:\n{previous_summary or '(无)'}\n\n新的对话:\n{transcript}"
+        )
+        try:
+            return client.chat_completion_text(
+                [{"role": "user", "content": prompt}], model=model, max_tokens=max_tokens, temperature=0
+            )
+        except Exception as e:
+            logger.warning(f"LLM 摘要失败，使用抽取式摘要: {e}")
+            return extractive_summarizer(previous_summary, messages)
+    return summarize
+
+
+class ConversationHistory:
+    """
+    按 token 预算裁剪的对话历史。
+
+    可以像列表一样迭代、append 和 clear；迭代时如果存在滚动摘要，会先产出一条摘要消息。
+
+    Args:
+        token_budget: 历史（含摘要）允许占用的最大近似 token 数。
+        max_message_tokens: 单条消息的最大 token 数，超过则截断中间部分。
+        summary_tokens: 滚动摘要的最大 token 数。
+        keep_recent: 无论预算如何，至少保留的最近消息条数。
+        max_messages: 最多保留的原始消息条数（None 表示不限）。
+        summarizer: 摘要函数 (previous_summary, messages) -> str。
+    """
+
+    def __init__(self, token_budget=2000, max_message_tokens=600, summary_tokens=300,
+                 keep_recent=2, max_messages=None, summarizer=extractive_summarizer):
+        self.token_budget = token_budget
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_recent = keep_recent
+        self.max_messages = max_messages
+        self.summarizer = summarizer
+        self.summary = ""
+        self._messages = []  # [(message, tokens)]
+        self._lock = threading.RLock()
+
+    def append(self, message):
+        """添加一条消息，必要时截断并压缩旧消息"""
+        content = message.get("content") or ""
+        if self.max_message_tokens and estimate_tokens(content) > self.max_message_tokens:
+            message = dict(message, content=truncate_middle(content, self.max_message_tokens))
+        tokens = estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            self._messages.append((message, tokens))
+            self._compact()
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self.summary = ""
+
+    def total_tokens(self):
+        """当前历史（含摘要）的近似 token 数"""
+        with self._lock:
+            return self._summary_tokens() + sum(tokens for _, tokens in self._messages)
+
+    def messages(self):
+        """返回用于请求的消息列表（摘要 + 最近消息）"""
+        with self._lock:
+            result = []
+            if self.summary:
+                result.append({"role": "system", "content": f"之前对话的摘要:\n{self.summary}"})
+            result.extend(message for message, _ in self._messages)
+            return result
+
+    def __iter__(self):
+        return iter(self.messages())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._messages)
+
+    def _summary_tokens(self):
+        return estimate_tokens(self.summary) + MESSAGE_OVERHEAD_TOKENS if self.summary else 0
+
+    def _over_budget(self, summary_tokens):
+        if self.max_messages is not None and len(self._messages) > self.max_messages:
+            return True
+        return summary_tokens + sum(tokens for _, tokens in self._messages) > self.token_budget
+
+    def _compact(self):
+        if not self._over_budget(self._summary_tokens()):
+            return
+
+        # 压缩后摘要最多占用 summary_tokens，提前为它预留空间
+        reserved = self.summary_tokens + MESSAGE_OVERHEAD_TOKENS
+        evicted = []
+        while len(self._messages) > self.keep_recent and self._over_budget(reserved):
+            evicted.append(self._messages.pop(0)[0])
+        if not evicted:
+            return
+
+        self.summary = self._trim_summary(self.summarizer(self.summary, evicted) or "")
+        logger.debug(f"已将 {len(evicted)} 条旧消息压缩进摘要，当前历史约 {self.total_tokens()} tokens")
+
+    def _trim_summary(self, summary):
+        """摘要超出预算时优先丢弃最早的行，仍然过长再截断"""
+        lines = summary.splitlines()
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return truncate_middle("\n".join(lines), self.summary_tokens)
@@ -0,0 +1,248 @@
+"""
+共享的 LLM / HTTP 传输层。
+
+所有对 DeepSeek（以及其他 OpenAI 兼容接口）的调用都通过同一个带连接池的
+requests.Session 发出，保持 keep-alive，避免每一轮对话都重新进行 TCP+TLS 握手。
+插件也可以通过 get_session() 复用同一个连接池。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from package.log_manager import LogManager
+
+logger = LogManager.get_logger(__name__)
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+DEFAULT_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+DEFAULT_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+DEFAULT_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+DEFAULT_BACKOFF_FACTOR = float(os.getenv("LLM_BACKOFF_FACTOR", "0.5"))
+
+
+# POST（chat-completions）不是幂等的：只在请求尚未被服务器处理时重试
+POST_RETRY_STATUSES = frozenset({429, 503})
+
+
+class LLMRetry(Retry):
+    """
+    GET 等幂等请求在连接错误、读超时和 429/5xx 时重试；
+    POST 只在连接错误和 429/503 时重试。读超时后服务器可能已经执行了请求，
+    重试会重复调用（并重复计费），因此 POST 的读错误直接抛出。
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST":
+            return bool(self.total) and status_code in POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                   backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """
+    创建一个带连接池和重试策略的 requests.Session。
+
+    Args:
+        pool_size: 每个主机保持的最大连接数。
+        max_retries: 最大重试次数（POST 只重试连接错误和 429/503，见 LLMRetry）。
+        backoff_factor: 指数退避因子，第 n 次重试前等待 backoff_factor * 2**(n-1) 秒。
+    """
+    retry = LLMRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # 默认的幂等方法集合不含 POST，因此 POST 的读超时不会被重试
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class LatencyMetrics:
+    """记录每次调用的耗时，用于观察网络请求的延迟"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._window = window
+
+    def record(self, name, elapsed, success=True):
+        with self._lock:
+            stats = self._samples.get(name)
+            if stats is None:
+                stats = self._samples[name] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "total_seconds": 0.0,
+                    "recent": deque(maxlen=self._window),
+                }
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["recent"].append(elapsed)
+            if not success:
+                stats["errors"] += 1
+
+    def snapshot(self):
+        """返回每个调用名的统计摘要（毫秒）"""
+        with self._lock:
+            result = {}
+            for name, stats in self._samples.items():
+                recent = sorted(stats["recent"])
+                result[name] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "avg_ms": stats["total_seconds"] / stats["calls"] * 1000,
+                    "last_ms": stats["recent"][-1] * 1000,
+                    "max_ms": recent[-1] * 1000,
+                    "p50_ms": recent[len(recent) // 2] * 1000,
+                }
+            return result
+
+
+class LLMClient:
+    """
+    OpenAI 兼容的 chat-completions 客户端，复用共享连接池。
+
+    base_url 可以通过参数或 DEEPSEEK_BASE_URL 环境变量指定，
+    因此可以直接指向本地的桩服务器进行测试。
+    """
+
+    def __init__(self, api_key=None, base_url=None, session=None,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)):
+        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+        self.base_url = (base_url or os.getenv("DEEPSEEK_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.metrics = LatencyMetrics()
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def post_json(self, path, payload, metric_name=None):
+        """
+        向 base_url 下的 path 发送 JSON POST 请求并返回解析后的 JSON。
+
+        Raises:
+            requests.exceptions.RequestException: 网络错误或非 2xx 响应
+        """
+        url = f"{self.base_url}{path}"
+        metric_name = metric_name or path
+        start = time.perf_counter()
+        success = False
+        try:
+            response = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+            success = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(metric_name, elapsed, success)
+            logger.debug(f"POST {url} 耗时 {elapsed * 1000:.1f}ms (success={success})")
+
+    def chat_completion(self, messages, model="deepseek-chat", **params):
+        """
+        调用 chat-completions 接口。
+
+        Args:
+            messages: OpenAI 格式的消息列表。
+            model: 模型名称。
+            **params: 其他请求参数，如 max_tokens、temperature。
+
+        Returns:
+            dict: 接口返回的完整 JSON。
+        """
+        payload = {"model": model, "messages": messages, **params}
+        return self.post_json("/v1/chat/completions", payload, metric_name=f"chat:{model}")
+
+    def chat_completion_text(self, messages, model="deepseek-chat", **params):
+        """调用 chat-completions 接口并只返回第一条回复的文本"""
+        result = self.chat_completion(messages, model=model, **params)
+        return result["choices"][0]["message"]["content"]
+
+    def stream_chat_completion_text(self, messages, model="deepseek-chat", **params):
+        """
+        以流式（server-sent events）方式调用 chat-completions 接口。
+
+        Yields:
+            str: 依次到达的回复文本片段。
+
+        Raises:
+            requests.exceptions.RequestException: 网络错误或非 2xx 响应
+        """
+        url = f"{self.base_url}/v1/chat/completions"
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        metric_name = f"chat:{model}:stream"
+        start = time.perf_counter()
+        first_token_recorded = False
+        success = False
+        try:
+            with self.session.post(url, headers=self._headers(), json=payload,
+                                   timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for raw_line in response.iter_lines():
+                    # SSE 响应通常不声明编码（requests 会回退到 ISO-8859-1），按整行以 UTF-8 解码
+                    line = raw_line.decode("utf-8")
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if not delta:
+                        continue
+                    if not first_token_recorded:
+                        first_token_recorded = True
+                        self.metrics.record(f"{metric_name}:first_token", time.perf_counter() - start)
+                    yield delta
+            success = True
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(metric_name, elapsed, success)
+            logger.debug(f"POST {url} (stream) 耗时 {elapsed * 1000:.1f}ms (success={success})")
+
+
+_shared_lock = threading.Lock()
+_shared_session = None
+_shared_client = None
+
+
+def get_session():
+    """返回进程内共享的、带连接池的 requests.Session"""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def get_llm_client():
+    """返回进程内共享的 LLMClient（使用 DEEPSEEK_API_KEY / DEEPSEEK_BASE_URL）"""
+    global _shared_client
+    session = get_session()
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient(session=session)
+        return _shared_client
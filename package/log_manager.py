@@ -232,6 +232,12 @@ class LogManager:
         else:
             raise RuntimeError("Logger already configured. Configure must be called before first use.")
     
+    @classmethod
+    def get_log_dir(cls) -> str:
+        """获取日志目录（确保已创建）"""
+        Path(cls._log_dir).mkdir(parents=True, exist_ok=True)
+        return cls._log_dir
+
     @classmethod
     def add_context(cls, key: str, value: Any):
         """添加上下文信息到所有日志"""
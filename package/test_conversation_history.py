@@ -0,0 +1,77 @@
+# ConversationHistory 的截断与滚动摘要
+from package.conversation_history import (
+    ConversationHistory, MESSAGE_OVERHEAD_TOKENS, estimate_tokens, truncate_middle,
+)
+
+
+def _message(i, content=None):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": content or f"message number {i} " * 5}
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_truncate_middle_keeps_head_and_tail():
+    text = "HEAD" + "x" * 4000 + "TAIL"
+    truncated = truncate_middle(text, 100)
+    assert truncated.startswith("HEAD") and truncated.endswith("TAIL")
+    assert "已截断" in truncated
+    assert estimate_tokens(truncated) < estimate_tokens(text)
+    assert truncate_middle("short", 100) == "short"
+
+
+def test_long_message_is_truncated_on_append():
+    history = ConversationHistory(max_message_tokens=50)
+    history.append({"role": "user", "content": "a" * 10000})
+    content = history.messages()[0]["content"]
+    assert "已截断" in content
+    assert estimate_tokens(content) <= 50 + estimate_tokens("\n...[已截断 99999 个字符]...\n")
+
+
+def test_stays_within_token_budget_and_summarizes_oldest():
+    history = ConversationHistory(token_budget=200, summary_tokens=60, keep_recent=2)
+    for i in range(50):
+        history.append(_message(i))
+        assert history.total_tokens() <= 200
+
+    messages = history.messages()
+    assert messages[0]["role"] == "system" and "摘要" in messages[0]["content"]
+    # 最近的消息原样保留，且顺序不变
+    assert messages[-1] == _message(49)
+    assert messages[-2] == _message(48)
+    assert estimate_tokens(history.summary) <= 60
+
+
+def test_keep_recent_wins_over_budget():
+    history = ConversationHistory(token_budget=10, max_message_tokens=None, keep_recent=2)
+    for i in range(5):
+        history.append(_message(i, "x" * 400))
+    assert len(history) == 2
+    assert [m["content"] for m in history.messages()[1:]] == ["x" * 400] * 2
+
+
+def test_max_messages_limit():
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append([m["content"] for m in messages])
+        return "summary"
+
+    history = ConversationHistory(token_budget=10 ** 6, max_messages=3, summarizer=summarizer)
+    for i in range(5):
+        history.append(_message(i, f"m{i}"))
+    assert len(history) == 3
+    assert calls == [["m0"], ["m1"]]
+    assert history.total_tokens() == estimate_tokens("summary") + 4 * MESSAGE_OVERHEAD_TOKENS + 3 * 1
+
+
+def test_clear_drops_summary():
+    history = ConversationHistory(max_messages=1, keep_recent=1)
+    history.append(_message(0))
+    history.append(_message(1))
+    assert history.summary
+    history.clear()
+    assert len(history) == 0 and history.messages() == []
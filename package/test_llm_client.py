@@ -0,0 +1,105 @@
+# 使用本地桩服务器测试 LLMClient 的连接复用、重试策略和流式解析
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from package.llm_client import LLMClient, create_session
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接，才能观察到 keep-alive 复用
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append(json.loads(body))
+        action = self.server.script.pop(0) if self.server.script else "ok"
+        if action == "slow":
+            time.sleep(0.5)
+        if isinstance(action, int):
+            self._send(action, b"{}")
+        elif json.loads(body).get("stream"):
+            events = [{"choices": [{"delta": {"content": piece}}]} for piece in ("你好", "，", "world")]
+            payload = "".join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events)
+            self._send(200, (payload + "data: [DONE]\n\n").encode("utf-8"), "text/event-stream")
+        else:
+            self._send(200, json.dumps({"choices": [{"message": {"content": "pong"}}]}).encode())
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.connections = 0
+    server.requests = []
+    server.script = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, read_timeout=5):
+    return LLMClient(
+        api_key="test",
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        session=create_session(pool_size=2, max_retries=3, backoff_factor=0),
+        timeout=(2, read_timeout),
+    )
+
+
+def test_keep_alive_reuses_connection(stub):
+    client = _client(stub)
+    for _ in range(3):
+        assert client.chat_completion_text([{"role": "user", "content": "ping"}]) == "pong"
+    assert len(stub.requests) == 3
+    assert stub.connections == 1
+
+
+def test_post_retried_on_503(stub):
+    stub.script = [503, 503]
+    client = _client(stub)
+    assert client.chat_completion_text([{"role": "user", "content": "ping"}]) == "pong"
+    assert len(stub.requests) == 3
+
+
+def test_post_not_retried_on_500(stub):
+    stub.script = [500]
+    client = _client(stub)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.chat_completion([{"role": "user", "content": "ping"}])
+    assert len(stub.requests) == 1
+
+
+def test_post_not_retried_after_read_timeout(stub):
+    stub.script = ["slow"]
+    client = _client(stub, read_timeout=0.1)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.chat_completion([{"role": "user", "content": "ping"}])
+    time.sleep(0.6)
+    assert len(stub.requests) == 1
+
+
+def test_stream_parses_sse_chunks(stub):
+    client = _client(stub)
+    chunks = list(client.stream_chat_completion_text([{"role": "user", "content": "hi"}]))
+    assert chunks == ["你好", "，", "world"]
+    assert stub.requests[0]["stream"] is True
+    assert "chat:deepseek-chat:stream:first_token" in client.metrics.snapshot()
@@ -0,0 +1,42 @@
+# 隔离沙盒的策略必须比解释器的默认策略更严格
+import pytest
+
+from local_interpreter.executor.sandbox_engine import DEFAULT_POLICY, Sandbox as InterpreterSandbox
+from package.quarantine import (
+    QUARANTINE_POLICY, QUARANTINE_TIMEOUT, ResourceLimitError, Sandbox, SandboxError, SecurityError,
+)
+
+
+def test_policy_is_stricter_than_default():
+    assert QUARANTINE_POLICY.memory_limit < DEFAULT_POLICY.memory_limit
+    assert QUARANTINE_POLICY.instruction_limit < DEFAULT_POLICY.instruction_limit
+    assert QUARANTINE_POLICY.cpu_time_limit < DEFAULT_POLICY.cpu_time_limit
+    assert QUARANTINE_POLICY.allowed_builtins < DEFAULT_POLICY.allowed_builtins
+    assert {"os", "sys"} <= QUARANTINE_POLICY.forbidden_modules - DEFAULT_POLICY.forbidden_modules
+    assert Sandbox().timeout == QUARANTINE_TIMEOUT < InterpreterSandbox().timeout
+
+
+@pytest.mark.parametrize("code", ["import os", "import sys", "from os import name"])
+def test_os_and_sys_are_rejected(code):
+    with pytest.raises(SecurityError):
+        Sandbox(code_cache=False).execute(code)
+
+
+@pytest.mark.parametrize("code", ["print(1)", "divmod(7, 2)"])
+def test_removed_builtins_are_unavailable(code):
+    with pytest.raises(SandboxError, match="NameError"):
+        Sandbox(code_cache=False).execute(code)
+    InterpreterSandbox(code_cache=False).execute(code.replace("print(1)", "print(end='')"))
+
+
+def test_instruction_limit_is_tighter():
+    # 默认策略能执行完的循环在隔离沙盒中超出指令数限制
+    code = "total = 0\nfor i in range(100000):\n    total += i"
+    InterpreterSandbox(code_cache=False).execute(code)
+    with pytest.raises(ResourceLimitError):
+        Sandbox(code_cache=False).execute(code)
+
+
+def test_allowed_code_still_runs():
+    globals_dict, _ = Sandbox(code_cache=False).execute("import math\nresult = math.sqrt(16)")
+    assert globals_dict["result"] == 4.0
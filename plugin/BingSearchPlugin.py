@@ -1,5 +1,6 @@
 import requests
 from package.log_manager import LogManager
+from package.llm_client import get_session
 from plugin.plugin_interface import AbstractPlugin, PluginResult
 
 logging = LogManager.get_logger(__name__)
@@ -80,7 +81,7 @@ class BingSearchPlugin(AbstractPlugin):
 
         try:
             self._logger.info(f"发起必应搜索: {query}")
-            response = requests.get(base_url, headers=headers, params=params)
+            response = get_session().get(base_url, headers=headers, params=params, timeout=10)
             response.raise_for_status()  # 检查请求是否成功
             data = response.json()
 
@@ -1,16 +1,112 @@
 import importlib
-import pkgutil
 import inspect
-from typing import Type, Optional, List, Dict
+import json
+import os
+import pkgutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Callable, Type, Optional, List, Dict
 from .abstract_plugin import AbstractPlugin, PluginResult
+from .command_router import CommandRouter
+from .plugin_metrics import PluginMetrics
 from package.log_manager import LogManager
 
 logger = LogManager.get_logger(__name__)
 
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".butler_plugin_manifest.json")
+MANIFEST_VERSION = 1
+DEFAULT_INIT_WORKERS = int(os.getenv("PLUGIN_INIT_WORKERS", "4"))
+DEFAULT_RUN_WORKERS = int(os.getenv("PLUGIN_RUN_WORKERS", "8"))
+DEFAULT_RUN_TIMEOUT = float(os.getenv("PLUGIN_RUN_TIMEOUT", "30"))
+# 插件可以通过类属性 max_concurrency 声明允许同时执行的 run() 数量
+DEFAULT_PLUGIN_CONCURRENCY = 1
+# 大于 0 时每隔该秒数把插件统计写入日志目录下的 plugin_metrics.json
+DEFAULT_METRICS_DUMP_INTERVAL = float(os.getenv("PLUGIN_METRICS_DUMP_INTERVAL", "0"))
+
+# 插件就绪状态
+STATE_NOT_LOADED = "not_loaded"    # 只有清单记录，模块尚未导入
+STATE_INITIALIZING = "initializing"  # init() 正在后台线程池中执行
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class LazyPlugin:
+    """
+    根据插件清单创建的占位对象。
+
+    名称、命令和匹配方式直接来自清单，可以参与命令路由而无需导入模块；
+    第一次访问其他属性（run/stop/status ...）时才真正导入并初始化插件。
+    """
+
+    def __init__(self, manager, module_name, class_name, name, commands, match_type):
+        self._manager = manager
+        self.module_name = module_name
+        self.class_name = class_name
+        self._name = name
+        self._commands = list(commands)
+        self._match_type = match_type
+
+    def get_name(self):
+        return self._name
+
+    def get_commands(self):
+        return list(self._commands)
+
+    def get_match_type(self):
+        return self._match_type
+
+    def cleanup(self):
+        # 从未使用过的插件没有需要释放的资源
+        return None
+
+    def __getattr__(self, attribute):
+        return getattr(self._manager._materialize(self), attribute)
+
+
 class PluginManager:
-    def __init__(self, plugin_package: str):
+    def __init__(self, plugin_package: str, lazy: bool = True,
+                 manifest_path: Optional[str] = DEFAULT_MANIFEST_PATH,
+                 init_workers: int = DEFAULT_INIT_WORKERS,
+                 run_workers: int = DEFAULT_RUN_WORKERS,
+                 metrics_dump_interval: float = DEFAULT_METRICS_DUMP_INTERVAL):
+        """
+        Args:
+            plugin_package: 插件包名（同时作为扫描目录）。
+            lazy: 为 True 时，清单中记录且文件未修改的模块不会被导入，插件在第一次使用时才加载。
+            manifest_path: 插件清单的缓存路径，None 表示不使用清单。
+            init_workers: 后台执行插件 init() 的线程数，0 表示在加载时同步初始化。
+            run_workers: run_plugin_async 使用的线程数。
+            metrics_dump_interval: 大于 0 时定期把插件统计写入日志目录。
+        """
         self.plugin_package = plugin_package
+        self.lazy = lazy
+        self.manifest_path = manifest_path
         self.plugins: Dict[str, AbstractPlugin] = {}
+        # 命令路由索引，插件加载/卸载后标记为过期，在下一次匹配前重建
+        self.router = CommandRouter()
+        self._router_dirty = True
+
+        # 每个插件的就绪状态，以及后台 init() 的 Future 和错误信息
+        self._lock = threading.RLock()
+        self._materialize_lock = threading.Lock()
+        self._states: Dict[str, str] = {}
+        self._init_errors: Dict[str, str] = {}
+        self._init_futures = {}
+        self._init_pool = ThreadPoolExecutor(max_workers=init_workers, thread_name_prefix="plugin-init") \
+            if init_workers > 0 else None
+
+        # 异步执行：线程池、每个插件的并发信号量，以及把回调切换到UI线程的分发函数
+        self._run_pool = ThreadPoolExecutor(max_workers=run_workers, thread_name_prefix="plugin-run")
+        self._run_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._concurrency_limits: Dict[str, int] = {}
+        self.callback_dispatcher: Optional[Callable[[Callable[[], None]], None]] = None
+
+        # 每个插件和命令的调用次数、延迟百分位和错误统计
+        self.metrics = PluginMetrics()
+        if metrics_dump_interval > 0:
+            self.metrics.start_periodic_dump(metrics_dump_interval)
         
         # 配置日志
         self.logger = logger
@@ -18,63 +114,258 @@ class PluginManager:
         self.load_all_plugins()
         
     def load_all_plugins(self):
-        """加载所有可用插件"""
+        """加载所有可用插件；清单命中的模块只注册占位对象，不导入"""
         self.logger.info(f"开始加载插件包: {self.plugin_package}")
+        manifest = self._load_manifest() if self.lazy else {}
+        new_manifest = {}
         for importer, module_name, ispkg in pkgutil.walk_packages([self.plugin_package]):
-            if not ispkg:
-                full_module_name = f"{self.plugin_package}.{module_name}"
-                self.logger.info(f"扫描模块: {full_module_name}")
-                self._load_plugins_from_module(full_module_name)
-        self.logger.info(f"插件加载完成，共 {len(self.plugins)} 个插件")
+            # 测试模块不是插件，而且会导入运行时未必安装的 pytest
+            if ispkg or module_name.startswith("test_"):
+                continue
+            full_module_name = f"{self.plugin_package}.{module_name}"
+            mtime = self._module_mtime(importer, module_name)
+            entry = manifest.get(full_module_name)
+            if entry is not None and mtime is not None and entry.get("mtime") == mtime:
+                self.logger.debug(f"清单命中，延迟加载模块: {full_module_name}")
+                for info in entry["plugins"]:
+                    self._register_lazy(full_module_name, info)
+                new_manifest[full_module_name] = entry
+                continue
+
+            self.logger.info(f"扫描模块: {full_module_name}")
+            infos = self._load_plugins_from_module(full_module_name)
+            # 导入失败的模块不写入清单，下次启动时重新尝试
+            if infos is not None and mtime is not None:
+                new_manifest[full_module_name] = {"mtime": mtime, "plugins": infos}
+
+        if self.manifest_path and new_manifest != manifest:
+            self._save_manifest(new_manifest)
+        lazy_count = sum(isinstance(plugin, LazyPlugin) for plugin in self.plugins.values())
+        self.logger.info(f"插件加载完成，共 {len(self.plugins)} 个插件（其中 {lazy_count} 个延迟加载）")
     
-    def _load_plugins_from_module(self, module_name: str):
-        """从模块中加载所有插件类"""
+    def _load_plugins_from_module(self, module_name: str) -> Optional[List[dict]]:
+        """从模块中加载所有插件类，返回供清单记录的插件信息；导入失败时返回 None"""
         try:
             module = importlib.import_module(module_name)
+            infos = []
             for attribute_name in dir(module):
                 attribute = getattr(module, attribute_name)
                 if (inspect.isclass(attribute) and 
                     issubclass(attribute, AbstractPlugin) and 
-                    not inspect.isabstract(attribute)):
+                    not inspect.isabstract(attribute) and
+                    attribute.__module__ == module.__name__):
                     if attribute.__name__.endswith("Plugin"):
-                        self.load_plugin(module_name, attribute.__name__)
+                        plugin = self.load_plugin(module_name, attribute.__name__)
+                        if plugin is not None:
+                            infos.append({
+                                "class_name": attribute.__name__,
+                                "name": plugin.get_name(),
+                                "commands": list(plugin.get_commands()),
+                                "match_type": plugin.get_match_type(),
+                            })
+            return infos
         except Exception as e:
             self.logger.error(f"加载模块 {module_name} 失败: {e}")
+            return None
 
-    def load_plugin(self, module_name: str, class_name: str) -> Optional[AbstractPlugin]:
+    def load_plugin(self, module_name: str, class_name: str, background: bool = True) -> Optional[AbstractPlugin]:
         """
         Loads a single plugin from a given module and class name.
 
         Args:
             module_name: The name of the module where the plugin is located.
             class_name: The name of the plugin class.
+            background: Run the plugin's init() on the background init pool
+                instead of blocking the caller.
 
         Returns:
             An instance of the plugin if it was loaded successfully, otherwise None.
         """
+        plugin_instance = self._instantiate(module_name, class_name)
+        if plugin_instance is None:
+            return None
+        plugin_name = plugin_instance.get_name()
+
+        # 处理重复加载
+        if plugin_name in self.plugins:
+            self.logger.warning(f"插件 {plugin_name} 已存在，重新加载")
+            self.unload_plugin(plugin_name)
+
+        self._register(plugin_name, plugin_instance, background)
+        self.logger.info(f"成功加载插件: {plugin_name}")
+        return plugin_instance
+
+    def _instantiate(self, module_name: str, class_name: str) -> Optional[AbstractPlugin]:
+        """导入模块并创建插件实例，插件无效或导入失败时返回 None"""
         try:
             module = importlib.import_module(module_name)
             plugin_class: Type[AbstractPlugin] = getattr(module, class_name)
             plugin_instance = plugin_class()
-            
-            if plugin_instance.valid():
-                plugin_instance.init(self.logger)
-                plugin_name = plugin_instance.get_name()
-                
-                # 处理重复加载
-                if plugin_name in self.plugins:
-                    self.logger.warning(f"插件 {plugin_name} 已存在，重新加载")
-                    self.unload_plugin(plugin_name)
-                
-                self.plugins[plugin_name] = plugin_instance
-                self.logger.info(f"成功加载插件: {plugin_name}")
-                return plugin_instance
-            else:
-                self.logger.warning(f"插件 {class_name} 无效，跳过加载")
-                return None
         except (ModuleNotFoundError, AttributeError) as e:
             self.logger.error(f"加载插件 {module_name}.{class_name} 失败: {e}")
             return None
+        if not plugin_instance.valid():
+            self.logger.warning(f"插件 {class_name} 无效，跳过加载")
+            return None
+        return plugin_instance
+
+    def _register(self, name: str, plugin: AbstractPlugin, background: bool = True,
+                  replace: Optional["LazyPlugin"] = None) -> bool:
+        """
+        登记插件实例并开始执行 init()。
+
+        replace 为延迟加载的占位对象时，只有该占位对象仍在登记表中才会被替换，返回是否登记成功。
+        """
+        with self._lock:
+            if replace is not None and self.plugins.get(name) is not replace:
+                return False
+            self.plugins[name] = plugin
+            self._router_dirty = True
+            self._states[name] = STATE_INITIALIZING
+            self._init_errors.pop(name, None)
+        if background and self._init_pool is not None:
+            self._init_futures[name] = self._init_pool.submit(self._init_plugin, name, plugin)
+        else:
+            self._init_plugin(name, plugin)
+        return True
+
+    def _init_plugin(self, name: str, plugin: AbstractPlugin):
+        """执行插件的 init() 并记录就绪状态"""
+        try:
+            plugin.init(self.logger)
+        except Exception as e:
+            self.logger.error(f"插件 {name} 初始化失败: {e}")
+            with self._lock:
+                if self.plugins.get(name) is plugin:
+                    self._states[name] = STATE_FAILED
+                    self._init_errors[name] = str(e)
+            return
+        with self._lock:
+            if self.plugins.get(name) is plugin:
+                self._states[name] = STATE_READY
+        self.logger.info(f"插件 {name} 初始化完成")
+
+    def _register_lazy(self, module_name: str, info: dict):
+        name = info["name"]
+        with self._lock:
+            if name in self.plugins:
+                self.logger.warning(f"插件 {name} 已存在，忽略清单中的重复记录")
+                return
+            self.plugins[name] = LazyPlugin(self, module_name, info["class_name"], name,
+                                            info.get("commands", []), info.get("match_type", "contains"))
+            self._states[name] = STATE_NOT_LOADED
+            self._router_dirty = True
+
+    def _materialize(self, lazy_plugin: LazyPlugin) -> AbstractPlugin:
+        """第一次使用时导入清单中记录的插件，并同步完成初始化"""
+        name = lazy_plugin.get_name()
+        with self._materialize_lock:
+            current = self.plugins.get(name)
+            if current is not None and not isinstance(current, LazyPlugin):
+                return current
+            if current is not lazy_plugin:
+                # 占位对象已被卸载或替换
+                raise RuntimeError(f"插件 {name} 未找到或未加载")
+            self.logger.info(f"首次使用，导入插件: {name} ({lazy_plugin.module_name})")
+            plugin = self._instantiate(lazy_plugin.module_name, lazy_plugin.class_name)
+            # 直接替换占位对象：占位对象从未初始化，不需要经过卸载流程
+            if plugin is None or plugin.get_name() != name or \
+                    not self._register(name, plugin, background=False, replace=lazy_plugin):
+                # 源文件已变化或插件失效，清单会在下次启动时更新
+                with self._lock:
+                    if self.plugins.get(name) is lazy_plugin:
+                        self.plugins.pop(name)
+                        self._states.pop(name, None)
+                        self._router_dirty = True
+                raise RuntimeError(f"插件 {name} 延迟加载失败")
+            self.logger.info(f"成功加载插件: {name}")
+            return plugin
+
+    def wait_until_ready(self, name: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        等待后台 init() 完成。
+
+        Args:
+            name: 插件名称，None 表示等待所有正在初始化的插件。
+            timeout: 最长等待时间（秒），None 表示一直等待。
+
+        Returns:
+            等待结束时相应插件是否全部就绪（未导入的延迟插件不计入）。
+        """
+        futures = [self._init_futures.get(name)] if name else list(self._init_futures.values())
+        for future in futures:
+            if future is None:
+                continue
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                return False
+        names = [name] if name else list(self._states)
+        return all(self._states.get(n) in (STATE_READY, STATE_NOT_LOADED) for n in names)
+
+    def get_plugin_state(self, name: str) -> Optional[str]:
+        """获取插件的就绪状态：not_loaded / initializing / ready / failed"""
+        return self._states.get(name)
+
+    def _ready_plugin(self, name: str):
+        """
+        返回可以执行的插件：延迟插件会在这里被导入，后台初始化中的插件会等待其完成。
+        插件不存在时返回 (None, 错误信息)。
+        """
+        plugin = self.plugins.get(name)
+        if plugin is None:
+            return None, f"插件 {name} 未找到或未加载"
+        try:
+            if isinstance(plugin, LazyPlugin):
+                plugin = self._materialize(plugin)
+        except Exception as e:
+            return None, str(e)
+        future = self._init_futures.get(name)
+        if future is not None and not future.done():
+            self.logger.info(f"等待插件 {name} 完成初始化")
+            future.result()
+        if self._states.get(name) == STATE_FAILED:
+            return None, f"插件 {name} 初始化失败: {self._init_errors.get(name)}"
+        return plugin, ""
+
+    @staticmethod
+    def _module_mtime(importer, module_name: str) -> Optional[float]:
+        path = getattr(importer, "path", None)
+        if path is None:
+            return None
+        try:
+            return os.stat(os.path.join(path, module_name.rsplit(".", 1)[-1] + ".py")).st_mtime
+        except OSError:
+            return None
+
+    def _load_manifest(self) -> dict:
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"读取插件清单失败，将重新扫描: {e}")
+            return {}
+        if data.get("version") != MANIFEST_VERSION or \
+                data.get("package_dir") != os.path.abspath(self.plugin_package):
+            return {}
+        return data.get("modules", {})
+
+    def _save_manifest(self, modules: dict):
+        data = {
+            "version": MANIFEST_VERSION,
+            "package_dir": os.path.abspath(self.plugin_package),
+            "modules": modules,
+        }
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".plugin_manifest_")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            self.logger.error(f"保存插件清单失败: {e}")
 
     def unload_plugin(self, name: str) -> bool:
         """
@@ -87,7 +378,15 @@ class PluginManager:
             True if the plugin was unloaded successfully, otherwise False.
         """
         if name in self.plugins:
-            plugin = self.plugins.pop(name)
+            with self._lock:
+                plugin = self.plugins.pop(name)
+                self._router_dirty = True
+                self._states.pop(name, None)
+                self._init_errors.pop(name, None)
+                future = self._init_futures.pop(name, None)
+            if future is not None and not future.done():
+                # 不能在 init() 进行中释放资源
+                future.result()
             try:
                 plugin.cleanup()
                 self.logger.info(f"已卸载插件: {name}")
@@ -104,6 +403,35 @@ class PluginManager:
         """获取所有已加载插件"""
         return list(self.plugins.values())
 
+    def _ensure_router(self) -> CommandRouter:
+        if self._router_dirty:
+            self._router_dirty = False
+            self.router.build(list(self.plugins.values()))
+            self.logger.info(f"插件命令路由已重建，共 {len(self.plugins)} 个插件")
+        return self.router
+
+    def match_command(self, command: str) -> Optional[AbstractPlugin]:
+        """
+        Finds the plugin whose declared commands match the given command.
+
+        Args:
+            command: The user command.
+
+        Returns:
+            The first matching plugin in load order, otherwise None.
+        """
+        plugin = self._ensure_router().match(command)
+        self.logger.debug(f"命令路由耗时 {self.router.stats()['last_us']:.1f}us: {command}")
+        return plugin
+
+    def match_plugin_names(self, command: str) -> List[AbstractPlugin]:
+        """获取名称出现在命令中的插件（按加载顺序）"""
+        return self._ensure_router().match_names(command)
+
+    def get_router_stats(self) -> dict:
+        """获取命令路由的匹配耗时统计"""
+        return self._ensure_router().stats()
+
     def run_plugin(self, name: str, command: str, args: dict) -> PluginResult:
         """
         Runs a plugin with the given command and arguments.
@@ -116,25 +444,155 @@ class PluginManager:
         Returns:
             A PluginResult object with the result of the execution.
         """
-        plugin = self.get_plugin(name)
-        if plugin:
-            self.logger.info(f"执行插件: {name}，命令: {command}")
+        return self._execute(name, command, args)
+
+    def _execute(self, name: str, command: str, args: dict,
+                 settle: Optional[Callable[[PluginResult], bool]] = None) -> PluginResult:
+        """
+        执行插件并记录统计。
+
+        settle 用于异步执行：把结果交给调用方，返回 False 表示调用已经超时或被取消，
+        此时这次 run() 只计入耗时，不再算作一次成功或失败的调用（超时已单独计为失败）。
+        """
+        plugin, error_msg = self._ready_plugin(name)
+        if not plugin:
+            outcome = PluginResult(success=False, result=None, error_message=error_msg)
+            if settle is not None:
+                settle(outcome)
+            return outcome
+
+        self.logger.info(f"执行插件: {name}，命令: {command}")
+        start = time.perf_counter()
+        try:
+            outcome = PluginResult(success=True, result=plugin.run(command, args))
+            error = None
+        except Exception as e:
+            error = str(e)
+            error_msg = f"插件 {name} 执行出错: {error}"
+            self.logger.error(error_msg)
+            outcome = PluginResult(success=False, result=None, error_message=error_msg)
+        elapsed = time.perf_counter() - start
+        late = settle is not None and not settle(outcome)
+        self.metrics.record(name, command, elapsed, success=outcome.success, error=error, late=late)
+        self.logger.debug(f"插件 {name} 执行耗时 {elapsed * 1000:.1f}ms")
+        return outcome
+
+    def set_concurrency_limit(self, name: str, limit: int):
+        """设置插件允许同时执行的 run() 数量（覆盖插件的 max_concurrency 属性）"""
+        with self._lock:
+            self._concurrency_limits[name] = limit
+            self._run_semaphores.pop(name, None)
+
+    def _run_semaphore(self, name: str, plugin) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._run_semaphores.get(name)
+            if semaphore is None:
+                limit = self._concurrency_limits.get(name) or \
+                    getattr(plugin, "max_concurrency", DEFAULT_PLUGIN_CONCURRENCY)
+                semaphore = self._run_semaphores[name] = threading.BoundedSemaphore(max(1, limit))
+            return semaphore
+
+    def run_plugin_async(self, name: str, command: str, args: dict,
+                         timeout: Optional[float] = DEFAULT_RUN_TIMEOUT,
+                         callback: Optional[Callable[[PluginResult], None]] = None) -> Future:
+        """
+        Runs a plugin on the plugin executor without blocking the caller.
+
+        Calls beyond the plugin's concurrency limit wait for a free slot. If the
+        call is not finished within ``timeout`` seconds (measured from submission),
+        or the returned future is cancelled, the plugin's ``stop()`` hook is
+        invoked so it can abort cooperatively.
+
+        Args:
+            name: The name of the plugin to run.
+            command: The command to execute.
+            args: The arguments for the command.
+            timeout: Wall-clock timeout in seconds, None for no limit.
+            callback: Called with the PluginResult when the call finishes or times
+                out (not on cancellation). It runs through ``callback_dispatcher``
+                when one is set, e.g. to marshal it onto the Tk main loop.
+
+        Returns:
+            A Future resolving to a PluginResult.
+        """
+        # 返回的 Future 始终保持 PENDING 直到得出结果，因此调用方在执行期间也可以 cancel()
+        future = Future()
+        started = threading.Event()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def settle(result):
             try:
-                result = plugin.run(command, args)
-                return PluginResult(success=True, result=result)
+                future.set_result(result)
+                return True
+            except InvalidStateError:
+                return False
+
+        def worker():
+            if future.done():
+                return
+            plugin, error_msg = self._ready_plugin(name)
+            if plugin is None:
+                settle(PluginResult(success=False, result=None, error_message=error_msg))
+                return
+            semaphore = self._run_semaphore(name, plugin)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not semaphore.acquire(timeout=remaining):
+                return  # 已由超时处理
+            try:
+                if future.done():
+                    return
+                started.set()
+                self._execute(name, command, args, settle)
+            finally:
+                semaphore.release()
+
+        def on_timeout():
+            error_msg = f"插件 {name} 执行超时 ({timeout}s)"
+            if settle(PluginResult(success=False, result=None, error_message=error_msg)):
+                self.logger.warning(error_msg)
+                self.metrics.record_timeout(name, command, error_msg)
+                if started.is_set():
+                    self.stop_plugin(name)
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, on_timeout)
+            timer.daemon = True
+            timer.start()
+
+        def on_done(done_future):
+            if timer is not None:
+                timer.cancel()
+            if done_future.cancelled():
+                self.logger.info(f"插件 {name} 的执行已取消")
+                if started.is_set():
+                    self.stop_plugin(name)
+                return
+            if callback is not None:
+                self._dispatch(callback, done_future.result())
+
+        future.add_done_callback(on_done)
+        self._run_pool.submit(worker)
+        return future
+
+    def _dispatch(self, callback: Callable, result: PluginResult):
+        def invoke():
+            try:
+                callback(result)
             except Exception as e:
-                error_msg = f"插件 {name} 执行出错: {str(e)}"
-                self.logger.error(error_msg)
-                return PluginResult(success=False, result=None, error_message=error_msg)
-        return PluginResult(
-            success=False, 
-            result=None, 
-            error_message=f"插件 {name} 未找到或未加载"
-        )
+                self.logger.error(f"插件结果回调出错: {e}")
+
+        if self.callback_dispatcher is not None:
+            self.callback_dispatcher(invoke)
+        else:
+            invoke()
     
     def stop_plugin(self, name: str) -> PluginResult:
         """停止插件运行"""
         plugin = self.get_plugin(name)
+        if isinstance(plugin, LazyPlugin):
+            # 从未导入过的插件不可能在运行
+            return PluginResult(success=True, result=None)
         if plugin:
             self.logger.info(f"停止插件: {name}")
             try:
@@ -151,13 +609,28 @@ class PluginManager:
         )
     
     def get_plugin_status(self, name: str) -> PluginResult:
-        """获取插件状态"""
+        """
+        获取插件状态。
+
+        result 为 {"state": 就绪状态, "status": plugin.status() 的返回值, "metrics": 执行统计}；
+        插件尚未导入或仍在初始化时不会调用 status()，status 为 None；没有执行记录时 metrics 为 None。
+        """
         plugin = self.get_plugin(name)
         if plugin:
             self.logger.info(f"查询插件状态: {name}")
+            state = self._states.get(name)
+            metrics = self.metrics.snapshot(name)
+            if state == STATE_FAILED:
+                return PluginResult(
+                    success=False,
+                    result={"state": state, "status": None, "metrics": metrics},
+                    error_message=f"插件 {name} 初始化失败: {self._init_errors.get(name)}"
+                )
+            if state != STATE_READY:
+                return PluginResult(success=True, result={"state": state, "status": None, "metrics": metrics})
             try:
                 status = plugin.status()
-                return PluginResult(success=True, result=status)
+                return PluginResult(success=True, result={"state": state, "status": status, "metrics": metrics})
             except Exception as e:
                 error_msg = f"获取插件 {name} 状态出错: {str(e)}"
                 self.logger.error(error_msg)
@@ -167,3 +640,18 @@ class PluginManager:
             result=None, 
             error_message=f"插件 {name} 未找到或未加载"
         )
+
+    def get_stats(self) -> dict:
+        """获取所有插件的执行统计 {插件名: 统计}"""
+        return self.metrics.snapshot()
+
+    def format_stats(self) -> str:
+        """获取可读的插件统计表格，包括就绪状态和命令路由耗时"""
+        lines = [self.metrics.format_table()]
+        states = {}
+        for state in self._states.values():
+            states[state] = states.get(state, 0) + 1
+        lines.append("插件状态: " + ", ".join(f"{state}={count}" for state, count in sorted(states.items())))
+        router = self.get_router_stats()
+        lines.append(f"命令路由: {router['matches']} 次匹配, 平均 {router['avg_us']:.1f}us")
+        return "\n".join(lines)
@@ -0,0 +1,180 @@
+"""
+预编译的插件命令路由。
+
+插件通过 get_commands() 声明命令，通过 get_match_type() 声明匹配方式：
+- exact:    哈希表，O(1)
+- prefix:   前缀树（trie），沿命令逐字符走一遍
+- contains: Aho–Corasick 自动机，一次扫描找出所有出现的命令
+
+因此无论加载了多少插件，一次路由的代价都只与命令长度有关。
+多个插件同时匹配时，与原来的线性扫描保持一致：先注册的插件优先。
+"""
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+
+class AhoCorasick:
+    """Aho–Corasick 多模式匹配自动机"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = True
+
+    def add(self, pattern, value):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(value)
+        self._built = False
+
+    def build(self):
+        """计算失败指针（广度优先）"""
+        queue = deque()
+        for next_node in self._goto[0].values():
+            self._fail[next_node] = 0
+            queue.append(next_node)
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_node] = candidate if candidate != next_node else 0
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+        self._built = True
+
+    def search(self, text):
+        """返回 text 中出现的所有模式对应的值"""
+        if not self._built:
+            self.build()
+        found = []
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found.extend(self._output[node])
+        return found
+
+
+class PrefixTrie:
+    """前缀树：找出所有是给定文本前缀的模式"""
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, pattern, value):
+        node = self._root
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+
+    def prefixes_of(self, text):
+        found = list(self._root.get(None, []))
+        node = self._root
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found.extend(node.get(None, ()))
+        return found
+
+
+class CommandRouter:
+    """根据插件命令构建的索引路由器"""
+
+    def __init__(self):
+        self._plugins = []
+        self._exact = {}
+        self._prefix = PrefixTrie()
+        self._contains = AhoCorasick()
+        self._names = AhoCorasick()
+        self._lock = threading.Lock()
+        self._match_count = 0
+        self._match_seconds = 0.0
+        self._last_match_seconds = 0.0
+
+    def build(self, plugins):
+        """用插件列表（按加载顺序）重新构建所有索引"""
+        exact = {}
+        prefix = PrefixTrie()
+        contains = AhoCorasick()
+        names = AhoCorasick()
+
+        for order, plugin in enumerate(plugins):
+            names.add(plugin.get_name().lower(), order)
+
+            get_commands = getattr(plugin, "get_commands", None)
+            if get_commands is None:
+                continue
+            get_match_type = getattr(plugin, "get_match_type", None)
+            match_type = get_match_type() if get_match_type else 'contains'
+            for command in get_commands():
+                command = command.lower()
+                if not command:
+                    continue
+                if match_type == 'exact':
+                    exact.setdefault(command, order)
+                elif match_type == 'prefix':
+                    prefix.add(command, order)
+                elif match_type == 'contains':
+                    contains.add(command, order)
+
+        contains.build()
+        names.build()
+        with self._lock:
+            self._plugins = list(plugins)
+            self._exact = exact
+            self._prefix = prefix
+            self._contains = contains
+            self._names = names
+
+    def match(self, command) -> Optional[object]:
+        """返回与命令匹配的插件（先注册者优先），没有匹配时返回 None"""
+        start = time.perf_counter()
+        text = command.lower()
+        with self._lock:
+            candidates = self._prefix.prefixes_of(text) + self._contains.search(text)
+            exact = self._exact.get(text)
+            if exact is not None:
+                candidates.append(exact)
+            plugin = self._plugins[min(candidates)] if candidates else None
+        self._record(time.perf_counter() - start)
+        return plugin
+
+    def match_names(self, command) -> List[object]:
+        """返回名称出现在命令中的所有插件（按加载顺序）"""
+        text = command.lower()
+        with self._lock:
+            orders = sorted(set(self._names.search(text)))
+            return [self._plugins[order] for order in orders]
+
+    def _record(self, elapsed):
+        with self._lock:
+            self._match_count += 1
+            self._match_seconds += elapsed
+            self._last_match_seconds = elapsed
+
+    def stats(self):
+        """返回路由匹配的次数和耗时统计（微秒）"""
+        with self._lock:
+            return {
+                "plugins": len(self._plugins),
+                "matches": self._match_count,
+                "avg_us": self._match_seconds / self._match_count * 1e6 if self._match_count else 0.0,
+                "last_us": self._last_match_seconds * 1e6,
+            }
@@ -2,6 +2,7 @@ import os
 import time
 import requests
 from uuid import uuid4
+from package.llm_client import get_session
 from plugin.plugin_interface import AbstractPlugin, PluginResult
 from package.log_manager import LogManager
 
@@ -51,7 +52,7 @@ class DownloadURLPlugin(AbstractPlugin):
 
         try:
             # 使用 requests 下载网页内容
-            response = requests.get(url)
+            response = get_session().get(url, timeout=30)
             response.raise_for_status()  # 检查请求是否成功
             # 将内容保存到文件中
             file_name = f"download_url-{uuid4().hex}.txt"
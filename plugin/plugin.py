@@ -17,14 +17,9 @@ def match_command_to_plugin(command: str):
     """
     Matches a command to a plugin.
     """
-    for plugin in plugin_manager.get_all_plugins():
-        for cmd in plugin.get_commands():
-            if plugin.get_match_type() == 'exact' and command.lower() == cmd.lower():
-                return plugin.get_name(), {}, plugin
-            elif plugin.get_match_type() == 'prefix' and command.lower().startswith(cmd.lower()):
-                return plugin.get_name(), {}, plugin
-            elif plugin.get_match_type() == 'contains' and cmd.lower() in command.lower():
-                return plugin.get_name(), {}, plugin
+    plugin = plugin_manager.match_command(command)
+    if plugin:
+        return plugin.get_name(), {}, plugin
     return None, None, None
     
 def process_command(command: str):
@@ -0,0 +1,209 @@
+"""
+插件执行的延迟和错误统计。
+
+PluginManager 在每次 run() 前后记录耗时和结果，按插件和按（插件, 命令）两级汇总：
+调用次数、错误率、超时次数、p50/p95/p99 延迟以及最近一次错误。
+超时的调用计为失败（错误率包含超时）；超时后才结束的 run() 只计入延迟，不再计为一次调用。
+统计可以通过 get_plugin_status、CommandPanel 的 /stats 命令查看，
+也可以定期以 JSON 形式写入 LogManager 的日志目录。
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+from package.log_manager import LogManager
+
+logger = LogManager.get_logger(__name__)
+
+DEFAULT_WINDOW = 500
+MAX_COMMANDS_PER_PLUGIN = 50
+COMMAND_KEY_LENGTH = 40
+
+
+def percentile(sorted_samples, fraction):
+    """最近秩法计算百分位数，sorted_samples 必须已排序且非空"""
+    return sorted_samples[max(0, math.ceil(fraction * len(sorted_samples)) - 1)]
+
+
+def command_key(command):
+    """把命令规范化为统计用的键：去掉首尾空白、小写并截断"""
+    text = " ".join((command or "").lower().split())
+    return text[:COMMAND_KEY_LENGTH]
+
+
+class _Series:
+    """一组调用的计数和最近耗时窗口"""
+
+    def __init__(self, window):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.samples = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=window)
+        self.last_error = None
+        self.last_error_time = None
+
+    def record(self, elapsed, success, error, late=False):
+        self.samples += 1
+        self.total_seconds += elapsed
+        self.recent.append(elapsed)
+        if late:
+            # 调用已经按超时计数
+            return
+        self.calls += 1
+        if not success:
+            self.errors += 1
+            self.last_error = error
+            self.last_error_time = time.time()
+
+    def record_timeout(self, error):
+        self.calls += 1
+        self.timeouts += 1
+        self.last_error = error
+        self.last_error_time = time.time()
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        result = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "error_rate": (self.errors + self.timeouts) / self.calls if self.calls else 0.0,
+            "avg_ms": self.total_seconds / self.samples * 1000 if self.samples else 0.0,
+            "p50_ms": 0.0,
+            "p95_ms": 0.0,
+            "p99_ms": 0.0,
+            "last_error": self.last_error,
+            "last_error_time": self.last_error_time,
+        }
+        if recent:
+            result["p50_ms"] = percentile(recent, 0.50) * 1000
+            result["p95_ms"] = percentile(recent, 0.95) * 1000
+            result["p99_ms"] = percentile(recent, 0.99) * 1000
+        return result
+
+
+class PluginMetrics:
+    """
+    按插件和命令汇总的执行统计。
+
+    Args:
+        window: 每个序列用于计算百分位数的最近样本数。
+        max_commands: 每个插件最多单独统计的命令数，超出后丢弃最久未出现的命令。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_commands=MAX_COMMANDS_PER_PLUGIN):
+        self.window = window
+        self.max_commands = max_commands
+        self._lock = threading.Lock()
+        self._plugins = {}   # {plugin: _Series}
+        self._commands = {}  # {plugin: OrderedDict{command_key: _Series}}
+        self._dump_stop = None
+
+    def _series(self, plugin, command):
+        series = self._plugins.get(plugin)
+        if series is None:
+            series = self._plugins[plugin] = _Series(self.window)
+        commands = self._commands.setdefault(plugin, OrderedDict())
+        key = command_key(command)
+        command_series = commands.get(key)
+        if command_series is None:
+            command_series = commands[key] = _Series(self.window)
+            while len(commands) > self.max_commands:
+                commands.popitem(last=False)
+        else:
+            commands.move_to_end(key)
+        return series, command_series
+
+    def record(self, plugin, command, elapsed, success=True, error=None, late=False):
+        """记录一次 run() 调用；late 表示调用已经超时或被取消，只记录耗时"""
+        with self._lock:
+            for series in self._series(plugin, command):
+                series.record(elapsed, success, error, late)
+
+    def record_timeout(self, plugin, command, error):
+        """记录一次超时，计为一次失败的调用（run() 之后结束时以 late=True 记录耗时）"""
+        with self._lock:
+            for series in self._series(plugin, command):
+                series.record_timeout(error)
+
+    def snapshot(self, plugin=None):
+        """
+        返回统计快照。
+
+        Args:
+            plugin: 插件名称；为 None 时返回所有插件 {name: 快照}。
+
+        Returns:
+            单个插件的快照为插件级统计加上 "commands": {命令: 统计}；插件没有记录时返回 None。
+        """
+        with self._lock:
+            if plugin is not None:
+                return self._plugin_snapshot(plugin)
+            return {name: self._plugin_snapshot(name) for name in self._plugins}
+
+    def _plugin_snapshot(self, plugin):
+        series = self._plugins.get(plugin)
+        if series is None:
+            return None
+        result = series.snapshot()
+        result["commands"] = {key: s.snapshot() for key, s in self._commands.get(plugin, {}).items()}
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._plugins.clear()
+            self._commands.clear()
+
+    def format_table(self):
+        """把插件级统计格式化为文本表格（用于 /stats）"""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "暂无插件执行记录"
+        lines = [f"{'插件':<24}{'调用':>6}{'错误率':>8}{'超时':>6}{'p50':>10}{'p95':>10}{'p99':>10}"]
+        for name, stats in sorted(snapshot.items(), key=lambda item: -item[1]["p95_ms"]):
+            lines.append(
+                f"{name:<24}{stats['calls']:>6}{stats['error_rate']:>8.1%}{stats['timeouts']:>6}"
+                f"{stats['p50_ms']:>8.1f}ms{stats['p95_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms"
+            )
+            if stats["last_error"]:
+                lines.append(f"    最近错误: {stats['last_error']}")
+        return "\n".join(lines)
+
+    # --- JSON 导出 ---
+    def dump(self, path):
+        """把统计快照原子地写入 JSON 文件"""
+        data = {"timestamp": time.time(), "plugins": self.snapshot()}
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".plugin_metrics_")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"写入插件统计失败: {e}")
+
+    def start_periodic_dump(self, interval, path=None):
+        """
+        每隔 interval 秒把统计写入 path（默认为日志目录下的 plugin_metrics.json）。
+        """
+        self.stop_periodic_dump()
+        path = path or os.path.join(LogManager.get_log_dir(), "plugin_metrics.json")
+        stop = self._dump_stop = threading.Event()
+        threading.Thread(target=self._dump_loop, args=(stop, interval, path),
+                         name="plugin-metrics-dump", daemon=True).start()
+        logger.info(f"插件统计将每 {interval}s 写入 {path}")
+
+    def stop_periodic_dump(self):
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+
+    def _dump_loop(self, stop, interval, path):
+        while not stop.wait(interval):
+            self.dump(path)
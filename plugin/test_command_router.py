@@ -0,0 +1,98 @@
+# CommandRouter 必须与原来的线性扫描给出相同结果：先注册的插件优先
+import random
+
+import pytest
+
+from plugin.command_router import AhoCorasick, CommandRouter
+
+
+class FakePlugin:
+    def __init__(self, name, commands, match_type="contains"):
+        self.name = name
+        self.commands = commands
+        self.match_type = match_type
+
+    def get_name(self):
+        return self.name
+
+    def get_commands(self):
+        return self.commands
+
+    def get_match_type(self):
+        return self.match_type
+
+    def __repr__(self):
+        return self.name
+
+
+def linear_match(plugins, command):
+    """索引化之前 PluginManager.match_command 的实现"""
+    text = command.lower()
+    for plugin in plugins:
+        for pattern in plugin.get_commands():
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            match_type = plugin.get_match_type()
+            if (match_type == "exact" and text == pattern) or \
+                    (match_type == "prefix" and text.startswith(pattern)) or \
+                    (match_type == "contains" and pattern in text):
+                return plugin
+    return None
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick()
+    for pattern in ("he", "she", "his", "hers"):
+        automaton.add(pattern, pattern)
+    assert sorted(automaton.search("ushers")) == ["he", "hers", "she"]
+
+
+@pytest.mark.parametrize("command, expected", [
+    # 后注册的插件命令更长也不优先
+    ("提醒我明天开会", "reminder"),
+    # 失败指针上的输出也要计入：“she”的后缀“he”属于更早的插件
+    ("ushers", "early"),
+    ("打开记事本", "notepad"),
+    ("打开记事本吧", "open_prefix"),
+    ("search cats", "search"),
+    ("nothing to do", None),
+])
+def test_earliest_registered_plugin_wins(command, expected):
+    plugins = [
+        FakePlugin("early", ["he"]),
+        FakePlugin("reminder", ["提醒"]),
+        FakePlugin("notepad", ["打开记事本"], "exact"),
+        FakePlugin("open_prefix", ["打开"], "prefix"),
+        FakePlugin("late", ["she", "提醒我明天开会"]),
+        FakePlugin("search", ["SEARCH "], "prefix"),
+    ]
+    router = CommandRouter()
+    router.build(plugins)
+    plugin = router.match(command)
+    assert (plugin.get_name() if plugin else None) == expected
+    assert plugin is linear_match(plugins, command)
+
+
+def test_matches_linear_scan_on_random_commands():
+    rng = random.Random(0)
+    alphabet = "abc记事"
+
+    def word(low, high):
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+    plugins = [FakePlugin(f"p{i}", [word(1, 3) for _ in range(rng.randint(0, 3))],
+                          rng.choice(["exact", "prefix", "contains"]))
+               for i in range(30)]
+    router = CommandRouter()
+    router.build(plugins)
+    for _ in range(2000):
+        command = word(0, 8)
+        assert router.match(command) is linear_match(plugins, command), command
+
+
+def test_match_names_in_load_order():
+    plugins = [FakePlugin("time", []), FakePlugin("memo", []), FakePlugin("TimeZone", [])]
+    router = CommandRouter()
+    router.build(plugins)
+    assert router.match_names("memo the timezone") == [plugins[0], plugins[1], plugins[2]]
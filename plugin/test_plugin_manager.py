@@ -0,0 +1,259 @@
+# 插件清单与延迟加载的完整生命周期，以及异步执行的超时、取消、并发限制和回调分发
+import os
+import sys
+import textwrap
+import time
+
+import pytest
+
+from plugin.PluginManager import LazyPlugin, PluginManager, STATE_NOT_LOADED, STATE_READY
+
+PLUGIN_SOURCE = textwrap.dedent('''
+    from plugin.abstract_plugin import AbstractPlugin
+
+    INITS = []
+
+
+    class EchoPlugin(AbstractPlugin):
+        def get_name(self):
+            return "echo"
+
+        def get_commands(self):
+            return ["echo"]
+
+        def get_match_type(self):
+            return "prefix"
+
+        def valid(self):
+            return True
+
+        def init(self, logger):
+            INITS.append(self)
+
+        def run(self, command, args):
+            return command.upper()
+
+        def stop(self):
+            return None
+
+        def cleanup(self):
+            return None
+
+        def status(self):
+            return "ok"
+''')
+
+
+@pytest.fixture
+def plugin_dir(tmp_path, monkeypatch):
+    package = tmp_path / "lazy_test_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "echo_plugin.py").write_text(PLUGIN_SOURCE)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield package
+    for name in [name for name in sys.modules if name.startswith("lazy_test_plugins")]:
+        del sys.modules[name]
+
+
+def _forget_module():
+    sys.modules.pop("lazy_test_plugins.echo_plugin", None)
+
+
+def _manager(tmp_path):
+    return PluginManager("lazy_test_plugins", manifest_path=str(tmp_path / "manifest.json"), init_workers=0)
+
+
+def test_manifest_hit_defers_import_until_first_use(plugin_dir, tmp_path, monkeypatch):
+    first = _manager(tmp_path)
+    assert first.get_plugin_state("echo") == STATE_READY
+    assert os.path.exists(tmp_path / "manifest.json")
+    _forget_module()
+
+    manager = _manager(tmp_path)
+    placeholder = manager.get_plugin("echo")
+    assert isinstance(placeholder, LazyPlugin)
+    assert manager.get_plugin_state("echo") == STATE_NOT_LOADED
+    assert "lazy_test_plugins.echo_plugin" not in sys.modules
+    # 路由只用清单中的命令，不会导入模块
+    assert manager.match_command("echo hi") is placeholder
+    assert "lazy_test_plugins.echo_plugin" not in sys.modules
+
+    # 第一次执行时直接替换占位对象，不走重复加载的卸载流程
+    monkeypatch.setattr(manager, "unload_plugin", lambda name: pytest.fail("unload_plugin called"))
+    result = manager.run_plugin("echo", "echo hi", {})
+    assert result.success and result.result == "ECHO HI"
+    plugin = manager.get_plugin("echo")
+    assert not isinstance(plugin, LazyPlugin)
+    assert manager.get_plugin_state("echo") == STATE_READY
+    assert sys.modules["lazy_test_plugins.echo_plugin"].INITS == [plugin]
+    assert manager.match_command("echo again") is plugin
+
+    manager.run_plugin("echo", "echo again", {})
+    assert sys.modules["lazy_test_plugins.echo_plugin"].INITS == [plugin]
+
+
+def test_modified_module_is_imported_eagerly(plugin_dir, tmp_path):
+    _manager(tmp_path)
+    _forget_module()
+    module_path = plugin_dir / "echo_plugin.py"
+    stat = module_path.stat()
+    os.utime(module_path, (stat.st_atime, stat.st_mtime + 10))
+
+    manager = _manager(tmp_path)
+    assert not isinstance(manager.get_plugin("echo"), LazyPlugin)
+    assert manager.get_plugin_state("echo") == STATE_READY
+
+
+def test_unloaded_placeholder_is_not_materialized(plugin_dir, tmp_path):
+    _manager(tmp_path)
+    _forget_module()
+
+    manager = _manager(tmp_path)
+    placeholder = manager.get_plugin("echo")
+    assert manager.unload_plugin("echo")
+    with pytest.raises(RuntimeError):
+        placeholder.run("echo hi", {})
+    assert manager.get_plugin("echo") is None
+    assert "lazy_test_plugins.echo_plugin" not in sys.modules
+
+
+def test_test_modules_are_not_scanned(plugin_dir, tmp_path):
+    (plugin_dir / "test_echo.py").write_text("raise ImportError('不是插件')")
+    manager = _manager(tmp_path)
+    assert "lazy_test_plugins.test_echo" not in sys.modules
+    assert list(manager.plugins) == ["echo"]
+
+
+BLOCKING_SOURCE = textwrap.dedent('''
+    import threading
+
+    from plugin.abstract_plugin import AbstractPlugin
+
+    RELEASE = threading.Event()
+    STARTED = threading.Event()
+    STOPS = []
+    RUNNING = [0, 0]  # [当前并发数, 最大并发数]
+    _lock = threading.Lock()
+
+
+    class BlockingPlugin(AbstractPlugin):
+        def get_name(self):
+            return "block"
+
+        def get_commands(self):
+            return ["block"]
+
+        def get_match_type(self):
+            return "prefix"
+
+        def valid(self):
+            return True
+
+        def init(self, logger):
+            pass
+
+        def run(self, command, args):
+            with _lock:
+                RUNNING[0] += 1
+                RUNNING[1] = max(RUNNING)
+            STARTED.set()
+            try:
+                RELEASE.wait(10)
+                return command
+            finally:
+                with _lock:
+                    RUNNING[0] -= 1
+
+        def stop(self):
+            # 协作式中止：让正在执行的 run() 返回
+            STOPS.append(True)
+            RELEASE.set()
+
+        def cleanup(self):
+            return None
+
+        def status(self):
+            return "ok"
+''')
+
+
+@pytest.fixture
+def blocking(plugin_dir, tmp_path):
+    (plugin_dir / "blocking_plugin.py").write_text(BLOCKING_SOURCE)
+    manager = PluginManager("lazy_test_plugins", manifest_path=None, init_workers=0)
+    yield manager, sys.modules["lazy_test_plugins.blocking_plugin"]
+    sys.modules["lazy_test_plugins.blocking_plugin"].RELEASE.set()
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_async_run_times_out_and_stops_plugin(blocking):
+    manager, module = blocking
+    results = []
+    future = manager.run_plugin_async("block", "block", {}, timeout=0.2, callback=results.append)
+    result = future.result(timeout=2)
+    assert not result.success and "超时" in result.error_message
+    _wait_for(lambda: module.STOPS and results)
+    assert module.STOPS == [True]
+    assert results == [result]
+
+    # 超时后才结束的 run() 只计入耗时，这次调用仍算作失败
+    _wait_for(lambda: manager.get_stats()["block"]["p50_ms"] > 0)
+    stats = manager.get_stats()["block"]
+    assert (stats["calls"], stats["timeouts"], stats["error_rate"]) == (1, 1, 1.0)
+    assert "100.0%" in manager.format_stats().splitlines()[1]
+
+
+def test_cancel_stops_running_plugin_without_callback(blocking):
+    manager, module = blocking
+    results = []
+    future = manager.run_plugin_async("block", "block", {}, timeout=None, callback=results.append)
+    assert module.STARTED.wait(2)
+    assert future.cancel()
+    assert module.STOPS == [True]
+    time.sleep(0.1)
+    assert results == []
+
+
+def test_concurrency_limit_queues_extra_calls(blocking):
+    manager, module = blocking
+    manager.set_concurrency_limit("block", 1)
+    futures = [manager.run_plugin_async("block", f"block {i}", {}, timeout=None) for i in range(3)]
+    assert module.STARTED.wait(2)
+    time.sleep(0.1)
+    assert module.RUNNING == [1, 1]
+    assert not any(future.done() for future in futures)
+
+    module.RELEASE.set()
+    assert [future.result(timeout=2).result for future in futures] == ["block 0", "block 1", "block 2"]
+    assert module.RUNNING[1] == 1
+
+
+def test_format_stats_includes_states_and_router(plugin_dir, tmp_path):
+    manager = _manager(tmp_path)
+    manager.match_command("echo hi")
+    manager.run_plugin("echo", "echo hi", {})
+    lines = manager.format_stats().splitlines()
+    assert lines[1].startswith("echo")
+    assert "插件状态: ready=1" in lines
+    assert lines[-1].startswith("命令路由: 1 次匹配")
+
+
+def test_callbacks_go_through_dispatcher(plugin_dir, tmp_path):
+    manager = _manager(tmp_path)
+    dispatched, results = [], []
+    manager.callback_dispatcher = dispatched.append
+    future = manager.run_plugin_async("echo", "echo hi", {}, callback=results.append)
+    assert future.result(timeout=2).result == "ECHO HI"
+    _wait_for(lambda: dispatched)
+    # 回调只在分发函数（例如Tk主循环）调用时执行
+    assert results == []
+    dispatched[0]()
+    assert [result.result for result in results] == ["ECHO HI"]
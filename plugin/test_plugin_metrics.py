@@ -0,0 +1,97 @@
+# 插件执行统计：百分位数、按命令统计、超时计数、/stats 表格和定期写入 JSON
+import json
+import time
+
+import pytest
+
+from package.log_manager import LogManager
+from plugin.plugin_metrics import PluginMetrics, command_key, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentile(samples, 0.50) == 50
+    assert percentile(samples, 0.95) == 95
+    assert percentile(samples, 0.99) == 99
+    assert percentile([7], 0.99) == 7
+
+
+def test_snapshot_reports_percentiles_in_ms():
+    metrics = PluginMetrics()
+    for ms in range(1, 101):
+        metrics.record("echo", "echo", ms / 1000)
+    stats = metrics.snapshot("echo")
+    assert stats["calls"] == 100
+    assert stats["p50_ms"] == pytest.approx(50)
+    assert stats["p95_ms"] == pytest.approx(95)
+    assert stats["p99_ms"] == pytest.approx(99)
+    assert stats["avg_ms"] == pytest.approx(50.5)
+    assert metrics.snapshot("missing") is None
+
+
+def test_window_keeps_recent_samples_only():
+    metrics = PluginMetrics(window=10)
+    for _ in range(100):
+        metrics.record("echo", "echo", 1.0)
+    for _ in range(10):
+        metrics.record("echo", "echo", 0.001)
+    assert metrics.snapshot("echo")["p99_ms"] == pytest.approx(1)
+
+
+def test_commands_are_tracked_separately():
+    metrics = PluginMetrics(max_commands=2)
+    metrics.record("echo", "Echo  Hi", 0.01)
+    metrics.record("echo", "echo hi", 0.03)
+    metrics.record("echo", "echo bye", 0.02, success=False, error="boom")
+    stats = metrics.snapshot("echo")
+    assert stats["calls"] == 3 and stats["errors"] == 1
+    assert stats["commands"]["echo hi"]["calls"] == 2
+    assert stats["commands"]["echo bye"]["last_error"] == "boom"
+
+    # 超出上限时丢弃最久未出现的命令，插件级统计不受影响
+    metrics.record("echo", "echo third", 0.01)
+    assert set(metrics.snapshot("echo")["commands"]) == {"echo bye", "echo third"}
+    assert metrics.snapshot("echo")["calls"] == 4
+    assert command_key("x" * 100) == "x" * 40
+
+
+def test_timeouts_count_as_failures():
+    metrics = PluginMetrics()
+    metrics.record("slow", "slow", 0.01)
+    metrics.record_timeout("slow", "slow", "插件 slow 执行超时 (1s)")
+    # 超时后才结束的 run() 只记录耗时
+    metrics.record("slow", "slow", 2.0, late=True)
+    stats = metrics.snapshot("slow")
+    assert (stats["calls"], stats["errors"], stats["timeouts"]) == (2, 0, 1)
+    assert stats["error_rate"] == pytest.approx(0.5)
+    assert stats["p99_ms"] == pytest.approx(2000)
+    assert stats["last_error"] == "插件 slow 执行超时 (1s)"
+
+
+def test_format_table_sorts_by_p95():
+    metrics = PluginMetrics()
+    assert metrics.format_table() == "暂无插件执行记录"
+    metrics.record("fast", "fast", 0.001)
+    metrics.record("slow", "slow", 0.5, success=False, error="boom")
+    lines = metrics.format_table().splitlines()
+    assert lines[1].startswith("slow") and "100.0%" in lines[1]
+    assert lines[2] == "    最近错误: boom"
+    assert lines[3].startswith("fast") and "0.0%" in lines[3]
+
+
+def test_periodic_dump_writes_json_to_log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogManager, "get_log_dir", classmethod(lambda cls: str(tmp_path)))
+    metrics = PluginMetrics()
+    metrics.record("echo", "echo", 0.01)
+    metrics.start_periodic_dump(0.05)
+    try:
+        path = tmp_path / "plugin_metrics.json"
+        deadline = time.monotonic() + 2
+        while not path.exists():
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+    finally:
+        metrics.stop_periodic_dump()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["plugins"]["echo"]["calls"] == 1
+    assert not list(tmp_path.glob(".plugin_metrics_*"))
@@ -25,3 +25,56 @@ def lazy_import(name, optional=True):
     loader.exec_module(module)
 
     return module
+
+
+def profile_imports(module_name, cwd=None):
+    """
+    在独立的解释器中以 ``-X importtime`` 导入指定模块，返回每个模块的导入耗时。
+
+    Args:
+        module_name: 要分析的入口模块，例如 ``butler.main``。
+        cwd: 子进程的工作目录，默认为当前目录。
+
+    Returns:
+        list[tuple[str, int, int]]: ``(模块名, 自身耗时us, 累计耗时us)``，按累计耗时降序排列。
+    """
+    import subprocess
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        # 格式: "import time:       123 |        456 |   package.module"
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头行
+        entries.append((parts[2].strip(), self_us, cumulative_us))
+
+    if proc.returncode != 0:
+        error_lines = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise ImportError(f"无法导入模块 '{module_name}':\n" + "\n".join(error_lines[-5:]))
+
+    entries.sort(key=lambda entry: entry[2], reverse=True)
+    return entries
+
+
+def print_import_profile(module_name, cwd=None, top=30):
+    """打印模块导入耗时明细，用于发现启动时间的回退"""
+    entries = profile_imports(module_name, cwd=cwd)
+    total_us = max((cumulative for _, _, cumulative in entries), default=0)
+
+    print(f"导入耗时分析: {module_name} (共 {len(entries)} 个模块, 总计 {total_us / 1000:.1f}ms)")
+    print(f"{'self(ms)':>10} {'cumulative(ms)':>15}  module")
+    for name, self_us, cumulative_us in entries[:top]:
+        print(f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>15.1f}  {name}")